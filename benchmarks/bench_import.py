@@ -0,0 +1,66 @@
+# benchmarks/bench_import.py
+"""
+Measure the cold-start cost of getting the tool specifications of the Habitica modules.
+
+Each scenario runs in a fresh interpreter ``--runs`` times; the median wall time of
+an empty interpreter is subtracted. Scenarios:
+
+- eager import: the tool modules with requests imported up front, as before lazy loading
+- lazy import: the tool modules alone; requests is loaded on the first real call
+- lazy import + first call: the tool modules, then the HTTP stack the first call loads
+- specs from source: ``habitica_toolspec.get_tool_specs()`` without importing the modules
+- specs from cache: the same, read from a precomputed specification file
+
+Run with:
+    python benchmarks/bench_import.py --runs 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = "import habitica_tasks, habitica_manage, habitica_tags_skills"
+
+SCENARIOS = {
+    "eager import": f"import requests, urllib3.connection; {MODULES}",
+    "lazy import": MODULES,
+    "lazy import + first call": f"{MODULES}; habitica_tasks.habitica_client.get_session()",
+    "specs from source": "import habitica_toolspec; habitica_toolspec.get_tool_specs()",
+    "specs from cache": "import habitica_toolspec; habitica_toolspec.get_tool_specs(cache_path={cache!r})",
+}
+
+
+def run(code: str, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=15)
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import habitica_toolspec
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = os.path.join(tmp, "tool_specs.json")
+        habitica_toolspec.write_cache(cache)
+        baseline = run("pass", args.runs)
+        print(f"empty interpreter: {baseline * 1000:.1f} ms")
+        print(f"{'scenario':<28}{'ms':>8}")
+        for name, code in SCENARIOS.items():
+            elapsed = run(code.format(cache=cache), args.runs) - baseline
+            print(f"{name:<28}{elapsed * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_json.py
+"""
+Compare JSON decode time and memory of the available backends on realistic Habitica payloads.
+
+The payloads are generated by the stub server: the full task listing (active tasks plus
+completed to-dos), the full user document as returned by ``GET /user`` and the JSON export.
+For each payload the script times a full decode with every installed backend and a
+``LazyJSON`` read of a single field, and reports the peak memory of one decode.
+
+Run with:
+    python benchmarks/bench_json.py --tasks 500 --completed 2000 --repeat 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import habitica_json
+from stub_server import HabiticaState
+
+
+def payloads(state: HabiticaState) -> dict:
+    """
+    Return ``{name: (bytes, field path read by the lazy scenario)}``.
+    """
+    listing = {"success": True, "data": state.listing() + state.listing("completedTodos")}
+    user = {"success": True, "data": state.user}
+    return {
+        "tasks": (json.dumps(listing).encode("utf-8"), "data.0.text"),
+        "user": (json.dumps(user).encode("utf-8"), "data.stats.gp"),
+        "export": (json.dumps(state.export()).encode("utf-8"), "stats.gp"),
+    }
+
+
+def measure(func, repeat: int) -> tuple:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--completed", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    state = HabiticaState(tasks=args.tasks, completed_todos=args.completed)
+    backends = list(reversed(habitica_json.available_backends()))
+    print(f"{'payload':<10}{'size KiB':>10}  {'scenario':<22}{'ms':>9}{'peak KiB':>11}")
+    for name, (raw, path) in payloads(state).items():
+        for backend in backends:
+            habitica_json.configure(backend)
+            elapsed, peak = measure(lambda: habitica_json.loads(raw), args.repeat)
+            print(f"{name:<10}{len(raw) / 1024:>10.0f}  {'loads ' + backend:<22}{elapsed * 1000:>9.2f}{peak / 1024:>11.0f}")
+        habitica_json.configure()
+        elapsed, peak = measure(lambda: habitica_json.LazyJSON(raw).get_path(path), args.repeat)
+        print(f"{name:<10}{len(raw) / 1024:>10.0f}  {'lazy ' + path:<22}{elapsed * 1000:>9.2f}{peak / 1024:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/bench_models.py
+"""
+Compare the memory held by task dicts and by ``habitica_models.Task`` objects.
+
+A synthetic task set is generated by the stub server and filled out the way real
+accounts look: habits and dailies carry a scoring history, dailies have their
+schedule fields and reminders, and every task has the group and challenge stubs
+Habitica adds. The set is encoded as a ``list_tasks`` response and decoded again,
+so no strings are shared that a real response would not share, and the script
+reports the memory retained by
+
+- dicts: the decoded task dicts
+- models: the same tasks converted with ``Task.from_dict`` (the dicts released)
+
+together with the conversion time in both directions and a round-trip check.
+
+Run with:
+    python benchmarks/bench_models.py --tasks 2000 --completed 10000 --history 60
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import habitica_json
+import habitica_models
+from stub_server import HabiticaState
+
+
+def build_payload(tasks: int, completed: int, history: int) -> bytes:
+    state = HabiticaState(tasks=tasks, completed_todos=completed, chat_messages=0, public_guilds=0)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    listing = state.listing() + state.listing("completedTodos")
+    for index, task in enumerate(listing):
+        task["attribute"] = "str"
+        task["group"] = {"approval": {"required": False, "approved": False, "requested": False},
+                         "assignedUsers": [], "sharedCompletion": "singleCompletion"}
+        task["challenge"] = {}
+        task["reminders"] = []
+        if task["type"] in ("habit", "daily"):
+            task["history"] = [
+                {"date": int((start + timedelta(days=day)).timestamp() * 1000), "value": round(day * 0.37, 4),
+                 "scoredUp": day % 3, "scoredDown": day % 2, "isDue": True, "completed": day % 4 != 0}
+                for day in range(history)
+            ]
+        if task["type"] == "daily":
+            task.update({"frequency": "weekly", "everyX": 1, "startDate": start.isoformat(), "streak": index % 30,
+                         "repeat": {"m": True, "t": True, "w": True, "th": True, "f": True, "s": False, "su": False},
+                         "daysOfMonth": [], "weeksOfMonth": [], "isDue": True, "yesterDaily": True,
+                         "collapseChecklist": False})
+            task["reminders"] = [{"id": task["_id"][:8] + "-rem", "time": start.isoformat()}]
+        if task["type"] == "todo" and task.get("completed"):
+            task["dateCompleted"] = task["updatedAt"]
+    return json.dumps({"success": True, "data": listing}).encode("utf-8")
+
+
+def retained(build) -> tuple:
+    """
+    Return ``(object, bytes retained by it)`` for the object ``build()`` returns.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return value, size
+
+
+def timed(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--completed", type=int, default=10000)
+    parser.add_argument("--history", type=int, default=60, help="history entries per habit and daily")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    payload = build_payload(args.tasks, args.completed, args.history)
+    dicts, dict_size = retained(lambda: habitica_json.loads(payload)["data"])
+    models, model_size = retained(lambda: habitica_models.tasks_from_dicts(habitica_json.loads(payload)["data"]))
+
+    round_trip = habitica_models.tasks_to_dicts(models) == dicts
+    to_models = timed(lambda: habitica_models.tasks_from_dicts(dicts), args.repeat)
+    to_dicts = timed(lambda: habitica_models.tasks_to_dicts(models), args.repeat)
+
+    print(f"{len(dicts)} tasks, payload {len(payload) / 1024:.0f} KiB, {args.history} history entries per habit/daily")
+    print(f"{'representation':<16}{'retained KiB':>14}{'bytes/task':>12}")
+    for name, size in (("dicts", dict_size), ("models", model_size)):
+        print(f"{name:<16}{size / 1024:>14.0f}{size / len(dicts):>12.0f}")
+    print(f"models use {model_size / dict_size:.0%} of the dict memory")
+    print(f"from_dict {to_models * 1000:.1f} ms, to_dict {to_dicts * 1000:.1f} ms for all tasks")
+    print(f"round trip {'ok' if round_trip else 'FAILED'}")
+
+
+if __name__ == "__main__":
+    main()
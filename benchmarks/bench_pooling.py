@@ -0,0 +1,83 @@
+# benchmarks/bench_pooling.py
+"""
+Compare calls per second with and without connection pooling against the local stub server.
+
+Coalescing of identical in-flight GETs is turned off for the "pooled" rows so that
+every call is a real HTTP request; "coalesced" reports the shared-response path
+separately.
+
+Run with:
+    python benchmarks/bench_pooling.py --calls 500 --threads 1 8
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("HABITICA_USER_ID", "bench-user")
+os.environ.setdefault("HABITICA_API_KEY", "bench-key")
+
+import requests
+import habitica_client
+import habitica_ratelimit
+from habitica_tasks import Tools
+from stub_server import StubServer
+
+
+def unpooled_get(url: str, headers: dict) -> None:
+    # Module-level requests.get opens a new connection for every call.
+    requests.get(url, headers=headers, timeout=10).raise_for_status()
+
+
+def pooled_get(url: str, headers: dict) -> None:
+    habitica_client.request("GET", url, headers=headers, timeout=10).raise_for_status()
+
+
+def run(call, url: str, headers: dict, calls: int, threads: int) -> float:
+    start = time.perf_counter()
+    if threads == 1:
+        for _ in range(calls):
+            call(url, headers)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(lambda _: call(url, headers), range(calls)))
+    return calls / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    args = parser.parse_args()
+
+    # Measure raw connection overhead, not the 30 requests/minute client-side budget.
+    habitica_ratelimit.configure(enabled=False)
+    with StubServer() as server:
+        tools = Tools()
+        tools.base_url = server.base_url
+        url = f"{server.base_url}/tasks/user"
+        habitica_client.configure(pool_maxsize=max(args.threads))
+
+        print(f"{'mode':<10}{'threads':>8}{'calls/s':>12}")
+        for threads in args.threads:
+            for name, call, coalesce in (("unpooled", unpooled_get, False), ("pooled", pooled_get, False),
+                                         ("coalesced", pooled_get, True)):
+                habitica_client.configure_coalescing(coalesce)
+                rate = run(call, url, tools.headers, args.calls, threads)
+                print(f"{name:<10}{threads:>8}{rate:>12.1f}")
+
+        habitica_client.configure_coalescing(False)
+        # Every call must reach the server; a fresh task cache would answer all but the first.
+        tools.task_cache.ttl = 0
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            tools.list_tasks()
+        rate = args.calls / (time.perf_counter() - start)
+        print(f"Tools.list_tasks via shared session: {rate:.1f} calls/s")
+        habitica_client.close()
+
+
+if __name__ == "__main__":
+    main()
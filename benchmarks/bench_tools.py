@@ -0,0 +1,197 @@
+# benchmarks/bench_tools.py
+"""
+Measure throughput, p50/p99 latency and memory of the Tools methods against the stub Habitica API.
+
+Each scenario calls one Tools method ``--calls`` times spread over ``--threads`` threads
+and reports calls per second, latency percentiles, failed calls and the peak memory
+allocated while it ran (tracemalloc). Results can be saved with ``--json`` and compared
+with a saved run via ``--baseline``; scenarios slower or larger than the baseline by more
+than ``--tolerance`` are reported and make the script exit with status 1.
+
+Run with:
+    python benchmarks/bench_tools.py --calls 200 --threads 1 8
+    python benchmarks/bench_tools.py --latency 0.02 --error-rate 0.05 --json after.json --baseline before.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("HABITICA_USER_ID", "bench-user")
+os.environ.setdefault("HABITICA_API_KEY", "bench-key")
+
+import habitica_client
+import habitica_ratelimit
+import habitica_manage
+import habitica_tasks
+import habitica_tags_skills
+from stub_server import HabiticaHandler, HabiticaState, StubServer
+
+
+def build_scenarios(server: StubServer, cache_ttl: float) -> dict:
+    """
+    Return ``{name: callable(index)}`` for every benchmarked Tools method, wired to the stub server.
+    """
+    tasks = habitica_tasks.Tools()
+    manage = habitica_manage.Tools()
+    tags_skills = habitica_tags_skills.Tools()
+    for tools in (tasks, manage, tags_skills):
+        tools.base_url = server.base_url
+    manage.export_url = server.export_url
+    tasks.task_cache.ttl = cache_ttl
+    manage.profile_view.invalidate()
+
+    state = server.state
+    todos = [t["_id"] for t in state.listing("todos") if t.get("checklist")]
+    habits = [t["_id"] for t in state.listing("habits")]
+    tag_names = [tag["name"] for tag in state.tags[:3]]
+
+    def checklist_update(i: int) -> dict:
+        task_id = todos[i % len(todos)]
+        item = state.tasks[task_id]["checklist"][0]
+        return tasks.update_checklist(task_id, item["id"], {"text": item["text"], "completed": i % 2 == 0})
+
+    def cast(i: int) -> dict:
+        # Keep enough mana so every cast reaches the server's success path.
+        state.user["stats"]["mp"] = 1000
+        return tags_skills.cast_skill("fireball", habits[i % len(habits)])
+
+    def new_chat(i: int) -> dict:
+        # One poll in ten finds a new message; the rest are answered 304 Not Modified.
+        if i % 10 == 0:
+            with state.lock:
+                state.add_chat_message(state.party_id, f"Bench message {i}")
+        return manage.get_new_chat_messages("party")
+
+    return {
+        "list_tasks": lambda i: tasks.list_tasks(),
+        "list_tasks(todos)": lambda i: tasks.list_tasks("todos"),
+        "list_all_tasks": lambda i: tasks.list_all_tasks(),
+        "get_task": lambda i: tasks.get_task(habits[i % len(habits)]),
+        "create_task": lambda i: tasks.create_task({"text": f"Bench task {i}", "type": "todo"}),
+        "update_task": lambda i: tasks.update_task(habits[i % len(habits)], {"notes": f"Run {i}"}),
+        "update_checklist": checklist_update,
+        "score_task": lambda i: tasks.score_task(habits[i % len(habits)], "up"),
+        "list_tags": lambda i: tags_skills.list_tags(),
+        "resolve_tags": lambda i: tags_skills.resolve_tags(tag_names),
+        "get_user_profile": lambda i: manage.get_user_profile(),
+        "get_stats": lambda i: manage.get_stats(),
+        "export_user_data_json": lambda i: manage.export_user_data_json(),
+        "stream_user_data_json": lambda i: habitica_manage.stream_user_data_json(manage, lambda chunk: None),
+        "get_group_chat": lambda i: manage.get_group_chat("party"),
+        "get_new_chat_messages": new_chat,
+        "cast_skill": cast,
+    }
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_scenario(call, calls: int, threads: int) -> dict:
+    latencies = []
+
+    def timed(i: int) -> bool:
+        start = time.perf_counter()
+        result = call(i)
+        latencies.append(time.perf_counter() - start)
+        return bool(result.get("success"))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    if threads == 1:
+        outcomes = [timed(i) for i in range(calls)]
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            outcomes = list(pool.map(timed, range(calls)))
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    failures = outcomes.count(False)
+    return {
+        "calls_per_s": calls / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_kib": peak / 1024,
+        "failed": failures,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Return a message for every result that regressed against the baseline by more than ``tolerance``.
+    """
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if not before:
+            continue
+        if result["calls_per_s"] < before["calls_per_s"] * (1 - tolerance):
+            regressions.append(f"{key}: {before['calls_per_s']:.1f} -> {result['calls_per_s']:.1f} calls/s")
+        if result["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p99 {before['p99_ms']:.2f} -> {result['p99_ms']:.2f} ms")
+        if result["peak_kib"] > before["peak_kib"] * (1 + tolerance):
+            regressions.append(f"{key}: peak {before['peak_kib']:.0f} -> {result['peak_kib']:.0f} KiB")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--only", nargs="+", help="Scenario names to run (default: all).")
+    parser.add_argument("--tasks", type=int, default=200, help="Active tasks of the generated user.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the stub adds to each response.")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of responses that are 503s.")
+    parser.add_argument("--rate-limit", type=int, default=None,
+                        help="Stub requests per minute; also enables the client-side limiter.")
+    parser.add_argument("--cache-ttl", type=float, default=0.0,
+                        help="Task cache TTL; 0 sends every read to the stub (with ETag revalidation).")
+    parser.add_argument("--json", help="Write the results to this file.")
+    parser.add_argument("--baseline", help="Compare with results previously written by --json.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.rate_limit:
+        habitica_ratelimit.configure(requests_per_period=args.rate_limit, period=60)
+    else:
+        # Measure client cost, not the 30 requests/minute budget.
+        habitica_ratelimit.configure(enabled=False)
+    habitica_client.configure(pool_maxsize=max(args.threads))
+    state = HabiticaState(tasks=args.tasks)
+    results = {}
+    with StubServer(handler=HabiticaHandler, state=state, latency=args.latency, jitter=args.jitter,
+                    error_rate=args.error_rate, rate_limit=args.rate_limit) as server:
+        scenarios = build_scenarios(server, args.cache_ttl)
+        names = args.only or list(scenarios)
+        print(f"{'scenario':<24}{'threads':>8}{'calls/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'peak KiB':>10}{'failed':>8}")
+        for name in names:
+            for threads in args.threads:
+                result = run_scenario(scenarios[name], args.calls, threads)
+                results[f"{name}@{threads}"] = result
+                print(f"{name:<24}{threads:>8}{result['calls_per_s']:>10.1f}{result['p50_ms']:>9.2f}"
+                      f"{result['p99_ms']:>9.2f}{result['peak_kib']:>10.0f}{result['failed']:>8}")
+    habitica_client.close()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,533 @@
+# benchmarks/stub_server.py
+"""
+A local stand-in for the Habitica API used by the benchmarks.
+
+``StubHandler`` answers every request with a small ``{"success": true, "data": ...}``
+body, for measuring raw client overhead. ``HabiticaHandler`` serves a generated
+user (``HabiticaState``) through the endpoints described in ``Habitica API Reference/``:
+tasks (list with ETags, create single or array, get, update, checklist, tags, score),
+tags, user (with ``userFields`` projection), login, groups, group chat (with ETags), class
+skills and the JSON export. Both answer over HTTP/1.1 keep-alive, so client-side
+cost can be measured without touching habitica.com or its rate limit.
+
+``StubServer`` can add latency, random 503 errors and a per-user rate limit with
+Habitica's ``X-RateLimit-*`` headers to either handler:
+
+    with StubServer(handler=HabiticaHandler, latency=0.05, error_rate=0.01, rate_limit=30) as server:
+        tools.base_url = server.base_url
+"""
+import gzip
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Mana cost of each class skill, as in Habitica's content.
+SPELL_COSTS = {
+    "fireball": 10, "mpheal": 30, "earth": 35, "frost": 40,
+    "smash": 10, "defensiveStance": 25, "valorousPresence": 20, "intimidate": 15,
+    "pickPocket": 10, "backStab": 15, "toolsOfTrade": 25, "stealth": 45,
+    "heal": 15, "protectAura": 30, "brightness": 15, "healAll": 25,
+    "snowball": 0, "spookySparkles": 0, "seafoam": 0, "shinySeed": 0,
+}
+PUBLIC_GUILDS_PER_PAGE = 30
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+class HabiticaState:
+    """
+    In-memory data of one generated Habitica user, shared by all requests to a server.
+
+    :param tasks: Number of active tasks (habits, dailies, to-dos and rewards).
+    :param completed_todos: Number of completed to-dos.
+    :param tags: Number of tags.
+    :param chat_messages: Number of party chat messages.
+    :param public_guilds: Number of public guilds.
+    :param inbox_messages: Number of private messages in the export.
+    :param seed: Random seed, so runs are comparable.
+    """
+
+    def __init__(self, tasks: int = 200, completed_todos: int = 500, tags: int = 20, chat_messages: int = 100,
+                 public_guilds: int = 90, inbox_messages: int = 200, seed: int = 1):
+        rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.version = 0
+        self.user_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        self.party_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        self.tags = [{"id": str(uuid.UUID(int=rng.getrandbits(128))), "name": f"Tag {i}"} for i in range(tags)]
+        self.tasks = {}
+        types = ("habit", "daily", "todo", "reward")
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        for i in range(tasks + completed_todos):
+            task_type = "todo" if i >= tasks else types[i % 4]
+            task = self._make_task(rng, task_type, i, start)
+            if i >= tasks:
+                task["completed"] = True
+            self.tasks[task["_id"]] = task
+        self.user = {
+            "_id": self.user_id,
+            "auth": {"local": {"username": "bench-user"}, "timestamps": {"created": start.isoformat()}},
+            "profile": {"name": "Bench User", "blurb": "Generated by the stub server."},
+            "stats": {"hp": 50, "maxHealth": 50, "mp": 120.0, "maxMP": 150, "exp": 180, "toNextLevel": 640,
+                      "gp": 275.5, "lvl": 24, "class": "wizard", "buffs": {}},
+            "party": {"_id": self.party_id, "quest": {"key": None}},
+            "preferences": {"dayStart": 0, "timezoneOffset": 0, "language": "en"},
+            "lastCron": start.isoformat(),
+            "items": {"gear": {"owned": {f"gear_{i}": True for i in range(300)}},
+                      "pets": {f"Pet-{i}": 5 for i in range(150)},
+                      "mounts": {f"Mount-{i}": True for i in range(100)}},
+            "achievements": {f"achievement_{i}": True for i in range(40)},
+            "history": {"exp": [{"date": (start + timedelta(days=d)).isoformat(), "value": d * 10}
+                                for d in range(365)]},
+            "inbox": {"messages": {}},
+            "tags": self.tags,
+        }
+        for i in range(inbox_messages):
+            message_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            self.user["inbox"]["messages"][message_id] = {
+                "id": message_id, "text": f"Message {i} " + "lorem ipsum " * 10, "timestamp": start.isoformat(),
+            }
+        self.groups = {
+            self.party_id: {"_id": self.party_id, "name": "Bench Party", "type": "party", "privacy": "private"},
+            "habitrpg": {"_id": "habitrpg", "name": "Tavern", "type": "guild", "privacy": "public"},
+        }
+        for i in range(public_guilds):
+            guild_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            self.groups[guild_id] = {"_id": guild_id, "name": f"Guild {i}", "type": "guild", "privacy": "public",
+                                     "memberCount": rng.randint(1, 5000)}
+        self.chat = {self.party_id: [], "habitrpg": []}
+        for i in range(chat_messages):
+            self.add_chat_message(self.party_id, f"Chat message {i}", f"member-{i % 4}", start + timedelta(minutes=i))
+
+    def _make_task(self, rng, task_type: str, index: int, start: datetime) -> dict:
+        created = start + timedelta(minutes=index)
+        task = {
+            "_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "type": task_type,
+            "text": f"{task_type.title()} {index} " + rng.choice(["read", "write", "run", "cook", "clean"]),
+            "notes": "",
+            "tags": [tag["id"] for tag in rng.sample(self.tags, min(len(self.tags), rng.randint(0, 3)))],
+            "priority": rng.choice([0.1, 1, 1.5, 2]),
+            "value": 0,
+            "createdAt": created.isoformat(),
+            "updatedAt": created.isoformat(),
+            "userId": self.user_id,
+            "id": None,
+        }
+        task["id"] = task["_id"]
+        if task_type in ("daily", "todo"):
+            task["completed"] = False
+            task["checklist"] = [{"id": str(uuid.UUID(int=rng.getrandbits(128))), "text": f"Step {n}",
+                                  "completed": False} for n in range(rng.randint(0, 4))]
+        if task_type == "daily":
+            task["nextDue"] = [(start + timedelta(days=d)).isoformat() for d in range(1, 7)]
+        if task_type == "todo" and index % 3 == 0:
+            task["date"] = (start + timedelta(days=index % 60)).isoformat()
+        if task_type == "habit":
+            task.update({"up": True, "down": index % 2 == 0, "counterUp": 0, "counterDown": 0})
+        return task
+
+    def add_chat_message(self, group_id: str, text: str, user: str = "bench-user", when: datetime = None) -> dict:
+        when = when or datetime.now(timezone.utc)
+        message = {"id": str(uuid.uuid4()), "text": text, "user": user, "uuid": self.user_id,
+                   "timestamp": when.isoformat(), "groupId": group_id}
+        # Habitica returns chat newest first.
+        self.chat.setdefault(group_id, []).insert(0, message)
+        return message
+
+    def touch(self, task: dict) -> None:
+        task["updatedAt"] = _now()
+        self.version += 1
+
+    def find_task(self, key: str):
+        task = self.tasks.get(key)
+        if task is None:
+            task = next((t for t in self.tasks.values() if t.get("alias") == key), None)
+        return task
+
+    def listing(self, task_type: str = None) -> list:
+        if task_type == "completedTodos":
+            return [t for t in self.tasks.values() if t["type"] == "todo" and t.get("completed")]
+        active = [t for t in self.tasks.values() if not (t["type"] == "todo" and t.get("completed"))]
+        if task_type:
+            return [t for t in active if f"{t['type']}s" == task_type]
+        return active
+
+    def project_user(self, fields: str = None) -> dict:
+        if not fields:
+            return self.user
+        projected = {"_id": self.user_id}
+        for path in fields.split(","):
+            parts = path.strip().split(".")
+            source, target = self.user, projected
+            for depth, part in enumerate(parts):
+                if not isinstance(source, dict) or part not in source:
+                    break
+                if depth == len(parts) - 1:
+                    target[part] = source[part]
+                else:
+                    target = target.setdefault(part, {})
+                    source = source[part]
+        return projected
+
+    def export(self) -> dict:
+        tasks = {"habits": [], "dailys": [], "todos": [], "rewards": []}
+        for task in self.tasks.values():
+            tasks[f"{task['type']}s"].append(task)
+        return {**self.user, "tasks": tasks}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Buffer the status line, headers and body into one segment and disable Nagle,
+    # otherwise keep-alive responses stall on delayed ACKs.
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: dict = None) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self._send_bytes(status, payload, {"Content-Type": "application/json", **(headers or {})})
+
+    def _send_bytes(self, status: int, payload: bytes, headers: dict = None) -> None:
+        self.send_response(status)
+        for name, value in {**getattr(self, "_extra_headers", {}), **(headers or {})}.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length))
+
+    def _preflight(self) -> bool:
+        """
+        Apply the server's latency, rate limit and error rate. Returns False if a response was already sent.
+        """
+        server = self.server
+        self._extra_headers = {}
+        if server.latency or server.jitter:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+        if server.rate_limit:
+            user = self.headers.get("x-api-user") or "anonymous"
+            with server.rate_lock:
+                now = time.time()
+                count, reset_at = server.rate_windows.get(user, (0, now + server.rate_period))
+                if now >= reset_at:
+                    count, reset_at = 0, now + server.rate_period
+                count += 1
+                server.rate_windows[user] = (count, reset_at)
+            remaining = max(server.rate_limit - count, 0)
+            self._extra_headers = {
+                "X-RateLimit-Limit": str(server.rate_limit),
+                "X-RateLimit-Remaining": str(remaining),
+                "X-RateLimit-Reset": formatdate(reset_at, usegmt=True),
+            }
+            if count > server.rate_limit:
+                self._send_json(429, {"success": False, "error": "TooManyRequests",
+                                      "message": "You've exceeded your request quota."},
+                                {"Retry-After": str(max(1, int(reset_at - time.time() + 1)))})
+                return False
+        if server.error_rate and random.random() < server.error_rate:
+            self._send_json(503, {"success": False, "error": "ServiceUnavailable", "message": "Injected error."})
+            return False
+        return True
+
+    def do_GET(self):
+        if self._preflight():
+            self._send_json(200, {"success": True, "data": []})
+
+    def do_POST(self):
+        body = self._read_body()
+        if self._preflight():
+            self._send_json(201, {"success": True, "data": body or {}})
+
+    def do_PUT(self):
+        body = self._read_body()
+        if self._preflight():
+            self._send_json(200, {"success": True, "data": body or {}})
+
+
+class HabiticaHandler(StubHandler):
+    """
+    Serves ``server.state`` through the Habitica API routes used by the tool modules.
+    """
+
+    def _not_found(self, message: str) -> None:
+        self._send_json(404, {"success": False, "error": "NotFound", "message": message})
+
+    def _bad_request(self, message: str) -> None:
+        self._send_json(400, {"success": False, "error": "BadRequest", "message": message})
+
+    def _ok(self, data, status: int = 200, headers: dict = None) -> None:
+        self._send_json(status, {"success": True, "data": data}, headers)
+
+    def _route(self, method: str) -> None:
+        body = self._read_body() if method in ("POST", "PUT") else None
+        if not self._preflight():
+            return
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")
+        state = self.server.state
+        if parts[:2] == ["export", "userdata.json"] and method == "GET":
+            return self._export(state)
+        if parts[:2] != ["api", "v3"]:
+            return self._not_found("Not found.")
+        parts = parts[2:]
+        with state.lock:
+            handler = getattr(self, f"_{parts[0]}", None) if parts else None
+            if handler is None:
+                return self._not_found("Not found.")
+            return handler(state, method, parts[1:], query, body)
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+    def _tasks(self, state, method, parts, query, body):
+        if parts == ["user"] and method == "GET":
+            task_type = query.get("type")
+            etag = f'W/"{state.version}-{task_type or "all"}"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._send_bytes(304, b"", {"ETag": etag})
+            return self._ok(state.listing(task_type), headers={"ETag": etag})
+        if parts == ["user"] and method == "POST":
+            items = body if isinstance(body, list) else [body]
+            for item in items:
+                if not isinstance(item, dict) or not item.get("text") or \
+                        item.get("type") not in ("habit", "daily", "todo", "reward"):
+                    return self._bad_request("Task text and a valid type are required.")
+            aliases = [item["alias"] for item in items if item.get("alias")]
+            if len(set(aliases)) != len(aliases) or any(state.find_task(alias) for alias in aliases):
+                return self._bad_request("Task alias already used on another task.")
+            created = []
+            for item in items:
+                task = {"checklist": [], "tags": [], "priority": 1, "value": 0, "completed": False, **item,
+                        "_id": str(uuid.uuid4()), "createdAt": _now(), "userId": state.user_id}
+                task["id"] = task["_id"]
+                state.tasks[task["_id"]] = task
+                state.touch(task)
+                created.append(task)
+            return self._ok(created if isinstance(body, list) else created[0], 201)
+
+        task = state.find_task(parts[0]) if parts else None
+        if task is None:
+            return self._not_found("Task not found.")
+        rest = parts[1:]
+        if not rest and method == "GET":
+            return self._ok(task)
+        if not rest and method == "PUT":
+            task.update({k: v for k, v in (body or {}).items() if k not in ("_id", "id", "type")})
+            state.touch(task)
+            return self._ok(task)
+        if rest == ["checklist"] and method == "POST":
+            # Like Habitica, assign the ID and ignore one sent by the client.
+            item = {"completed": False, **(body or {}), "id": str(uuid.uuid4())}
+            task.setdefault("checklist", []).append(item)
+            state.touch(task)
+            return self._ok(task)
+        if len(rest) == 2 and rest[0] == "checklist" and method == "PUT":
+            item = next((i for i in task.get("checklist", []) if i["id"] == rest[1]), None)
+            if item is None:
+                return self._not_found("Checklist item not found.")
+            item.update(body or {})
+            state.touch(task)
+            return self._ok(task)
+        if len(rest) == 2 and rest[0] == "tags" and method in ("POST", "DELETE"):
+            if method == "POST":
+                if rest[1] in task["tags"]:
+                    return self._bad_request("Task is already tagged with given tag.")
+                task["tags"].append(rest[1])
+            else:
+                if rest[1] not in task["tags"]:
+                    return self._not_found("Tag not found.")
+                task["tags"].remove(rest[1])
+            state.touch(task)
+            return self._ok(task["tags"])
+        if len(rest) == 2 and rest[0] == "score" and method == "POST" and rest[1] in ("up", "down"):
+            if task["type"] in ("daily", "todo"):
+                task["completed"] = rest[1] == "up"
+            state.touch(task)
+            stats = state.user["stats"]
+            stats["gp"] = round(stats["gp"] + (1.0 if rest[1] == "up" else 0.0), 2)
+            return self._ok({"delta": 1.0 if rest[1] == "up" else -1.0, **stats, "_tmp": {}})
+        return self._not_found("Not found.")
+
+    def _tags(self, state, method, parts, query, body):
+        if not parts and method == "GET":
+            return self._ok(state.tags)
+        if not parts and method == "POST":
+            if not body or not body.get("name"):
+                return self._bad_request("Tag name is required.")
+            tag = {"name": body["name"], "id": str(uuid.uuid4())}
+            state.tags.append(tag)
+            return self._ok(tag, 201)
+        return self._not_found("Tag not found.")
+
+    def _user(self, state, method, parts, query, body):
+        if not parts and method == "GET":
+            return self._ok(state.project_user(query.get("userFields")))
+        if parts == ["auth", "local", "login"] and method == "POST":
+            if not body or not body.get("username") or not body.get("password"):
+                return self._bad_request("Missing username or password.")
+            return self._ok({"id": state.user_id, "apiToken": str(uuid.uuid4()), "newUser": False,
+                             "username": body["username"]})
+        if len(parts) == 3 and parts[:2] == ["class", "cast"] and method == "POST":
+            spell = parts[2]
+            if spell not in SPELL_COSTS:
+                return self._not_found("Skill not found.")
+            stats = state.user["stats"]
+            if stats["mp"] < SPELL_COSTS[spell]:
+                return self._send_json(401, {"success": False, "error": "NotAuthorized",
+                                             "message": "Not enough mana."})
+            stats["mp"] -= SPELL_COSTS[spell]
+            data = {"user": {"_id": state.user_id, "stats": stats}}
+            target = query.get("targetId")
+            if target and target in state.tasks:
+                data["task"] = state.tasks[target]
+            return self._ok(data)
+        return self._not_found("Not found.")
+
+    def _groups(self, state, method, parts, query, body):
+        if not parts and method == "GET":
+            types = set((query.get("type") or "").split(","))
+            groups = []
+            if "party" in types:
+                groups.append(state.groups[state.party_id])
+            if "tavern" in types:
+                groups.append(state.groups["habitrpg"])
+            if types & {"publicGuilds", "guilds"}:
+                guilds = [g for g in state.groups.values() if g["type"] == "guild" and g["_id"] != "habitrpg"]
+                if query.get("paginate") == "true":
+                    page = int(query.get("page") or 0)
+                    guilds = guilds[page * PUBLIC_GUILDS_PER_PAGE:(page + 1) * PUBLIC_GUILDS_PER_PAGE]
+                groups.extend(guilds)
+            return self._ok(groups)
+        group_id = state.party_id if parts and parts[0] == "party" else (parts[0] if parts else None)
+        if group_id not in state.groups:
+            return self._not_found("Group not found or you don't have access.")
+        if parts[1:] == ["chat"] and method == "GET":
+            chat = state.chat.get(group_id, [])
+            etag = f'W/"chat-{len(chat)}-{chat[0]["id"] if chat else ""}"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._send_bytes(304, b"", {"ETag": etag})
+            return self._ok(chat, headers={"ETag": etag})
+        if parts[1:] == ["chat"] and method == "POST":
+            if not body or not body.get("message"):
+                return self._bad_request("Message is required.")
+            message = state.add_chat_message(group_id, body["message"])
+            return self._ok({"message": message})
+        if not parts[1:] and method == "GET":
+            return self._ok(state.groups[group_id])
+        return self._not_found("Not found.")
+
+    def _export(self, state) -> None:
+        with state.lock:
+            payload = json.dumps(state.export()).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            payload = gzip.compress(payload, 6)
+            headers["Content-Encoding"] = "gzip"
+        self._send_bytes(200, payload, headers)
+
+
+class StubServer:
+    """
+    Run a stub Habitica server on a background thread.
+
+    :param handler: ``StubHandler`` for fixed replies or ``HabiticaHandler`` for the stateful API.
+    :param state: ``HabiticaState`` served by ``HabiticaHandler``; a default one is generated if omitted.
+    :param latency: Seconds added to every response.
+    :param jitter: Additional random delay of up to this many seconds.
+    :param error_rate: Fraction of requests answered with 503 Service Unavailable.
+    :param rate_limit: Requests allowed per user and period (None for no limit); excess requests get 429.
+    :param rate_period: Length of the rate-limit window in seconds.
+
+    Usage:
+        with StubServer() as server:
+            tools.base_url = server.base_url
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, handler=StubHandler, state: HabiticaState = None,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, rate_limit: int = None,
+                 rate_period: float = 60.0):
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = state if state is not None or not issubclass(handler, HabiticaHandler) else HabiticaState()
+        self.httpd.latency = latency
+        self.httpd.jitter = jitter
+        self.httpd.error_rate = error_rate
+        self.httpd.rate_limit = rate_limit
+        self.httpd.rate_period = rate_period
+        self.httpd.rate_windows = {}
+        self.httpd.rate_lock = threading.Lock()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def state(self):
+        return self.httpd.state
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/api/v3"
+
+    @property
+    def export_url(self) -> str:
+        return f"{self.url}/export/userdata.json"
+
+    def start(self) -> "StubServer":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the stub Habitica API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=None)
+    args = parser.parse_args()
+    server = StubServer(port=args.port, handler=HabiticaHandler, latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, rate_limit=args.rate_limit)
+    print(f"Stub Habitica API listening on {server.base_url}")
+    server.httpd.serve_forever()
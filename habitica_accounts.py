@@ -0,0 +1,295 @@
+# habitica_accounts.py
+"""
+Serve many Habitica users from one process.
+
+``ClientRegistry`` keeps one ``UserContext`` per Habitica user: that user's
+``Tools`` instances (and with them their headers, task cache, profile cache and
+write-behind queue), their rate limiter and their tag index. Connection pools and
+worker threads stay shared by all users through ``habitica_client``.
+
+Contexts are kept in least-recently-used order; a context counts as used whenever
+it is fetched from the registry or one of its ``Tools`` methods is called, also through
+a reference held since. When more than ``max_users`` are held, or a context has not
+been used for ``idle_timeout`` seconds (and has no queued writes), it is closed:
+queued writes are flushed and the user's caches, tag index and snapshot connection
+are released, so memory stays bounded however many accounts are served. The user's
+rate limiter is kept, with the budget and block synced from Habitica's headers.
+The next call for that user builds a fresh context; ``Tools`` still held from the
+closed one keep working without write-behind or snapshot.
+
+    registry = habitica_accounts.get_registry()
+    tasks = registry.get(user_id, api_key).tasks
+    tasks.list_tasks("todos")
+"""
+import os
+import functools
+import inspect
+import threading
+import time
+import logging
+from collections import OrderedDict
+import habitica_manage
+import habitica_snapshot
+import habitica_tag_index
+import habitica_tags_skills
+import habitica_tasks
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_MAX_USERS = int(os.environ.get("HABITICA_MAX_USERS", "1000"))
+# Seconds after which an unused user context is evicted.
+DEFAULT_IDLE_TIMEOUT = float(os.environ.get("HABITICA_USER_IDLE_TIMEOUT", "1800"))
+# Longest an evicted context waits for its queued writes to be sent.
+EVICT_FLUSH_TIMEOUT = 10
+
+_tracked_classes = {}
+
+
+def _tracked(cls) -> type:
+    """
+    Return a subclass of a ``Tools`` class whose public methods mark their user context as used.
+    """
+    tracked = _tracked_classes.get(cls)
+    if tracked is None:
+        methods = {}
+        for name, func in inspect.getmembers(cls, inspect.isfunction):
+            if not name.startswith("_"):
+                methods[name] = _touching(func)
+        tracked = _tracked_classes[cls] = type(cls.__name__, (cls,), {
+            **methods, "__module__": cls.__module__, "_context": None,
+        })
+    return tracked
+
+
+def _touching(func):
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        # None while __init__ runs, before the context is attached.
+        if self._context is not None:
+            self._context.touch()
+        return func(self, *args, **kwargs)
+    return wrapper
+
+
+class UserContext:
+    """
+    The tool instances and per-user state for one Habitica account.
+
+    The ``Tools`` instances are created on first access.
+
+    :param user_id: Habitica user ID.
+    :param api_key: API token of the user.
+    """
+
+    def __init__(self, user_id: str, api_key: str):
+        self.user_id = user_id
+        self.api_key = api_key
+        self.last_used = time.monotonic()
+        # When the registry last fetched or checked the context; its LRU order follows this.
+        self.checked = self.last_used
+        self._tools = {}
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def _get(self, name: str, cls):
+        tools = self._tools.get(name)
+        if tools is None:
+            with self._lock:
+                tools = self._tools.get(name)
+                if tools is None:
+                    if self.closed:
+                        raise RuntimeError(f"User context for {self.user_id} has been closed.")
+                    tools = _tracked(cls)(self.user_id, self.api_key)
+                    tools._context = self
+                    self._tools[name] = tools
+        return tools
+
+    def touch(self) -> None:
+        """
+        Mark the context as used now.
+        """
+        self.last_used = time.monotonic()
+
+    def busy(self) -> bool:
+        """
+        Return whether the context has queued writes that are not sent yet.
+        """
+        tasks = self._tools.get("tasks")
+        return tasks is not None and tasks.write_queue is not None and tasks.write_queue.pending() > 0
+
+    @property
+    def tasks(self) -> habitica_tasks.Tools:
+        return self._get("tasks", habitica_tasks.Tools)
+
+    @property
+    def manage(self) -> habitica_manage.Tools:
+        return self._get("manage", habitica_manage.Tools)
+
+    @property
+    def tags_skills(self) -> habitica_tags_skills.Tools:
+        return self._get("tags_skills", habitica_tags_skills.Tools)
+
+    def close(self) -> dict:
+        """
+        Flush queued writes and release the user's shared state.
+
+        The user's rate limiter is kept: it is small, and a new context for the user
+        would otherwise start with a full budget that Habitica has already spent.
+
+        :return: The write-behind report if the user had a queue, else None.
+        """
+        with self._lock:
+            if self.closed:
+                return None
+            self.closed = True
+            tools = self._tools
+            self._tools = {}
+        report = None
+        tasks = tools.get("tasks")
+        if tasks is not None and tasks.write_queue is not None:
+            report = tasks.write_queue.flush(EVICT_FLUSH_TIMEOUT)
+            if report["data"]["pending"]:
+                logging.error(f"Closing user context {self.user_id} with {report['data']['pending']} unsent writes.")
+            tasks.write_queue.close()
+            tasks.write_queue = None
+        for held in tools.values():
+            # Tools still referenced elsewhere must not use the connection closed below.
+            if hasattr(held, "snapshot"):
+                held.snapshot = None
+        habitica_tag_index.remove_tag_index(self.user_id)
+        habitica_snapshot.close_store(self.user_id)
+        return report
+
+
+class ClientRegistry:
+    """
+    Bounded, thread-safe map of Habitica user ID to ``UserContext`` with LRU eviction.
+
+    :param max_users: Most user contexts kept at once.
+    :param idle_timeout: Seconds after which an unused context is evicted (0 disables idle eviction).
+    """
+
+    def __init__(self, max_users: int = None, idle_timeout: float = None):
+        self.max_users = DEFAULT_MAX_USERS if max_users is None else max_users
+        self.idle_timeout = DEFAULT_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self._contexts = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evicted = 0
+
+    def get(self, user_id: str, api_key: str) -> UserContext:
+        """
+        Return the context for a user, creating it if needed.
+
+        A context whose API key differs from ``api_key`` (the token was rotated) is replaced.
+
+        :raises ValueError: If user_id or api_key is empty.
+        """
+        if not user_id or not api_key:
+            raise ValueError("user_id and api_key must be non-empty strings.")
+        evicted = []
+        with self._lock:
+            context = self._contexts.get(user_id)
+            if context is not None and context.api_key != api_key:
+                evicted.append(self._contexts.pop(user_id))
+                context = None
+            if context is None:
+                context = self._contexts[user_id] = UserContext(user_id, api_key)
+                self.created += 1
+            else:
+                self._contexts.move_to_end(user_id)
+            context.checked = context.last_used = time.monotonic()
+            evicted.extend(self._expired())
+        self._close(evicted)
+        return context
+
+    def _expired(self) -> list:
+        """
+        Pop contexts beyond ``max_users`` or idle for longer than ``idle_timeout``. Call with the lock held.
+        """
+        expired = []
+        now = time.monotonic()
+        while self._contexts:
+            user_id, context = next(iter(self._contexts.items()))
+            if len(self._contexts) > self.max_users:
+                expired.append(self._contexts.pop(user_id))
+                self.evicted += 1
+                continue
+            # Contexts are ordered by ``checked``, and ``last_used`` is never older than it.
+            if not self.idle_timeout or now - context.checked <= self.idle_timeout:
+                break
+            if now - context.last_used > self.idle_timeout and not context.busy():
+                expired.append(self._contexts.pop(user_id))
+                self.evicted += 1
+            else:
+                # Used through a held reference, or still sending writes: keep it, checked as of now.
+                context.checked = now
+                self._contexts.move_to_end(user_id)
+        return expired
+
+    def _close(self, contexts: list) -> None:
+        for context in contexts:
+            try:
+                context.close()
+            except Exception as e:
+                logging.error(f"Closing user context {context.user_id} failed: {e}")
+
+    def evict_idle(self) -> int:
+        """
+        Evict contexts that have been idle for longer than ``idle_timeout``.
+
+        :return: Number of evicted contexts.
+        """
+        with self._lock:
+            expired = self._expired()
+        self._close(expired)
+        return len(expired)
+
+    def remove(self, user_id: str) -> bool:
+        """
+        Close and remove a user's context.
+
+        :return: Whether the user had a context.
+        """
+        with self._lock:
+            context = self._contexts.pop(user_id, None)
+        if context is None:
+            return False
+        context.close()
+        return True
+
+    def close(self) -> None:
+        """
+        Close every context.
+        """
+        with self._lock:
+            contexts = list(self._contexts.values())
+            self._contexts.clear()
+        for context in contexts:
+            context.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"users": len(self._contexts), "max_users": self.max_users,
+                    "created": self.created, "evicted": self.evicted}
+
+    def __len__(self) -> int:
+        return len(self._contexts)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._contexts
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ClientRegistry:
+    """
+    Return the process-wide registry, creating it on first use.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ClientRegistry()
+        return _registry
@@ -0,0 +1,261 @@
+# habitica_async.py
+"""
+Asyncio variants of the Habitica task, tag/skill and user APIs.
+
+``AsyncTools`` exposes the same methods, signatures and ``{"success", "data"/"error"}``
+responses as the synchronous ``Tools`` classes. Rate-limit waits happen on the
+event loop with ``asyncio.sleep``; only the HTTP round trip itself runs on the
+shared worker pool, so independent calls can be fanned out with ``asyncio.gather``
+while still drawing from the same per-user rate budget.
+"""
+import asyncio
+import functools
+import logging
+import habitica_client
+import habitica_ratelimit
+import habitica_tasks
+import habitica_manage
+import habitica_tags_skills
+
+logging.basicConfig(level=logging.INFO)
+
+
+class AsyncTools:
+    def __init__(self, user_id: str = None, api_key: str = None):
+        self.tasks = habitica_tasks.Tools(user_id, api_key)
+        self.manage = habitica_manage.Tools(user_id, api_key)
+        self.tags_skills = habitica_tags_skills.Tools(user_id, api_key)
+
+    async def _run(self, func, *args):
+        """
+        Run ``func`` on the worker pool; its requests take their own rate-limit tokens.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(habitica_client.get_executor(), functools.partial(func, *args))
+
+    async def _call(self, func, *args) -> dict:
+        """
+        Wait for a rate-limit slot on the event loop, then run ``func`` on the worker pool.
+        """
+        if not habitica_ratelimit.is_enabled():
+            return await self._run(func, *args)
+
+        limiter = habitica_ratelimit.get_rate_limiter(self.tasks.headers["x-api-user"])
+        try:
+            delay = limiter.reserve()
+        except habitica_ratelimit.RateLimitExceeded as e:
+            logging.error(f"{func.__name__} failed: {e}")
+            return {"success": False, "error": f"Request failed: {e}"}
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            limiter.release(refund=True)
+            raise
+        return await self._run(habitica_client.run_prepaid, limiter, delay, func, *args)
+
+    # Tasks
+
+    async def create_task(self, task_data: dict) -> dict:
+        """
+        Create a new task in Habitica. See ``habitica_tasks.Tools.create_task``.
+        """
+        return await self._call(self.tasks.create_task, task_data)
+
+    async def create_tasks(self, tasks: list, chunk_size: int = 25) -> dict:
+        """
+        Create many tasks using array requests. See ``habitica_tasks.Tools.create_tasks``.
+        """
+        return await self._run(self.tasks.create_tasks, tasks, chunk_size)
+
+    async def get_task(self, task_id: str) -> dict:
+        """
+        Retrieve details of a specific task. See ``habitica_tasks.Tools.get_task``.
+        """
+        return await self._call(self.tasks.get_task, task_id)
+
+    async def get_tasks(self, task_ids: list) -> list:
+        """
+        Retrieve several tasks concurrently.
+
+        :param task_ids: List of task IDs or aliases.
+            Example: ["task-id-123", "task-id-456"]
+
+        :return: List of ``get_task`` responses in the same order as ``task_ids``.
+        """
+        return list(await asyncio.gather(*(self.get_task(task_id) for task_id in task_ids)))
+
+    async def list_tasks(self, task_type: str = None) -> dict:
+        """
+        List all tasks for the authenticated user. See ``habitica_tasks.Tools.list_tasks``.
+        """
+        return await self._call(self.tasks.list_tasks, task_type)
+
+    async def list_all_tasks(self, task_types: list = None, completed_todos: str = "include") -> dict:
+        """
+        List several task types at once, keyed by task ID. See ``habitica_tasks.Tools.list_all_tasks``.
+        """
+        return await self._run(self.tasks.list_all_tasks, task_types, completed_todos)
+
+    async def sync_tasks(self, include_completed: bool = None) -> dict:
+        """
+        Return what changed since the previous sync. See ``habitica_tasks.Tools.sync_tasks``.
+        """
+        return await self._run(self.tasks.sync_tasks, include_completed)
+
+    async def query_tasks(self, tags: list = None, task_type: str = None, due_before: str = None,
+                          due_after: str = None, text_contains: str = None, completed: bool = None,
+                          priority: float = None, include_completed_todos: bool = False, limit: int = None) -> dict:
+        """
+        Find tasks matching all of the given filters. See ``habitica_tasks.Tools.query_tasks``.
+        """
+        return await self._run(self.tasks.query_tasks, tags, task_type, due_before, due_after, text_contains,
+                               completed, priority, include_completed_todos, limit)
+
+    async def update_task(self, task_id: str, task_data: dict) -> dict:
+        """
+        Update details of an existing task. See ``habitica_tasks.Tools.update_task``.
+        """
+        return await self._call(self.tasks.update_task, task_id, task_data)
+
+    async def update_tasks(self, updates: list) -> dict:
+        """
+        Update many tasks concurrently. See ``habitica_tasks.Tools.update_tasks``.
+        """
+        return await self._run(self.tasks.update_tasks, updates)
+
+    async def tag_tasks(self, task_ids: list, add_tags: list = None, remove_tags: list = None) -> dict:
+        """
+        Add and remove tags on many tasks. See ``habitica_tasks.Tools.tag_tasks``.
+        """
+        return await self._run(self.tasks.tag_tasks, task_ids, add_tags, remove_tags)
+
+    async def add_checklist_item(self, task_id: str, item_data: dict) -> dict:
+        """
+        Add a checklist item to an existing task. See ``habitica_tasks.Tools.add_checklist_item``.
+        """
+        if self.tasks.write_queue is not None:
+            return await self._run(self.tasks.add_checklist_item, task_id, item_data)
+        return await self._call(self.tasks.add_checklist_item, task_id, item_data)
+
+    async def update_checklist(self, task_id: str, item_id: str, checklist_data: dict) -> dict:
+        """
+        Update a checklist item within a task. See ``habitica_tasks.Tools.update_checklist``.
+        """
+        if self.tasks.write_queue is not None:
+            return await self._run(self.tasks.update_checklist, task_id, item_id, checklist_data)
+        return await self._call(self.tasks.update_checklist, task_id, item_id, checklist_data)
+
+    async def score_task(self, task_id: str, direction: str = "up") -> dict:
+        """
+        Score a task. See ``habitica_tasks.Tools.score_task``.
+        """
+        if self.tasks.write_queue is not None:
+            return await self._run(self.tasks.score_task, task_id, direction)
+        return await self._call(self.tasks.score_task, task_id, direction)
+
+    async def set_write_behind(self, enabled: bool) -> dict:
+        """
+        Turn write-behind mode on or off. See ``habitica_tasks.Tools.set_write_behind``.
+        """
+        return await self._run(self.tasks.set_write_behind, enabled)
+
+    async def flush_writes(self, timeout: float = None) -> dict:
+        """
+        Send all queued changes now. See ``habitica_tasks.Tools.flush_writes``.
+        """
+        return await self._run(self.tasks.flush_writes, timeout)
+
+    # User
+
+    async def user_login(self, username: str, password: str) -> dict:
+        """
+        Authenticate with username/email and password. See ``habitica_manage.Tools.user_login``.
+        """
+        return await self._call(self.manage.user_login, username, password)
+
+    async def get_user_profile(self, user_fields: str = None) -> dict:
+        """
+        Retrieve the authenticated user's profile. See ``habitica_manage.Tools.get_user_profile``.
+        """
+        return await self._call(self.manage.get_user_profile, user_fields)
+
+    async def get_profile_fields(self, fields: list) -> dict:
+        """
+        Retrieve selected parts of the user document. See ``habitica_manage.Tools.get_profile_fields``.
+        """
+        return await self._run(self.manage.get_profile_fields, fields)
+
+    async def get_stats(self) -> dict:
+        """
+        Retrieve the user's stats. See ``habitica_manage.Tools.get_stats``.
+        """
+        return await self._run(self.manage.get_stats)
+
+    async def get_gold(self) -> dict:
+        """
+        Retrieve the user's current gold. See ``habitica_manage.Tools.get_gold``.
+        """
+        return await self._run(self.manage.get_gold)
+
+    async def get_party_id(self) -> dict:
+        """
+        Retrieve the ID of the user's party. See ``habitica_manage.Tools.get_party_id``.
+        """
+        return await self._run(self.manage.get_party_id)
+
+    async def get_user_groups(self, group_types: list, paginate: bool = False, page: int = 0) -> dict:
+        """
+        Retrieve the user's groups. See ``habitica_manage.Tools.get_user_groups``.
+        """
+        return await self._call(self.manage.get_user_groups, group_types, paginate, page)
+
+    async def get_group_chat(self, group_id: str = "party") -> dict:
+        """
+        Retrieve a group's chat. See ``habitica_manage.Tools.get_group_chat``.
+        """
+        return await self._call(self.manage.get_group_chat, group_id)
+
+    async def get_new_chat_messages(self, group_id: str = "party") -> dict:
+        """
+        Retrieve a group's messages posted since the previous call. See ``habitica_manage.Tools.get_new_chat_messages``.
+        """
+        return await self._call(self.manage.get_new_chat_messages, group_id)
+
+    async def export_user_data_json(self) -> dict:
+        """
+        Export the user's data in JSON format. See ``habitica_manage.Tools.export_user_data_json``.
+        """
+        return await self._call(self.manage.export_user_data_json)
+
+    # Tags and skills
+
+    async def create_tag(self, name: str) -> dict:
+        """
+        Create a new tag. See ``habitica_tags_skills.Tools.create_tag``.
+        """
+        return await self._call(self.tags_skills.create_tag, name)
+
+    async def list_tags(self) -> dict:
+        """
+        List all tags for the authenticated user. See ``habitica_tags_skills.Tools.list_tags``.
+        """
+        return await self._call(self.tags_skills.list_tags)
+
+    async def resolve_tags(self, names: list, create: bool = False, ignore_missing: bool = False) -> dict:
+        """
+        Resolve tag names to tag IDs. See ``habitica_tags_skills.Tools.resolve_tags``.
+        """
+        return await self._run(self.tags_skills.resolve_tags, names, create, ignore_missing)
+
+    async def cast_skill(self, spell_id: str, target_id: str = None) -> dict:
+        """
+        Cast a skill. See ``habitica_tags_skills.Tools.cast_skill``.
+        """
+        return await self._call(self.tags_skills.cast_skill, spell_id, target_id)
+
+    async def cast_skills(self, casts: list, dry_run: bool = False) -> dict:
+        """
+        Cast several skills in order within the user's mana. See ``habitica_tags_skills.Tools.cast_skills``.
+        """
+        return await self._run(self.tags_skills.cast_skills, casts, dry_run)
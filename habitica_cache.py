@@ -0,0 +1,211 @@
+# habitica_cache.py
+"""
+In-process cache of the user's Habitica tasks.
+
+Tasks are indexed by ``_id`` and alias. The cache is filled by ``list_tasks`` and
+kept current by the task responses of create/update/checklist calls, so recent
+reads can be answered locally until their TTL expires. Each listing also keeps
+the ETag Habitica sent, allowing a conditional refresh that skips the download
+when nothing changed.
+"""
+import os
+import threading
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_TTL = float(os.environ.get("HABITICA_TASK_CACHE_TTL", "30"))
+
+# Listing keys a task of each type belongs to; None is the unfiltered list_tasks() call.
+LISTINGS_BY_TYPE = {
+    "habit": ("habits", None),
+    "daily": ("dailys", None),
+    "todo": ("todos", None),
+    "reward": ("rewards", None),
+}
+
+
+class TaskCache:
+    """
+    Thread-safe task cache with per-entry TTL.
+
+    :param ttl: Seconds a cached task or listing is considered fresh. 0 disables cached reads
+        while still tracking ETags.
+    """
+
+    def __init__(self, ttl: float = None):
+        self.ttl = DEFAULT_TTL if ttl is None else ttl
+        self._tasks = {}
+        self._aliases = {}
+        self._listings = {}
+        self._lock = threading.RLock()
+        # Incremented whenever cached task contents change, so derived indexes know to rebuild.
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def _fresh(self, stored_at: float) -> bool:
+        return self.ttl > 0 and time.monotonic() - stored_at < self.ttl
+
+    def _store(self, task: dict, now: float) -> None:
+        task_id = task.get("_id") or task.get("id")
+        if not task_id:
+            return
+        previous = self._tasks.get(task_id)
+        if previous and previous[0].get("alias") and previous[0].get("alias") != task.get("alias"):
+            self._aliases.pop(previous[0]["alias"], None)
+        self._tasks[task_id] = (task, now)
+        if task.get("alias"):
+            self._aliases[task["alias"]] = task_id
+
+    def get(self, key: str):
+        """
+        Return the cached task for an ID or alias if it is still fresh, else None.
+        """
+        with self._lock:
+            entry = self._tasks.get(self._aliases.get(key, key))
+            if entry and self._fresh(entry[1]):
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, task: dict, new: bool = False) -> None:
+        """
+        Store a task returned by Habitica, replacing any older copy.
+
+        :param new: True for freshly created tasks, which are also appended to the
+            cached listings of their type.
+        """
+        if not isinstance(task, dict):
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._store(task, now)
+            self.version += 1
+            if new:
+                task_id = task.get("_id") or task.get("id")
+                for key in LISTINGS_BY_TYPE.get(task.get("type"), ()):
+                    listing = self._listings.get(key)
+                    if listing is not None and task_id not in listing["ids"]:
+                        listing["ids"].append(task_id)
+
+    def get_listing(self, task_type: str = None):
+        """
+        Return the cached tasks of a list_tasks call if the listing is fresh, else None.
+        """
+        with self._lock:
+            listing = self._listings.get(task_type)
+            if listing is None or not self._fresh(listing["fetched_at"]):
+                self.misses += 1
+                return None
+            tasks = self._listing_tasks(listing)
+            if tasks is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return tasks
+
+    def listing_is_fresh(self, task_type: str = None) -> bool:
+        """
+        Return whether a listing could be served from the cache, without counting a hit.
+        """
+        with self._lock:
+            listing = self._listings.get(task_type)
+            return listing is not None and self._fresh(listing["fetched_at"])
+
+    def _listing_tasks(self, listing: dict):
+        tasks = []
+        for task_id in listing["ids"]:
+            entry = self._tasks.get(task_id)
+            if entry is None:
+                return None
+            tasks.append(entry[0])
+        return tasks
+
+    def listing_etag(self, task_type: str = None):
+        """
+        Return the ETag of a cached listing whose tasks are all still held, else None.
+        """
+        with self._lock:
+            listing = self._listings.get(task_type)
+            if listing is None or self._listing_tasks(listing) is None:
+                return None
+            return listing["etag"]
+
+    def store_listing(self, task_type: str, tasks: list, etag: str = None) -> None:
+        """
+        Replace a listing with the tasks Habitica returned for it.
+
+        The unfiltered listing holds every active task, so it also replaces the per-type
+        listings ("habits", "dailys", "todos", "rewards"); those have no ETag of their own.
+        """
+        with self._lock:
+            now = time.monotonic()
+            for task in tasks:
+                self._store(task, now)
+            self.version += 1
+            self._listings[task_type] = {
+                "ids": [task.get("_id") or task.get("id") for task in tasks],
+                "etag": etag,
+                "fetched_at": now,
+            }
+            if task_type is None:
+                by_type = {keys[0]: [] for keys in LISTINGS_BY_TYPE.values()}
+                for task in tasks:
+                    keys = LISTINGS_BY_TYPE.get(task.get("type"))
+                    if keys:
+                        by_type[keys[0]].append(task.get("_id") or task.get("id"))
+                for key, ids in by_type.items():
+                    self._listings[key] = {"ids": ids, "etag": None, "fetched_at": now}
+
+    def revalidate_listing(self, task_type: str = None):
+        """
+        Mark a listing and its tasks fresh after a 304 Not Modified and return its tasks.
+        """
+        with self._lock:
+            listing = self._listings.get(task_type)
+            if listing is None:
+                return None
+            tasks = self._listing_tasks(listing)
+            if tasks is None:
+                return None
+            now = time.monotonic()
+            listing["fetched_at"] = now
+            for task in tasks:
+                self._store(task, now)
+            self.not_modified += 1
+            return tasks
+
+    def invalidate(self, key: str = None) -> None:
+        """
+        Drop one task (by ID or alias) and the listings that contain it, or everything if no key is given.
+        """
+        with self._lock:
+            self.version += 1
+            if key is None:
+                self._tasks.clear()
+                self._aliases.clear()
+                self._listings.clear()
+                return
+            task_id = self._aliases.pop(key, key)
+            entry = self._tasks.pop(task_id, None)
+            if entry and entry[0].get("alias"):
+                self._aliases.pop(entry[0]["alias"], None)
+            for task_type in [t for t, listing in self._listings.items() if task_id in listing["ids"]]:
+                del self._listings[task_type]
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss counters and the number of cached tasks and listings.
+        """
+        with self._lock:
+            return {
+                "tasks": len(self._tasks),
+                "listings": len(self._listings),
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+            }
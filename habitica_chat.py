@@ -0,0 +1,227 @@
+# habitica_chat.py
+"""
+Incremental reader for Habitica group chat.
+
+Habitica's chat endpoint (``GET /groups/:groupId/chat``) has no "since" parameter:
+every call returns the group's whole recent chat, newest first. ``ChatReader``
+remembers, per group, the newest message it has seen (ID and timestamp) and the
+ETag of the last response, so each poll is a conditional request that costs no
+download while the chat is unchanged and hands back only the messages posted since.
+
+Polling is adaptive: a group that just had new messages is polled again after
+``min_interval`` seconds; each poll without new messages multiplies its interval
+by ``backoff`` up to ``max_interval``. The newest ``buffer_size`` messages of each
+group are kept in a ring buffer for callers that need recent context.
+
+    reader = ChatReader(tools._fetch_group_chat)
+    for group_id, message in reader.stream(["party"]):
+        print(message["user"], message["text"])
+"""
+import os
+import threading
+import time
+import logging
+from collections import deque
+from datetime import datetime
+import habitica_lazy
+
+requests = habitica_lazy.lazy_import("requests")
+
+logging.basicConfig(level=logging.INFO)
+
+# Seconds between polls of a group while it is active, and the longest wait once it is idle.
+DEFAULT_MIN_INTERVAL = float(os.environ.get("HABITICA_CHAT_MIN_INTERVAL", "5"))
+DEFAULT_MAX_INTERVAL = float(os.environ.get("HABITICA_CHAT_MAX_INTERVAL", "120"))
+# Factor the interval grows by after each poll without new messages.
+DEFAULT_BACKOFF = 2.0
+# Recent messages kept in memory per group.
+DEFAULT_BUFFER_SIZE = int(os.environ.get("HABITICA_CHAT_BUFFER_SIZE", "200"))
+
+
+def message_time(message: dict) -> float:
+    """
+    Return a chat message's timestamp in Unix seconds (0 if it has none).
+
+    Habitica sends milliseconds since the epoch; exports and older messages use ISO 8601.
+    """
+    value = message.get("timestamp")
+    if isinstance(value, (int, float)):
+        return value / 1000
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return 0
+    return 0
+
+
+class _GroupState:
+    __slots__ = ("last_id", "last_time", "etag", "interval", "due", "buffer")
+
+    def __init__(self, interval: float, buffer_size: int):
+        self.last_id = None
+        self.last_time = None
+        self.etag = None
+        self.interval = interval
+        self.due = 0.0
+        self.buffer = deque(maxlen=buffer_size)
+
+
+class ChatReader:
+    """
+    Track the chat of one or more groups and return only messages not seen before.
+
+    :param fetch: Callable ``fetch(group_id, etag) -> (messages, etag)`` that returns the chat
+        newest first, or ``(None, etag)`` when Habitica answered 304 Not Modified, and raises
+        ``requests.exceptions.RequestException`` on failure.
+    :param min_interval: Seconds between polls of a group that just had new messages.
+    :param max_interval: Longest wait between polls of an idle group.
+    :param backoff: Factor the interval grows by after each poll without new messages.
+    :param buffer_size: Recent messages kept per group.
+    :param include_existing: Whether the first poll of a group returns the messages already
+        in its chat; if False they only mark the starting point.
+    """
+
+    def __init__(self, fetch, min_interval: float = DEFAULT_MIN_INTERVAL, max_interval: float = DEFAULT_MAX_INTERVAL,
+                 backoff: float = DEFAULT_BACKOFF, buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 include_existing: bool = True):
+        self._fetch = fetch
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.backoff = backoff
+        self.buffer_size = buffer_size
+        self.include_existing = include_existing
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def _state(self, group_id: str) -> _GroupState:
+        state = self._groups.get(group_id)
+        if state is None:
+            state = self._groups[group_id] = _GroupState(self.min_interval, self.buffer_size)
+        return state
+
+    def poll(self, group_id: str) -> list:
+        """
+        Fetch a group's chat once and return the messages posted since the previous poll, oldest first.
+
+        :raises requests.exceptions.RequestException: If the chat cannot be fetched.
+        """
+        with self._lock:
+            state = self._state(group_id)
+            etag, first = state.etag, state.last_time is None
+        messages, etag = self._fetch(group_id, etag)
+        with self._lock:
+            state.etag = etag
+            new = [] if messages is None else self._unseen(state, messages)
+            if new:
+                state.last_id = new[0].get("id")
+                state.last_time = max(state.last_time or 0, message_time(new[0]))
+            elif messages is not None and state.last_time is None:
+                state.last_time = 0
+            new.reverse()
+            state.buffer.extend(new)
+            if new and not (first and not self.include_existing):
+                state.interval = self.min_interval
+            else:
+                state.interval = min(state.interval * self.backoff, self.max_interval)
+            state.due = time.monotonic() + state.interval
+        if first and not self.include_existing:
+            return []
+        return new
+
+    @staticmethod
+    def _unseen(state: _GroupState, messages: list) -> list:
+        """
+        Return the messages newer than the last seen one, newest first.
+        """
+        if state.last_id is None:
+            return list(messages)
+        for index, message in enumerate(messages):
+            if message.get("id") == state.last_id:
+                return list(messages[:index])
+        # The last seen message was deleted or scrolled out of the chat; fall back to timestamps.
+        return [message for message in messages if message_time(message) > state.last_time]
+
+    def recent(self, group_id: str, limit: int = None) -> list:
+        """
+        Return the buffered messages of a group, oldest first.
+
+        :param limit: Return only the newest ``limit`` messages.
+        """
+        with self._lock:
+            buffer = list(self._groups[group_id].buffer) if group_id in self._groups else []
+        return buffer[-limit:] if limit else buffer
+
+    def interval(self, group_id: str) -> float:
+        """
+        Return the current polling interval of a group in seconds.
+        """
+        with self._lock:
+            return self._state(group_id).interval
+
+    def reset(self, group_id: str = None) -> None:
+        """
+        Forget what has been seen in a group, or in every group.
+        """
+        with self._lock:
+            if group_id is None:
+                self._groups.clear()
+            else:
+                self._groups.pop(group_id, None)
+
+    def stream(self, group_ids: list, stop_when=None, max_polls: int = None, stop_event: threading.Event = None):
+        """
+        Poll groups on their adaptive schedules and yield each new message as it is seen.
+
+        A failed poll is logged and the group is backed off like an idle one, so a transient
+        outage does not end the stream; a group that does not exist (404) does.
+
+        :param group_ids: Group IDs to follow ("party" and "habitrpg" are accepted).
+        :param stop_when: Optional callable ``stop_when(group_id, message) -> bool``; the stream
+            ends after the first message it returns True for.
+        :param max_polls: Stop after this many polls in total.
+        :param stop_event: Optional ``threading.Event`` that ends the stream when set, also during a wait.
+
+        :return: Generator of ``(group_id, message)`` tuples, oldest message first within a group.
+        :raises requests.exceptions.HTTPError: If a group is not found.
+        """
+        with self._lock:
+            for group_id in group_ids:
+                self._state(group_id)
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            with self._lock:
+                group_id = min(group_ids, key=lambda g: self._groups[g].due)
+                wait = self._groups[group_id].due - time.monotonic()
+            if wait > 0:
+                if stop_event is not None:
+                    if stop_event.wait(wait):
+                        return
+                else:
+                    time.sleep(wait)
+            if stop_event is not None and stop_event.is_set():
+                return
+            polls += 1
+            try:
+                messages = self.poll(group_id)
+            except requests.exceptions.HTTPError as e:
+                if e.response is not None and e.response.status_code == 404:
+                    raise
+                logging.error(f"Polling chat of group {group_id} failed: {e}")
+                self._back_off(group_id)
+                continue
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Polling chat of group {group_id} failed: {e}")
+                self._back_off(group_id)
+                continue
+            for message in messages:
+                matched = stop_when is not None and stop_when(group_id, message)
+                yield group_id, message
+                if matched:
+                    return
+
+    def _back_off(self, group_id: str) -> None:
+        with self._lock:
+            state = self._state(group_id)
+            state.interval = min(state.interval * self.backoff, self.max_interval)
+            state.due = time.monotonic() + state.interval
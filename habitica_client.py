@@ -0,0 +1,438 @@
+# habitica_client.py
+"""
+Shared HTTP client layer used by every Habitica tool module.
+
+All ``Tools`` classes send their requests through one pooled ``requests.Session``
+so that TCP/TLS connections to habitica.com are kept alive and reused instead of
+being re-established for every call.
+"""
+import os
+import copy
+import random
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import habitica_json
+import habitica_lazy
+import habitica_metrics
+import habitica_ratelimit
+
+requests = habitica_lazy.lazy_import("requests")
+urllib3 = habitica_lazy.lazy_import("urllib3")
+
+logging.basicConfig(level=logging.INFO)
+
+# Number of per-host connection pools kept alive (habitica.com plus the export host).
+DEFAULT_POOL_CONNECTIONS = int(os.environ.get("HABITICA_POOL_CONNECTIONS", "4"))
+# Maximum number of keep-alive connections held open to a single host.
+DEFAULT_POOL_MAXSIZE = int(os.environ.get("HABITICA_POOL_MAXSIZE", "10"))
+# When true, callers wait for a free connection instead of exceeding the per-host limit.
+DEFAULT_POOL_BLOCK = os.environ.get("HABITICA_POOL_BLOCK", "true").lower() in ("1", "true", "yes")
+# Worker threads shared by the async client and the batch helpers.
+DEFAULT_MAX_WORKERS = int(os.environ.get("HABITICA_MAX_WORKERS", "8"))
+# How many times a call that received 429 Too Many Requests is queued and re-sent.
+DEFAULT_RATE_LIMIT_RETRIES = int(os.environ.get("HABITICA_RATE_LIMIT_RETRIES", "3"))
+# Retries of transient failures (connection errors, timeouts, 502/503/504).
+DEFAULT_MAX_RETRIES = int(os.environ.get("HABITICA_RETRY_MAX", "3"))
+DEFAULT_RETRY_BASE_DELAY = float(os.environ.get("HABITICA_RETRY_BASE_DELAY", "0.5"))
+DEFAULT_RETRY_MAX_DELAY = float(os.environ.get("HABITICA_RETRY_MAX_DELAY", "8"))
+# Total time budget for one call including all retries; no retry starts past it.
+DEFAULT_RETRY_DEADLINE = float(os.environ.get("HABITICA_RETRY_DEADLINE", "30"))
+
+# When true, identical GET requests in flight at the same time share one HTTP call.
+DEFAULT_COALESCE = os.environ.get("HABITICA_COALESCE", "true").lower() in ("1", "true", "yes")
+
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+_session = None
+_session_lock = threading.Lock()
+_executor = None
+_local = threading.local()
+_coalesce = DEFAULT_COALESCE
+_flights = {}
+_flights_lock = threading.Lock()
+_coalesce_stats = {"calls": 0, "saved": 0}
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter and a total deadline.
+
+    The n-th retry sleeps a random time between 0 and ``min(max_delay, base_delay * 2**n)``.
+    """
+
+    def __init__(self, max_retries: int = DEFAULT_MAX_RETRIES, base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+                 max_delay: float = DEFAULT_RETRY_MAX_DELAY, deadline: float = DEFAULT_RETRY_DEADLINE):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def next_delay(self, retries: int, started: float):
+        """
+        Return the backoff before the next retry, or None if no retry is allowed.
+
+        :param retries: Number of retries already made.
+        :param started: ``time.monotonic()`` value when the call started.
+        """
+        if retries >= self.max_retries:
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retries))
+        if time.monotonic() - started + delay > self.deadline:
+            return None
+        return delay
+
+
+retry_policy = RetryPolicy()
+
+_pool_config = {
+    "pool_connections": DEFAULT_POOL_CONNECTIONS,
+    "pool_maxsize": DEFAULT_POOL_MAXSIZE,
+    "pool_block": DEFAULT_POOL_BLOCK,
+}
+
+
+def _build_session() -> "requests.Session":
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=_pool_config["pool_connections"],
+        pool_maxsize=_pool_config["pool_maxsize"],
+        pool_block=_pool_config["pool_block"],
+    )
+    habitica_metrics.install_connection_timing(adapter)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def configure(pool_connections: int = None, pool_maxsize: int = None, pool_block: bool = None) -> dict:
+    """
+    Change the connection pool settings of the shared session.
+
+    The current session is closed and a new one is built lazily on the next request.
+
+    :param pool_connections: Number of per-host pools to keep alive.
+    :param pool_maxsize: Maximum number of connections kept open to a single host.
+    :param pool_block: Whether callers wait for a free connection once a host reaches pool_maxsize.
+    :return: Dictionary with the pool settings now in effect.
+    """
+    global _session
+    for name, value in (("pool_connections", pool_connections), ("pool_maxsize", pool_maxsize)):
+        if value is not None and (not isinstance(value, int) or value <= 0):
+            raise ValueError(f"{name} must be a positive integer.")
+    with _session_lock:
+        if pool_connections is not None:
+            _pool_config["pool_connections"] = pool_connections
+        if pool_maxsize is not None:
+            _pool_config["pool_maxsize"] = pool_maxsize
+        if pool_block is not None:
+            _pool_config["pool_block"] = bool(pool_block)
+        if _session is not None:
+            _session.close()
+            _session = None
+        return dict(_pool_config)
+
+
+def get_session() -> "requests.Session":
+    """
+    Return the process-wide pooled session, creating it on first use.
+    """
+    global _session
+    session = _session
+    if session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+            session = _session
+    return session
+
+
+def _never_sent(error: Exception) -> bool:
+    """
+    Return whether a request failed before any bytes reached the server.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], "reason", None), urllib3.exceptions.NewConnectionError)
+    return False
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Return whether a request exception is worth retrying (connection problems and timeouts).
+    """
+    if isinstance(error, (habitica_ratelimit.RateLimitExceeded, requests.exceptions.SSLError)):
+        return False
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+class _Flight:
+    """
+    One in-flight GET request that identical concurrent requests wait on.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+def _flight_key(method: str, url: str, kwargs: dict):
+    """
+    Return the key identifying identical read requests, or None if the request must not be shared.
+    """
+    if method.upper() != "GET" or kwargs.get("stream") or set(kwargs) - {"headers", "params", "timeout"}:
+        return None
+    params = kwargs.get("params") or {}
+    headers = kwargs.get("headers") or {}
+    try:
+        return (url, tuple(sorted(dict(params).items())), tuple(sorted(headers.items())))
+    except (TypeError, ValueError):
+        return None
+
+
+def request(method: str, url: str, limiter: habitica_ratelimit.RateLimiter = None, idempotent: bool = None,
+            **kwargs) -> "requests.Response":
+    """
+    Send an HTTP request through the shared pooled session.
+
+    The call is timed and recorded in ``habitica_metrics`` unless metrics are disabled.
+    Identical GET requests (same URL, params and headers) made while one of them is
+    in flight are coalesced: only the first is sent, and the others wait for it and
+    receive a copy of its response (their ``call_meta`` contains ``"coalesced": True``)
+    or its exception. All other behaviour is described in ``_send``.
+    """
+    if not habitica_metrics.is_enabled():
+        return _shared_request(method, url, limiter, idempotent, **kwargs)
+    with habitica_metrics.RequestTimer(method, url, kwargs.get("stream", False)) as timer:
+        timer.response = _shared_request(method, url, limiter, idempotent, **kwargs)
+        return timer.response
+
+
+def _shared_request(method: str, url: str, limiter: habitica_ratelimit.RateLimiter = None, idempotent: bool = None,
+                    **kwargs) -> "requests.Response":
+    key = _flight_key(method, url, kwargs) if _coalesce else None
+    if key is None:
+        return _send(method, url, limiter, idempotent, **kwargs)
+
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+            _coalesce_stats["calls"] += 1
+        else:
+            _coalesce_stats["saved"] += 1
+
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        response = copy.copy(flight.response)
+        response.habitica_meta = {"rate_limit_wait": 0.0, "throttled": 0, "retries": 0, "backoff": 0.0,
+                                  "coalesced": True}
+        return response
+
+    try:
+        flight.response = _send(method, url, limiter, idempotent, **kwargs)
+        return flight.response
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def configure_coalescing(enabled: bool) -> None:
+    """
+    Turn sharing of identical in-flight GET requests on or off.
+    """
+    global _coalesce
+    _coalesce = enabled
+
+
+def coalesce_stats() -> dict:
+    """
+    Return how many GET requests were sent through the single-flight layer and how many
+    HTTP calls were saved by sharing them.
+
+    Example:
+        {"calls": 12, "saved": 5}
+    """
+    with _flights_lock:
+        return dict(_coalesce_stats)
+
+
+def _send(method: str, url: str, limiter: habitica_ratelimit.RateLimiter = None, idempotent: bool = None,
+          **kwargs) -> "requests.Response":
+    """
+    Send an HTTP request, pacing it with the rate limiter and retrying transient failures.
+
+    Accepts the same keyword arguments as ``requests.request`` and returns the
+    ``requests.Response`` unchanged, so callers keep their existing error handling.
+    Each call first takes a token from the user's rate limiter (selected by the
+    ``x-api-user`` header unless ``limiter`` is given); a 429 response is queued
+    until the reset and re-sent. Idempotent calls are retried after connection
+    errors, timeouts and 502/503/504 responses according to ``retry_policy``;
+    other calls are only retried when the request never reached the server.
+    Wait, retry and backoff figures are recorded in ``call_meta(response)``, and
+    ``response.json()`` decodes with the backend selected in ``habitica_json``.
+
+    :param idempotent: Whether the request may safely be repeated. Defaults to True for
+        GET, HEAD, OPTIONS, PUT and DELETE.
+    :raises habitica_ratelimit.RateLimitExceeded: If the call would queue longer than the configured maximum.
+    """
+    session = get_session()
+    policy = retry_policy
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+    if limiter is None and habitica_ratelimit.is_enabled():
+        limiter = habitica_ratelimit.get_rate_limiter((kwargs.get("headers") or {}).get("x-api-user"))
+    started = time.monotonic()
+    waited = 0.0
+    backoff = 0.0
+    throttled = 0
+    retries = 0
+    prepaid = getattr(_local, "prepaid", None)
+    while True:
+        if limiter is None:
+            pass
+        elif prepaid is not None and prepaid[0] is limiter:
+            _local.prepaid = None
+            waited += prepaid[1]
+            prepaid = None
+        else:
+            waited += limiter.acquire()
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            if limiter is not None:
+                limiter.release()
+            if not (is_transient(e) and (idempotent or _never_sent(e))):
+                raise
+            delay = policy.next_delay(retries, started)
+            if delay is None:
+                raise
+            logging.info(f"{method} {url} failed ({e}); retry {retries + 1} in {delay:.2f}s.")
+        else:
+            if limiter is not None:
+                limiter.update(response.headers, response.status_code)
+                if response.status_code == 429 and throttled < DEFAULT_RATE_LIMIT_RETRIES:
+                    throttled += 1
+                    logging.info(f"Rate limited (429) on {method} {url}; queueing retry {throttled}.")
+                    continue
+            if response.status_code not in RETRY_STATUSES or not idempotent:
+                break
+            delay = policy.next_delay(retries, started)
+            if delay is None:
+                break
+            response.close()
+            logging.info(f"{method} {url} returned {response.status_code}; retry {retries + 1} in {delay:.2f}s.")
+        retries += 1
+        backoff += delay
+        time.sleep(delay)
+    response.habitica_meta = {
+        "rate_limit_wait": round(waited, 3),
+        "throttled": throttled,
+        "retries": retries,
+        "backoff": round(backoff, 3),
+    }
+    return habitica_json.install(response)
+
+
+def configure_retries(max_retries: int = None, base_delay: float = None, max_delay: float = None,
+                      deadline: float = None) -> dict:
+    """
+    Change the retry policy used for transient failures.
+
+    :param max_retries: Maximum number of retries per call (0 disables retries).
+    :param base_delay: Backoff cap in seconds for the first retry; doubles on each retry.
+    :param max_delay: Upper bound in seconds for a single backoff.
+    :param deadline: Total seconds a call may take before no further retry is started.
+    :return: Dictionary with the policy now in effect.
+    """
+    global retry_policy
+    current = retry_policy
+    retry_policy = RetryPolicy(
+        current.max_retries if max_retries is None else max_retries,
+        current.base_delay if base_delay is None else base_delay,
+        current.max_delay if max_delay is None else max_delay,
+        current.deadline if deadline is None else deadline,
+    )
+    return dict(vars(retry_policy))
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Return the process-wide worker pool used to run blocking calls concurrently.
+    """
+    global _executor
+    with _session_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS, thread_name_prefix="habitica")
+        return _executor
+
+
+def map_concurrent(func, items: list) -> list:
+    """
+    Apply ``func`` to every item on the shared worker pool and return the results in order.
+
+    Items that no worker has picked up yet are run in the calling thread instead,
+    so nested calls (e.g. a batch started from a pool thread) cannot deadlock the pool.
+    ``func`` is expected to report its own errors in its return value.
+    """
+    executor = get_executor()
+    futures = [executor.submit(func, item) for item in items]
+    results = []
+    for future, item in zip(futures, items):
+        if future.cancel():
+            results.append(func(item))
+        else:
+            results.append(future.result())
+    return results
+
+
+def run_prepaid(limiter: habitica_ratelimit.RateLimiter, wait: float, func, *args, **kwargs):
+    """
+    Call ``func`` with a rate-limit token that was already reserved from ``limiter``.
+
+    The first request ``func`` sends uses the reservation instead of taking a new
+    token, so callers that waited for their slot elsewhere (e.g. with
+    ``asyncio.sleep``) are not charged twice. An unused reservation is refunded.
+    """
+    _local.prepaid = (limiter, wait)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        if getattr(_local, "prepaid", None) is not None:
+            _local.prepaid = None
+            limiter.release(refund=True)
+
+
+def call_meta(response: "requests.Response") -> dict:
+    """
+    Return the metadata recorded for a response sent through ``request``.
+
+    Example:
+        {"rate_limit_wait": 1.25, "throttled": 0, "retries": 1, "backoff": 0.31}
+    """
+    return dict(getattr(response, "habitica_meta", None) or {})
+
+
+def close() -> None:
+    """
+    Close the shared session and worker pool and drop all pooled connections.
+    """
+    global _session, _executor
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
@@ -0,0 +1,240 @@
+# habitica_json.py
+"""
+JSON decoding backends and a lazy view of response bodies.
+
+Every response from ``habitica_client.request`` decodes its body with the fastest
+available backend: orjson when it is installed, otherwise the standard library.
+``HABITICA_JSON_BACKEND`` ("auto", "orjson", "simdjson" or "json") or ``configure``
+selects a backend explicitly.
+
+``lazy(response)`` returns a ``LazyJSON`` view for callers that only read a few
+fields of a large body (the user document, a full task listing). Nothing is
+decoded until the first access, and with pysimdjson installed only the accessed
+sub-objects are converted to Python objects; other backends decode the body once,
+on first access.
+"""
+import os
+import json
+import threading
+import logging
+from collections.abc import Mapping
+import habitica_lazy
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+requests = habitica_lazy.lazy_import("requests")
+
+logging.basicConfig(level=logging.INFO)
+
+BACKENDS = ("auto", "orjson", "simdjson", "json")
+DEFAULT_BACKEND = os.environ.get("HABITICA_JSON_BACKEND", "auto").lower()
+
+
+def _json_loads(data):
+    return json.loads(data)
+
+
+def _orjson_loads(data):
+    return orjson.loads(data)
+
+
+def _simdjson_loads(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return simdjson.Parser().parse(data, True)
+
+
+def _simdjson_parse(data):
+    """
+    Parse into simdjson proxies, which convert values to Python objects only when read.
+    Returns the parser too: the proxies are only valid while it is alive.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    parser = simdjson.Parser()
+    return parser, parser.parse(data)
+
+
+_LOADERS = {"json": _json_loads, "orjson": _orjson_loads, "simdjson": _simdjson_loads}
+_AVAILABLE = {"json": True, "orjson": orjson is not None, "simdjson": simdjson is not None}
+
+backend = "json"
+_loads = _json_loads
+
+
+def available_backends() -> list:
+    """
+    Return the names of the installed backends, fastest first.
+    """
+    return [name for name in ("orjson", "simdjson", "json") if _AVAILABLE[name]]
+
+
+def configure(name: str = None) -> str:
+    """
+    Select the JSON backend used to decode responses.
+
+    :param name: "auto" (orjson, then simdjson, then the standard library), "orjson",
+        "simdjson" or "json". Defaults to ``HABITICA_JSON_BACKEND``.
+    :return: Name of the backend now in use. An unavailable backend falls back to "json"
+        with a log message.
+    """
+    global backend, _loads
+    name = (name or DEFAULT_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend: {name}. Use one of {', '.join(BACKENDS)}.")
+    if name == "auto":
+        name = available_backends()[0]
+    elif not _AVAILABLE[name]:
+        logging.info(f"JSON backend {name} is not installed; using the standard library.")
+        name = "json"
+    backend, _loads = name, _LOADERS[name]
+    return backend
+
+
+def loads(data):
+    """
+    Decode a JSON document (bytes or str) with the selected backend.
+
+    :raises ValueError: If the document is not valid JSON.
+    """
+    return _loads(data)
+
+
+def dumps(obj) -> str:
+    """
+    Encode an object as compact JSON text.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode("utf-8")
+        except TypeError:
+            # orjson rejects non-string keys and integers beyond 64 bits; the standard library does not.
+            pass
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def response_json(response: "requests.Response", **kwargs):
+    """
+    Decode a response body with the selected backend; drop-in replacement for ``Response.json``.
+
+    Bodies the fast backend cannot decode (or calls with ``json.loads`` keyword arguments)
+    go through ``requests``, which raises ``requests.exceptions.JSONDecodeError`` as usual.
+    """
+    if kwargs or backend == "json":
+        return requests.Response.json(response, **kwargs)
+    try:
+        return _loads(response.content)
+    except ValueError:
+        return requests.Response.json(response)
+
+
+def install(response: "requests.Response") -> "requests.Response":
+    """
+    Make ``response.json()`` use the selected backend.
+    """
+    if backend != "json":
+        response.json = lambda **kwargs: response_json(response, **kwargs)
+    return response
+
+
+def _materialize(value):
+    if simdjson is not None:
+        if isinstance(value, simdjson.Object):
+            return value.as_dict()
+        if isinstance(value, simdjson.Array):
+            return value.as_list()
+    return value
+
+
+class LazyJSON(Mapping):
+    """
+    Read-only mapping over a JSON object that decodes on first access.
+
+    Values are converted to Python objects when they are read and kept for later
+    reads. ``get_path("data.stats.gp")`` reads a nested value; ``materialize()``
+    returns the whole document as plain Python objects.
+
+    :param raw: The JSON document as bytes or str.
+    """
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._parser = None
+        self._root = None
+        self._decoded = False
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _document(self):
+        if not self._decoded:
+            with self._lock:
+                if not self._decoded:
+                    if simdjson is not None:
+                        self._parser, self._root = _simdjson_parse(self._raw)
+                    else:
+                        self._root = _loads(self._raw)
+                    self._raw = None
+                    self._decoded = True
+        return self._root
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        value = _materialize(self._document()[key])
+        self._values[key] = value
+        return value
+
+    def __iter__(self):
+        return iter(self._document().keys())
+
+    def __len__(self) -> int:
+        return len(self._document())
+
+    def get_path(self, path: str, default=None):
+        """
+        Return the value at a dotted path (list indexes as numbers), or ``default`` if it is missing.
+
+        Example: ``body.get_path("data.party._id")``
+        """
+        parts = path.split(".")
+        if parts[0] in self._values:
+            value = self._values[parts[0]]
+        else:
+            value = self._document()
+            parts.insert(0, None)
+        for part in parts[1:]:
+            try:
+                value = value[part]
+            except (KeyError, IndexError, TypeError, ValueError):
+                if not part.isdigit():
+                    return default
+                try:
+                    value = value[int(part)]
+                except (KeyError, IndexError, TypeError, ValueError):
+                    return default
+        return _materialize(value)
+
+    def materialize(self):
+        """
+        Return the whole document as plain Python objects.
+        """
+        return _materialize(self._document())
+
+
+def lazy(response: "requests.Response") -> LazyJSON:
+    """
+    Return a lazy view of a response body.
+    """
+    return LazyJSON(response.content)
+
+
+configure()
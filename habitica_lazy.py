@@ -0,0 +1,55 @@
+# habitica_lazy.py
+"""
+Deferred imports for the HTTP stack.
+
+Importing ``requests`` (and with it urllib3, ssl and http.client) takes most of the
+time needed to import a tool module. Tool hosts that import the modules only to read
+their tool specifications never send a request, so the modules bind ``requests``
+and ``urllib3`` to a ``LazyModule`` placeholder that imports the real module on the
+first attribute access, i.e. on the first real call.
+
+Annotations that name ``requests`` types are written as strings so that defining a
+function does not trigger the import.
+"""
+import sys
+import importlib
+import threading
+import types
+
+_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """
+    Placeholder for a module that is imported when one of its attributes is first read.
+
+    :param name: Fully qualified module name, e.g. "requests".
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_loaded"] = False
+
+    def _load(self) -> types.ModuleType:
+        with _lock:
+            module = importlib.import_module(self.__name__)
+            if not self._loaded:
+                # Copy the module namespace so later reads are plain attribute lookups.
+                self.__dict__.update({k: v for k, v in module.__dict__.items() if k != "__name__"})
+                self.__dict__["_loaded"] = True
+        return module
+
+    def __getattr__(self, name: str):
+        return getattr(self._load(), name)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._loaded else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    Return the module if it is already imported, otherwise a ``LazyModule`` for it.
+    """
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
@@ -3,26 +3,51 @@
 A collection of methods to manage user-related interactions with Habitica's API.
 """
 import os
-import requests
+import habitica_lazy
+import habitica_chat
+import habitica_client
+import habitica_metrics
+import habitica_profile
+import habitica_snapshot
+import habitica_stream
 import logging
 from typing import Union
 
+requests = habitica_lazy.lazy_import("requests")
+
 logging.basicConfig(level=logging.INFO)
 
 HABITICA_USER_ID = os.environ.get("HABITICA_USER_ID")
 HABITICA_API_KEY = os.environ.get("HABITICA_API_KEY")
+# Streaming exports can take minutes in total; the read timeout only bounds the gap between chunks.
+EXPORT_STREAM_TIMEOUT = (10, 60)
+# Public guilds per page when pagination is enabled.
+PUBLIC_GUILDS_PAGE_SIZE = 30
 
+@habitica_metrics.instrument("manage")
 class Tools:
-    def __init__(self):
-        if not HABITICA_USER_ID or not HABITICA_API_KEY:
+    def __init__(self, user_id: str = None, api_key: str = None):
+        # Credentials of the user to act for; default to the HABITICA_USER_ID/HABITICA_API_KEY environment variables.
+        user_id = user_id or HABITICA_USER_ID
+        api_key = api_key or HABITICA_API_KEY
+        if not user_id or not api_key:
             raise ValueError("Habitica credentials are not set in environment variables.")
         self.headers = {
-            "x-api-user": HABITICA_USER_ID,
-            "x-api-key": HABITICA_API_KEY,
+            "x-api-user": user_id,
+            "x-api-key": api_key,
             "Content-Type": "application/json",
-            "x-client": f"{HABITICA_USER_ID}-SessionMemory"
+            "x-client": f"{user_id}-SessionMemory"
         }
         self.base_url = "https://habitica.com/api/v3"
+        self.export_url = "https://habitica.com/export/userdata.json"
+        # Last known full profile from the on-disk snapshot, served until the background refresh completes.
+        self.snapshot = habitica_snapshot.get_store(user_id)
+        self._snapshot_profile = self.snapshot.load_profile() if self.snapshot else None
+        self._snapshot_refresh = None
+        # Per-subtree cache behind get_stats, get_gold, get_party_id and get_profile_fields.
+        self.profile_view = habitica_profile.ProfileView(self._fetch_user_profile)
+        # Last seen message, ETag, polling interval and recent messages of each followed group chat.
+        self.chat_reader = habitica_chat.ChatReader(self._fetch_group_chat)
 
     def user_login(self, username: str, password: str) -> dict:
         """
@@ -62,9 +87,9 @@ class Tools:
             "password": password
         }
         try:
-            response = requests.post(url, headers=self.headers, json=payload, timeout=10)
+            response = habitica_client.request("POST", url, headers=self.headers, json=payload, timeout=10)
             response.raise_for_status()
-            return {"success": True, "data": response.json()}
+            return {"success": True, "data": response.json(), "meta": habitica_client.call_meta(response)}
         except requests.exceptions.RequestException as e:
             logging.error(f"User login failed: {e}")
             return {"success": False, "error": f"Request failed: {e}"}
@@ -99,16 +124,108 @@ class Tools:
         if user_fields and not isinstance(user_fields, str):
             return {"success": False, "error": "user_fields must be a string."}
 
+        snapshot_profile = self._snapshot_profile
+        if not user_fields and snapshot_profile is not None:
+            refresh = self._snapshot_refresh
+            # Start a refresh, or a new one if the last failed, so an outage at startup is not permanent.
+            if refresh is None or refresh.done() and (refresh.exception() or not refresh.result()["success"]):
+                self._snapshot_refresh = habitica_client.get_executor().submit(self._fetch_user_profile)
+            return {"success": True, "data": snapshot_profile, "meta": {"cache": "snapshot"}}
+        return self._fetch_user_profile(user_fields)
+
+    def _fetch_user_profile(self, user_fields: str = None) -> dict:
         url = f"{self.base_url}/user"
         params = {"userFields": user_fields} if user_fields else {}
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
+            response = habitica_client.request("GET", url, headers=self.headers, params=params, timeout=10)
             response.raise_for_status()
-            return {"success": True, "data": response.json()}
+            response_data = response.json()
+            if not user_fields:
+                if self.snapshot:
+                    self.snapshot.save_profile(response_data)
+                self._snapshot_profile = None
+                self.profile_view.store(response_data.get("data"))
+            return {"success": True, "data": response_data, "meta": habitica_client.call_meta(response)}
         except requests.exceptions.RequestException as e:
             logging.error(f"Get user profile failed: {e}")
             return {"success": False, "error": f"Request failed: {e}"}
 
+    def get_profile_fields(self, fields: list) -> dict:
+        """
+        Retrieve selected parts of the user document, requesting only the fields that are not cached.
+
+        Each top-level subtree is cached with its own TTL (``habitica_profile.FIELD_TTLS``), and
+        requests made while a profile fetch is in flight are merged into one ``userFields`` call.
+
+        :param fields: Dotted paths into the user document.
+            Example: ["stats.gp", "stats.hp", "party._id"]
+
+        :return: Dictionary with success status and a ``{path: value}`` mapping or error message.
+            Example success response:
+            {
+                "success": true,
+                "data": {"stats.gp": 125.5, "stats.hp": 42, "party._id": "group-id"},
+                "meta": {"cache": "miss", "fields": "party._id,stats.gp,stats.hp"}
+            }
+
+            Example error response:
+            {
+                "success": false,
+                "error": "Request failed: <error details>"
+            }
+        """
+        if not fields or not isinstance(fields, list) or not all(isinstance(f, str) and f for f in fields):
+            return {"success": False, "error": "fields must be a non-empty list of strings."}
+        return self.profile_view.get(fields)
+
+    def _profile_value(self, path: str) -> dict:
+        result = self.profile_view.get([path])
+        if not result["success"]:
+            return result
+        return {"success": True, "data": result["data"][path], "meta": result["meta"]}
+
+    def get_stats(self) -> dict:
+        """
+        Retrieve the user's stats (hp, mp, exp, gp, lvl, class, ...) without downloading the full profile.
+
+        :return: Dictionary with success status and the stats object or error message.
+            Example success response:
+            {
+                "success": true,
+                "data": {"hp": 50, "mp": 32, "exp": 120, "gp": 125.5, "lvl": 12, "class": "wizard", ...},
+                "meta": {"cache": "hit"}
+            }
+        """
+        return self._profile_value("stats")
+
+    def get_gold(self) -> dict:
+        """
+        Retrieve the user's current gold.
+
+        :return: Dictionary with success status and the gold amount or error message.
+            Example success response:
+            {
+                "success": true,
+                "data": 125.5,
+                "meta": {"cache": "miss", "fields": "stats.gp"}
+            }
+        """
+        return self._profile_value("stats.gp")
+
+    def get_party_id(self) -> dict:
+        """
+        Retrieve the ID of the user's party.
+
+        :return: Dictionary with success status and the party ID (None if the user has no party) or error message.
+            Example success response:
+            {
+                "success": true,
+                "data": "group-id-123",
+                "meta": {"cache": "miss", "fields": "party._id"}
+            }
+        """
+        return self._profile_value("party._id")
+
     def get_user_groups(self, group_types: list, paginate: bool = False, page: int = 0) -> dict:
         """
         Retrieve user's groups from Habitica.
@@ -168,9 +285,9 @@ class Tools:
 
         url = f"{self.base_url}/groups"
         try:
-            response = requests.get(url, headers=self.headers, params=query_params, timeout=10)
+            response = habitica_client.request("GET", url, headers=self.headers, params=query_params, timeout=10)
             response.raise_for_status()
-            return {"success": True, "data": response.json()["data"]}
+            return {"success": True, "data": response.json()["data"], "meta": habitica_client.call_meta(response)}
         except requests.exceptions.HTTPError as e:
             if response.status_code == 400:
                 error_data = response.json()
@@ -183,6 +300,100 @@ class Tools:
             logging.error(f"Get user groups request exception: {e}")
             return {"success": False, "error": f"Request failed: {e}"}
 
+    def _fetch_guild_page(self, page: int) -> list:
+        url = f"{self.base_url}/groups"
+        params = {"type": "publicGuilds", "paginate": "true", "page": page}
+        response = habitica_client.request("GET", url, headers=self.headers, params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()["data"]
+
+    def get_group_chat(self, group_id: str = "party") -> dict:
+        """
+        Retrieve the chat messages of a group.
+
+        :param group_id: (optional, default "party") The group ID; "party" for the user's party
+            and "habitrpg" for the Tavern are accepted.
+
+        :return: Dictionary with success status and the messages, newest first, or error message.
+            Example success response:
+            {
+                "success": True,
+                "data": [
+                    {
+                        "id": "message-id-123",
+                        "text": "Hello party!",
+                        "timestamp": 1743000000000,
+                        "user": "ExampleUser",
+                        "uuid": "user-id-123",
+                        "groupId": "group-id-123",
+                        ...
+                    },
+                    ...
+                ]
+            }
+            Example error response:
+            {
+                "success": False,
+                "error": "Group not found."
+            }
+        """
+        if not group_id or not isinstance(group_id, str):
+            return {"success": False, "error": "group_id must be a non-empty string."}
+        url = f"{self.base_url}/groups/{group_id}/chat"
+        try:
+            response = habitica_client.request("GET", url, headers=self.headers, timeout=10)
+            response.raise_for_status()
+            return {"success": True, "data": response.json()["data"], "meta": habitica_client.call_meta(response)}
+        except requests.exceptions.HTTPError as e:
+            if response.status_code in (400, 404):
+                error_message = response.json().get("message", "Bad Request")
+                logging.error(f"Get group chat failed ({response.status_code}): {error_message}")
+                return {"success": False, "error": error_message}
+            logging.error(f"Get group chat failed: {e}")
+            return {"success": False, "error": f"Request failed: {e}"}
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Get group chat request exception: {e}")
+            return {"success": False, "error": f"Request failed: {e}"}
+
+    def get_new_chat_messages(self, group_id: str = "party") -> dict:
+        """
+        Retrieve only the chat messages posted in a group since the previous call.
+
+        The newest message seen in each group is remembered, and the chat is requested with
+        the ETag of the previous response, so an unchanged chat is not downloaded again.
+        The first call for a group returns its current chat.
+
+        :param group_id: (optional, default "party") The group ID; "party" and "habitrpg" are accepted.
+
+        :return: Dictionary with success status, the new messages (oldest first) and the number
+            of seconds to wait before checking again, or error message.
+            Example success response:
+            {
+                "success": True,
+                "data": [
+                    {"id": "message-id-124", "text": "Boss is down!", "timestamp": 1743000060000, ...}
+                ],
+                "next_poll": 5.0
+            }
+        """
+        if not group_id or not isinstance(group_id, str):
+            return {"success": False, "error": "group_id must be a non-empty string."}
+        try:
+            messages = self.chat_reader.poll(group_id)
+            return {"success": True, "data": messages, "next_poll": self.chat_reader.interval(group_id)}
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Get new chat messages failed: {e}")
+            return {"success": False, "error": f"Request failed: {e}"}
+
+    def _fetch_group_chat(self, group_id: str, etag: str = None) -> tuple:
+        url = f"{self.base_url}/groups/{group_id}/chat"
+        headers = {**self.headers, "If-None-Match": etag} if etag else self.headers
+        response = habitica_client.request("GET", url, headers=headers, timeout=10)
+        response.raise_for_status()
+        if response.status_code == 304:
+            return None, etag
+        return response.json()["data"], response.headers.get("ETag")
+
     def export_user_data_json(self) -> dict:
         """
         Export the authenticated user's data in JSON format.
@@ -200,11 +411,192 @@ class Tools:
                 "error": "Request failed: <error details>"
             }
         """
-        url = "https://habitica.com/export/userdata.json"
+        url = self.export_url
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = habitica_client.request("GET", url, headers=self.headers, timeout=10)
             response.raise_for_status()
-            return {"success": True, "data": response.text}
+            return {"success": True, "data": response.text, "meta": habitica_client.call_meta(response)}
         except requests.exceptions.RequestException as e:
             logging.error(f"Export user data failed: {e}")
-            return {"error": f"Request failed: {e}"}
\ No newline at end of file
+            return {"success": False, "error": f"Request failed: {e}"}
+
+
+# Generators and helpers that take callables or file objects are functions of a ``Tools``
+# rather than methods: ``Tools`` methods are the LLM tool surface and take and return JSON.
+
+def iter_public_guilds(tools: Tools, stop_when=None, start_page: int = 0, max_pages: int = None, prefetch: bool = True):
+    """
+    Stream public guilds page by page.
+
+    While the guilds of one page are consumed, the next page is fetched on the shared
+    worker pool, so at most two pages are held in memory however many guilds exist.
+    Guilds created or deleted during the iteration can shift page boundaries, so a
+    guild may be skipped or seen twice.
+
+    :param tools: ``Tools`` whose credentials are used.
+    :param stop_when: Optional callable ``stop_when(guild) -> bool``. The iteration ends
+        after the first guild it returns True for; that guild is still yielded and a
+        prefetched page that was not started yet is cancelled.
+        Example: lambda guild: guild["name"] == "Habitica Help"
+    :param start_page: (optional, default 0) Page to start from.
+    :param max_pages: (optional) Fetch at most this many pages.
+    :param prefetch: (optional, default True) Fetch the next page while the current one is consumed.
+
+    :return: Generator of guild dictionaries, e.g.
+        {"_id": "group-id-123", "name": "Example Guild", "type": "guild", "privacy": "public", ...}
+    :raises requests.exceptions.RequestException: If a page cannot be fetched.
+    :raises ValueError: If start_page or max_pages is not a valid page count.
+    """
+    if not isinstance(start_page, int) or start_page < 0:
+        raise ValueError("start_page must be a non-negative integer.")
+    if max_pages is not None and (not isinstance(max_pages, int) or max_pages < 1):
+        raise ValueError("max_pages must be a positive integer.")
+
+    page = start_page
+    fetched = 0
+    pending = None
+    try:
+        guilds = tools._fetch_guild_page(page)
+        while True:
+            fetched += 1
+            more = len(guilds) >= PUBLIC_GUILDS_PAGE_SIZE and (max_pages is None or fetched < max_pages)
+            if more and prefetch:
+                pending = habitica_client.get_executor().submit(tools._fetch_guild_page, page + 1)
+            for guild in guilds:
+                matched = stop_when is not None and stop_when(guild)
+                yield guild
+                if matched:
+                    return
+            if not more:
+                return
+            page += 1
+            # A prefetch no worker has started yet runs here instead, so a consumer on a pool thread cannot deadlock.
+            if pending is None or pending.cancel():
+                guilds = tools._fetch_guild_page(page)
+            else:
+                guilds = pending.result()
+            pending = None
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+def iter_group_chat(tools: Tools, group_ids: list = None, stop_when=None, max_polls: int = None, stop_event=None):
+    """
+    Follow group chats and yield new messages as they are posted.
+
+    Each group is polled on its own schedule: again after a few seconds while messages keep
+    arriving, and less and less often while it is quiet (``HABITICA_CHAT_MIN_INTERVAL`` and
+    ``HABITICA_CHAT_MAX_INTERVAL``, default 5 and 120 seconds). Failed polls are logged and
+    retried later.
+
+    :param tools: ``Tools`` whose ``chat_reader`` tracks the groups.
+    :param group_ids: (optional, default ["party"]) Group IDs to follow.
+    :param stop_when: Optional callable ``stop_when(group_id, message) -> bool``; the iteration
+        ends after the first message it returns True for.
+        Example: lambda group_id, message: message["text"] == "!stop"
+    :param max_polls: (optional) Stop after this many polls in total.
+    :param stop_event: Optional ``threading.Event`` that ends the iteration when set.
+
+    :return: Generator of ``(group_id, message)`` tuples.
+    :raises requests.exceptions.HTTPError: If a group is not found.
+    """
+    return tools.chat_reader.stream(group_ids or ["party"], stop_when, max_polls, stop_event)
+
+
+def stream_user_data_json(tools: Tools, destination, decompress: bool = True, chunk_size: int = 65536) -> dict:
+    """
+    Stream the authenticated user's JSON export to a file or sink without holding it in memory.
+
+    :param tools: ``Tools`` whose credentials and ``export_url`` are used.
+    :param destination: Where to write the export, chunk by chunk. One of:
+        - a file path (str), which is created or overwritten;
+        - a writable binary file object (anything with a write() method);
+        - a callable that receives each bytes chunk.
+        Example: "/tmp/userdata.json"
+    :param decompress: (optional, default True) Write the decoded JSON. If False, the bytes are
+        written as sent by the server, i.e. still gzip-compressed when Habitica compressed them.
+    :param chunk_size: (optional, default 65536) Number of bytes read per chunk.
+
+    :return: Dictionary with success status and a summary of the written export or error message.
+        Example success response:
+        {
+            "success": True,
+            "data": {
+                "bytes": 7340032,
+                "destination": "/tmp/userdata.json",
+                "content_encoding": "gzip"
+            }
+        }
+        Example error response:
+        {
+            "success": False,
+            "error": "Request failed: <error details>"
+        }
+    """
+    if isinstance(destination, str):
+        if not destination:
+            return {"success": False, "error": "destination must be a non-empty path, file object or callable."}
+    elif not callable(getattr(destination, "write", None)) and not callable(destination):
+        return {"success": False, "error": "destination must be a non-empty path, file object or callable."}
+    if not isinstance(chunk_size, int) or chunk_size <= 0:
+        return {"success": False, "error": "chunk_size must be a positive integer."}
+
+    url = tools.export_url
+    written = 0
+    try:
+        response = habitica_client.request("GET", url, headers=tools.headers, timeout=EXPORT_STREAM_TIMEOUT, stream=True)
+        with response:
+            response.raise_for_status()
+            if decompress:
+                chunks = response.iter_content(chunk_size)
+            else:
+                chunks = response.raw.stream(chunk_size, decode_content=False)
+            sink = open(destination, "wb") if isinstance(destination, str) else destination
+            write = getattr(sink, "write", sink)
+            try:
+                for chunk in chunks:
+                    write(chunk)
+                    written += len(chunk)
+            finally:
+                if sink is not destination:
+                    sink.close()
+        return {
+            "success": True,
+            "data": {
+                "bytes": written,
+                "destination": destination if isinstance(destination, str) else None,
+                "content_encoding": None if decompress else response.headers.get("Content-Encoding")
+            },
+            "meta": habitica_client.call_meta(response)
+        }
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Stream user data failed after {written} bytes: {e}")
+        return {"success": False, "error": f"Request failed: {e}"}
+    except OSError as e:
+        logging.error(f"Writing user data export failed after {written} bytes: {e}")
+        return {"success": False, "error": f"Write failed: {e}"}
+
+
+def iter_user_data_items(tools: Tools, kinds: list = None, chunk_size: int = 65536):
+    """
+    Stream the JSON export and yield its tasks, history entries and inbox messages one at a time.
+
+    Only one item (plus one network chunk) is held in memory at a time. To parse a saved
+    export instead, use ``habitica_stream.iter_export_items`` on the file's chunks
+    (with ``decompress=True`` for a gzip file).
+
+    :param tools: ``Tools`` whose credentials and ``export_url`` are used.
+    :param kinds: Optional subset of "tasks", "history" and "inbox" to yield. (Default is all three)
+    :param chunk_size: (optional, default 65536) Number of bytes read per chunk.
+
+    :return: Generator of ``(kind, path, value)`` tuples, e.g.
+        ("tasks", ("tasks", "todos", 0), {"_id": "task-id", "text": "Read a book", ...})
+    :raises requests.exceptions.RequestException: If the export cannot be downloaded.
+    :raises ValueError: If the export is not valid JSON.
+    """
+    response = habitica_client.request("GET", tools.export_url, headers=tools.headers,
+                                       timeout=EXPORT_STREAM_TIMEOUT, stream=True)
+    with response:
+        response.raise_for_status()
+        yield from habitica_stream.iter_export_items(response.iter_content(chunk_size), kinds)
@@ -0,0 +1,443 @@
+# habitica_metrics.py
+"""
+Latency and size metrics for Habitica API calls.
+
+Every HTTP request sent through ``habitica_client.request`` records its total
+duration, the time spent connecting (DNS lookup and TCP connect), in the TLS
+handshake, waiting for the server, decoding JSON, waiting for the rate limiter
+and backing off between retries, plus request/response sizes, status codes and
+retry counts, as histograms and counters labelled by endpoint. Every public
+method of the ``Tools`` classes is timed as well.
+
+Export the data with ``to_prometheus()`` (text exposition format) or
+``to_dict()``. Register a span hook with ``add_span_hook`` to feed tracing:
+
+    tracer = opentelemetry.trace.get_tracer("habitica")
+    habitica_metrics.add_span_hook(lambda name, attributes: tracer.start_as_current_span(name, attributes=attributes))
+
+Set ``HABITICA_METRICS=false`` to turn recording off.
+"""
+import os
+import re
+import bisect
+import inspect
+import functools
+import threading
+import time
+import logging
+from urllib.parse import urlsplit
+
+logging.basicConfig(level=logging.INFO)
+
+ENABLED = os.environ.get("HABITICA_METRICS", "true").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HELP = {
+    "habitica_request_duration_seconds": "Total duration of Habitica API requests, including retries and waits.",
+    "habitica_request_phase_seconds": "Time spent in each phase of a Habitica API request.",
+    "habitica_request_size_bytes": "Size of request bodies sent to Habitica.",
+    "habitica_response_size_bytes": "Size of response bodies received from Habitica.",
+    "habitica_requests_total": "Habitica API requests by endpoint and status code.",
+    "habitica_retries_total": "Retries of transient failures and 429 responses.",
+    "habitica_tool_duration_seconds": "Duration of Tools method calls.",
+    "habitica_tool_calls_total": "Tools method calls by outcome.",
+}
+
+_UUID = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+# Collections whose next path segment is an ID or alias, unless it is one of the listed sub-resources.
+_ID_AFTER = {
+    "tasks": {"user", "challenge", "group", "clearCompletedTodos"},
+    "tags": set(),
+    "checklist": set(),
+    "groups": {"party", "habitrpg"},
+    "members": set(),
+    "cast": set(),
+}
+
+_local = threading.local()
+_span_hooks = []
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed upper bounds, as used by Prometheus.
+    """
+
+    def __init__(self, buckets: tuple):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        buckets = {}
+        total = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            buckets["+Inf" if bound == float("inf") else repr(bound)] = total
+        return {"buckets": buckets, "sum": self.sum, "count": self.count}
+
+
+class Registry:
+    """
+    Thread-safe store of labelled histograms and counters.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def to_dict(self) -> dict:
+        """
+        Return all metrics as plain Python data.
+
+        Example:
+            {
+                "histograms": {
+                    "habitica_request_duration_seconds": [
+                        {"labels": {"endpoint": "/tasks/user", "method": "GET"},
+                         "buckets": {"0.005": 0, ..., "+Inf": 12}, "sum": 1.84, "count": 12}
+                    ]
+                },
+                "counters": {
+                    "habitica_requests_total": [
+                        {"labels": {"endpoint": "/tasks/user", "method": "GET", "status": "200"}, "value": 12}
+                    ]
+                }
+            }
+        """
+        with self._lock:
+            histograms = {}
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                histograms.setdefault(name, []).append({"labels": dict(labels), **histogram.snapshot()})
+            counters = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+        return {"histograms": histograms, "counters": counters}
+
+    def to_prometheus(self) -> str:
+        """
+        Return all metrics in the Prometheus text exposition format.
+        """
+        data = self.to_dict()
+        lines = []
+        for name, series in data["histograms"].items():
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for entry in series:
+                for bound, count in entry["buckets"].items():
+                    lines.append(f"{name}_bucket{_labels({**entry['labels'], 'le': bound})} {count}")
+                lines.append(f"{name}_sum{_labels(entry['labels'])} {entry['sum']}")
+                lines.append(f"{name}_count{_labels(entry['labels'])} {entry['count']}")
+        for name, series in data["counters"].items():
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for entry in series:
+                lines.append(f"{name}{_labels(entry['labels'])} {entry['value']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+registry = Registry()
+
+
+def is_enabled() -> bool:
+    return ENABLED
+
+
+def configure(enabled: bool) -> None:
+    """
+    Turn metric recording on or off.
+    """
+    global ENABLED
+    ENABLED = enabled
+
+
+def to_dict() -> dict:
+    return registry.to_dict()
+
+
+def to_prometheus() -> str:
+    return registry.to_prometheus()
+
+
+def reset() -> None:
+    registry.reset()
+
+
+def endpoint(url: str) -> str:
+    """
+    Return the endpoint template of a URL, with IDs and aliases replaced by ":id".
+
+    Example:
+        endpoint("https://habitica.com/api/v3/tasks/5f1c.../checklist/9a2b...") -> "/tasks/:id/checklist/:id"
+    """
+    path = urlsplit(url).path
+    if path.startswith("/api/v3"):
+        path = path[len("/api/v3"):]
+    parts = path.strip("/").split("/")
+    for index, part in enumerate(parts):
+        previous = parts[index - 1] if index else None
+        if _UUID.fullmatch(part) or previous in _ID_AFTER and part not in _ID_AFTER[previous]:
+            parts[index] = ":id"
+    return "/" + "/".join(parts)
+
+
+# Span hooks
+
+
+def add_span_hook(hook) -> None:
+    """
+    Register a tracing hook.
+
+    :param hook: Callable ``hook(name, attributes)`` returning a context manager that spans the
+        operation. If the object it yields has a ``set_attribute`` method, the outcome
+        (status code, retries, success) is set on it before the span ends.
+    """
+    _span_hooks.append(hook)
+
+
+def remove_span_hook(hook) -> None:
+    if hook in _span_hooks:
+        _span_hooks.remove(hook)
+
+
+class _Spans:
+    """
+    Enter the context managers of all span hooks and hand them the final attributes on exit.
+    """
+
+    def __init__(self, name: str, attributes: dict):
+        self.entered = []
+        for hook in list(_span_hooks):
+            try:
+                manager = hook(name, dict(attributes))
+                self.entered.append((manager, manager.__enter__()))
+            except Exception as e:
+                logging.error(f"Span hook failed for {name}: {e}")
+
+    def close(self, attributes: dict, error: BaseException = None) -> None:
+        for manager, span in reversed(self.entered):
+            try:
+                if hasattr(span, "set_attribute"):
+                    for key, value in attributes.items():
+                        span.set_attribute(key, value)
+                if error is None:
+                    manager.__exit__(None, None, None)
+                else:
+                    manager.__exit__(type(error), error, error.__traceback__)
+            except Exception as e:
+                logging.error(f"Span hook failed on exit: {e}")
+
+
+# Request timing
+
+
+def _add_phase(phase: str, seconds: float) -> None:
+    phases = getattr(_local, "phases", None)
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+class _TimedConnectionMixin:
+    def _new_conn(self):
+        # Covers DNS resolution and the TCP handshake, which urllib3 performs together.
+        started = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            _add_phase("connect", time.perf_counter() - started)
+
+
+class _TimedTLSMixin:
+    def connect(self):
+        phases = getattr(_local, "phases", None)
+        before = phases.get("connect", 0.0) if phases is not None else 0.0
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            if phases is not None:
+                _add_phase("tls", max(0.0, time.perf_counter() - started - (phases.get("connect", 0.0) - before)))
+
+
+@functools.lru_cache(maxsize=None)
+def _timed_pool_classes() -> dict:
+    # urllib3 is imported on first use so that importing the tool modules does not load the HTTP stack.
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+        pass
+
+    class TimedHTTPSConnection(_TimedTLSMixin, _TimedConnectionMixin, HTTPSConnection):
+        pass
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    return {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+
+def install_connection_timing(adapter) -> None:
+    """
+    Make a ``requests`` HTTPAdapter open connections that report connect and TLS times.
+    """
+    adapter.poolmanager.pool_classes_by_scheme = dict(_timed_pool_classes())
+
+
+class RequestTimer:
+    """
+    Context manager that measures one ``habitica_client.request`` call and records it on exit.
+
+    Set ``timer.response`` to the response before leaving the block.
+    """
+
+    def __init__(self, method: str, url: str, stream: bool = False):
+        self.method = method.upper()
+        self.endpoint = endpoint(url)
+        self.stream = stream
+        self.response = None
+
+    def __enter__(self) -> "RequestTimer":
+        self._outer = getattr(_local, "phases", None)
+        _local.phases = {}
+        self._spans = _Spans(f"HTTP {self.method} {self.endpoint}",
+                             {"http.method": self.method, "habitica.endpoint": self.endpoint})
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        duration = time.perf_counter() - self._started
+        phases = _local.phases
+        _local.phases = self._outer
+        response = self.response if exc is None else None
+        status = str(response.status_code) if response is not None else "error"
+        labels = {"endpoint": self.endpoint, "method": self.method}
+        meta = getattr(response, "habitica_meta", None) or {}
+
+        registry.observe("habitica_request_duration_seconds", duration, **labels)
+        registry.inc("habitica_requests_total", **labels, status=status)
+        if response is not None and not meta.get("coalesced"):
+            elapsed = response.elapsed.total_seconds() if response.elapsed else 0.0
+            phases["server"] = max(0.0, elapsed - phases.get("connect", 0.0) - phases.get("tls", 0.0))
+            phases["rate_limit_wait"] = meta.get("rate_limit_wait", 0.0)
+            phases["backoff"] = meta.get("backoff", 0.0)
+            body = response.request.body if response.request is not None else None
+            if body:
+                registry.observe("habitica_request_size_bytes", len(body), SIZE_BUCKETS, **labels)
+            # Size on the wire; streamed bodies are not read here, so they count only if the length is known.
+            size = response.headers.get("Content-Length")
+            if size is None and not self.stream:
+                size = len(response.content or b"")
+            if size is not None:
+                registry.observe("habitica_response_size_bytes", int(size), SIZE_BUCKETS, **labels)
+            if not self.stream:
+                _time_json(response, self.endpoint)
+        for phase, seconds in phases.items():
+            registry.observe("habitica_request_phase_seconds", seconds, endpoint=self.endpoint, phase=phase)
+        retries = meta.get("retries", 0) + meta.get("throttled", 0)
+        if retries:
+            registry.inc("habitica_retries_total", retries, endpoint=self.endpoint)
+
+        self._spans.close({"http.status_code": status, "habitica.retries": retries}, exc)
+
+
+def _time_json(response, endpoint_name: str) -> None:
+    """
+    Wrap ``response.json`` so the decode time is recorded as the "json_decode" phase.
+    """
+    decode = response.json
+
+    @functools.wraps(decode)
+    def timed_json(**kwargs):
+        started = time.perf_counter()
+        try:
+            return decode(**kwargs)
+        finally:
+            registry.observe("habitica_request_phase_seconds", time.perf_counter() - started,
+                             endpoint=endpoint_name, phase="json_decode")
+
+    response.json = timed_json
+
+
+# Tools methods
+
+
+def instrument(tool: str):
+    """
+    Class decorator timing every public method of a ``Tools`` class.
+
+    Records ``habitica_tool_duration_seconds`` and ``habitica_tool_calls_total`` (by the
+    ``success`` key of the returned dictionary) and opens a span named ``habitica.<tool>.<method>``.
+    Generator methods are left unwrapped.
+    """
+    def decorate(cls):
+        for name, func in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.isfunction(func) or inspect.isgeneratorfunction(func):
+                continue
+            setattr(cls, name, _timed_method(tool, name, func))
+        return cls
+    return decorate
+
+
+def _timed_method(tool: str, name: str, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return func(*args, **kwargs)
+        spans = _Spans(f"habitica.{tool}.{name}", {"habitica.tool": tool, "habitica.method": name})
+        started = time.perf_counter()
+        result = None
+        error = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            success = isinstance(result, dict) and bool(result.get("success")) if error is None else False
+            registry.observe("habitica_tool_duration_seconds", duration, tool=tool, method=name)
+            registry.inc("habitica_tool_calls_total", tool=tool, method=name, success=str(success).lower())
+            spans.close({"habitica.success": success}, error)
+    return wrapper
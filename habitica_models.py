@@ -0,0 +1,307 @@
+# habitica_models.py
+"""
+Compact in-memory models for Habitica tasks, checklist items and tags.
+
+The API returns each task as a nested dict, and a dict per task (plus one per
+checklist item and history entry) is most of the memory held for users with
+thousands of tasks. ``Task``, ``ChecklistItem`` and ``Tag`` store the common
+fields in ``__slots__`` instead, intern strings that repeat across tasks (types,
+attributes, tag and user IDs), and keep the rarely read fields (``history``,
+``reminders``, ``challenge``, ``group`` and any field this module does not know)
+as one compact JSON string that is decoded only when such a field is read.
+
+Models round-trip to the API's dict format:
+
+    task = Task.from_dict(response["data"])
+    task.text, task.checklist[0].completed, task.history   # history is decoded here
+    task.to_dict() == response["data"]                      # True
+
+``task.get("updatedAt")`` and ``task["_id"]`` read fields by their API names, so code
+written for task dicts can be handed models.
+"""
+import sys
+import logging
+import habitica_json
+
+logging.basicConfig(level=logging.INFO)
+
+# Task fields kept in slots, as (API key, attribute name).
+TASK_FIELDS = (
+    ("_id", "id"), ("type", "type"), ("text", "text"), ("notes", "notes"), ("alias", "alias"),
+    ("tags", "tags"), ("value", "value"), ("priority", "priority"), ("attribute", "attribute"),
+    ("completed", "completed"), ("date", "date"), ("checklist", "checklist"),
+    ("collapseChecklist", "collapse_checklist"), ("up", "up"), ("down", "down"),
+    ("counterUp", "counter_up"), ("counterDown", "counter_down"), ("frequency", "frequency"),
+    ("everyX", "every_x"), ("startDate", "start_date"), ("repeat", "repeat"),
+    ("daysOfMonth", "days_of_month"), ("weeksOfMonth", "weeks_of_month"), ("streak", "streak"),
+    ("isDue", "is_due"), ("nextDue", "next_due"), ("yesterDaily", "yester_daily"),
+    ("byHabitica", "by_habitica"), ("userId", "user_id"), ("createdAt", "created_at"),
+    ("updatedAt", "updated_at"), ("dateCompleted", "date_completed"), ("id", "api_id"),
+)
+# Task fields stored packed and decoded on access.
+RARE_TASK_FIELDS = ("history", "reminders", "challenge", "group")
+# String fields whose values repeat across tasks and are interned.
+_INTERNED = frozenset(("type", "attribute", "frequency", "user_id"))
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class _Model:
+    """
+    Shared slot handling: unset fields read as None and are left out of ``to_dict``.
+    """
+    __slots__ = ()
+    _fields = ()
+    _attributes = {}
+    _keys = {}
+
+    def __getattr__(self, name):
+        if name in self._keys or name == "extra":
+            return None
+        raise AttributeError(f"{type(self).__name__} has no attribute {name!r}")
+
+    def _set(self, key: str, value) -> None:
+        object.__setattr__(self, self._attributes[key], value)
+
+    def _values(self):
+        """
+        Yield ``(API key, value)`` for every field that is set, in declaration order.
+        """
+        for key, name in self._fields:
+            try:
+                yield key, object.__getattribute__(self, name)
+            except AttributeError:
+                continue
+
+    def get(self, key: str, default=None):
+        """
+        Read a field by its API name, like ``dict.get``.
+        """
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __getitem__(self, key: str):
+        name = self._attributes.get(key)
+        if name is None:
+            raise KeyError(key)
+        try:
+            return object.__getattribute__(self, name)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _UNSET) is not _UNSET
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, _Model):
+            return type(self) is type(other) and self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+_UNSET = object()
+
+
+def _model(cls):
+    """
+    Derive the key/attribute lookup tables of a model class from its ``_fields``.
+    """
+    cls._attributes = {key: name for key, name in cls._fields}
+    cls._keys = frozenset(name for _, name in cls._fields)
+    return cls
+
+
+@_model
+class ChecklistItem(_Model):
+    """
+    One checklist item of a daily or to-do.
+    """
+    __slots__ = ("id", "text", "completed", "extra")
+    _fields = (("id", "id"), ("text", "text"), ("completed", "completed"))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ChecklistItem":
+        item = cls()
+        extra = None
+        for key, value in data.items():
+            if key in cls._attributes:
+                item._set(key, value)
+            else:
+                extra = extra or {}
+                extra[key] = value
+        if extra:
+            item.extra = extra
+        return item
+
+    def to_dict(self) -> dict:
+        data = dict(self._values())
+        data.update(self.extra or {})
+        return data
+
+
+@_model
+class Tag(_Model):
+    """
+    A tag of the user, e.g. ``{"id": "tag-id-123", "name": "Work"}``.
+    """
+    __slots__ = ("id", "name", "challenge", "group", "extra")
+    _fields = (("id", "id"), ("name", "name"), ("challenge", "challenge"), ("group", "group"))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Tag":
+        tag = cls()
+        extra = None
+        for key, value in data.items():
+            if key in cls._attributes:
+                tag._set(key, _intern(value) if key == "id" else value)
+            else:
+                extra = extra or {}
+                extra[key] = value
+        if extra:
+            tag.extra = extra
+        return tag
+
+    def to_dict(self) -> dict:
+        data = dict(self._values())
+        data.update(self.extra or {})
+        return data
+
+
+class _Packed:
+    """
+    Descriptor for a rare task field kept in the task's packed JSON string.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def __get__(self, task, owner=None):
+        if task is None:
+            return self
+        return task._rare_fields().get(self.key)
+
+    def __set__(self, task, value) -> None:
+        rare = task._rare_fields()
+        rare[self.key] = value
+        task._pack(rare)
+
+    def __delete__(self, task) -> None:
+        rare = task._rare_fields()
+        rare.pop(self.key, None)
+        task._pack(rare)
+
+
+@_model
+class Task(_Model):
+    """
+    A Habitica task (habit, daily, to-do or reward).
+
+    Common fields are attributes with snake_case names (``task.updated_at``, ``task.id``
+    for ``_id``); ``checklist`` holds ``ChecklistItem`` objects. ``history``, ``reminders``,
+    ``challenge``, ``group`` and unknown fields are decoded from the packed form on each
+    read, so code that reads them in a loop should keep the value.
+    """
+    __slots__ = tuple(name for _, name in TASK_FIELDS) + ("_rare",)
+    _fields = TASK_FIELDS
+
+    history = _Packed("history")
+    reminders = _Packed("reminders")
+    challenge = _Packed("challenge")
+    group = _Packed("group")
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Task":
+        """
+        Build a task from the API's dict form.
+        """
+        task = cls()
+        rare = None
+        for key, value in data.items():
+            name = cls._attributes.get(key)
+            if name is None:
+                rare = rare or {}
+                rare[key] = value
+            elif key == "checklist" and isinstance(value, list):
+                task._set(key, [ChecklistItem.from_dict(item) for item in value])
+            elif key == "tags" and isinstance(value, list):
+                task._set(key, [_intern(tag_id) for tag_id in value])
+            elif key == "id" and value == data.get("_id"):
+                # Habitica repeats _id as id; keep one string for both.
+                task._set(key, data["_id"])
+            else:
+                task._set(key, _intern(value) if name in _INTERNED else value)
+        if rare:
+            task._pack(rare)
+        return task
+
+    def to_dict(self) -> dict:
+        """
+        Return the task in the API's dict form.
+        """
+        data = {}
+        for key, value in self._values():
+            if key == "checklist" and isinstance(value, list):
+                value = [item.to_dict() if isinstance(item, ChecklistItem) else item for item in value]
+            elif key == "tags" and isinstance(value, list):
+                value = list(value)
+            data[key] = value
+        data.update(self._rare_fields())
+        return data
+
+    def _rare_fields(self) -> dict:
+        try:
+            packed = object.__getattribute__(self, "_rare")
+        except AttributeError:
+            return {}
+        return habitica_json.loads(packed)
+
+    def _pack(self, rare: dict) -> None:
+        if rare:
+            self._rare = habitica_json.dumps(rare)
+        else:
+            try:
+                del self._rare
+            except AttributeError:
+                pass
+
+    def __getitem__(self, key: str):
+        if key in self._attributes:
+            value = super().__getitem__(key)
+            if key == "checklist" and isinstance(value, list):
+                return [item.to_dict() if isinstance(item, ChecklistItem) else item for item in value]
+            return value
+        rare = self._rare_fields()
+        if key in rare:
+            return rare[key]
+        raise KeyError(key)
+
+
+def tasks_from_dicts(tasks: list) -> list:
+    """
+    Convert a list of task dicts (e.g. the "data" of ``list_tasks``) to ``Task`` objects.
+    """
+    return [Task.from_dict(task) for task in tasks]
+
+
+def tasks_to_dicts(tasks: list) -> list:
+    """
+    Convert ``Task`` objects back to the API's dict form.
+    """
+    return [task.to_dict() for task in tasks]
+
+
+def tags_from_dicts(tags: list) -> list:
+    """
+    Convert a list of tag dicts (e.g. the "data" of ``list_tags``) to ``Tag`` objects.
+    """
+    return [Tag.from_dict(tag) for tag in tags]
@@ -0,0 +1,277 @@
+# habitica_prefetch.py
+"""
+Warm each user's caches around the start of their Habitica day.
+
+When a user's day starts (``preferences.dayStart``, an hour of the local day, in the
+time zone given by ``preferences.timezoneOffset``), dailies reset and every agent of
+that user asks for their tasks, tags and profile at once. ``CronPrefetcher`` reads
+both preferences once per user and warms, ``lead`` seconds before the day starts,
+what the reset does not change: the tags (a fresh tag index also answers
+``list_tags`` and ``resolve_tags`` locally) and the preferences and party parts of
+the profile. Re-reading the preferences also picks up a changed day start for the
+next day.
+
+Tasks and stats are not warmed by default. Fetched before the reset they would show
+the previous day, and fetched after it they are a request made on the user's behalf:
+Habitica runs a user's cron on their first request of the new day, which ends the
+window in which they can still check off yesterday's dailies and applies the damage
+of the missed ones. With ``warm_after_reset`` (or ``HABITICA_PREFETCH_AFTER_RESET``)
+the task listings and the stats are also refreshed right after the day starts, for
+deployments that want cron to run at the day start anyway: one unfiltered listing
+fills the cache for ``list_tasks()`` and for ``list_tasks("dailys")`` and the other types.
+
+Each user's warm-ups are offset by a stable fraction of ``spread`` seconds derived
+from the user ID, so users sharing a day start are not all fetched in the same second.
+
+    prefetcher = CronPrefetcher()
+    prefetcher.add_user(user_id, api_key)
+    prefetcher.start()
+"""
+import os
+import heapq
+import threading
+import time
+import zlib
+import logging
+from datetime import datetime, timedelta, timezone
+import habitica_accounts
+import habitica_client
+
+logging.basicConfig(level=logging.INFO)
+
+# Seconds before the day start at which tags and stable profile fields are warmed.
+DEFAULT_LEAD = float(os.environ.get("HABITICA_PREFETCH_LEAD", "60"))
+# Seconds over which the warm-ups of different users are staggered.
+DEFAULT_SPREAD = float(os.environ.get("HABITICA_PREFETCH_SPREAD", "10"))
+# Also refresh tasks and stats right after the day starts; this makes Habitica run the user's cron.
+DEFAULT_WARM_AFTER_RESET = os.environ.get("HABITICA_PREFETCH_AFTER_RESET", "false").lower() in ("1", "true", "yes")
+
+PREFERENCE_FIELDS = ["preferences.dayStart", "preferences.timezoneOffset"]
+# Profile fields warmed before the reset; cron does not change them.
+STABLE_FIELDS = PREFERENCE_FIELDS + ["party._id"]
+PHASES = ("before", "after")
+
+
+def next_day_start(day_start: int, timezone_offset: int, now: datetime = None) -> datetime:
+    """
+    Return the next moment (UTC) the user's Habitica day starts.
+
+    :param day_start: Hour of the local day (0-23) at which the day starts.
+    :param timezone_offset: Minutes UTC is ahead of the user's local time, as JavaScript's
+        ``getTimezoneOffset`` reports it (e.g. 300 for New York in winter, -60 for Berlin).
+    :param now: Current time (aware); defaults to now.
+    """
+    now = now or datetime.now(timezone.utc)
+    offset = timedelta(minutes=timezone_offset or 0)
+    local = now - offset
+    start = local.replace(hour=day_start or 0, minute=0, second=0, microsecond=0)
+    if start <= local:
+        start += timedelta(days=1)
+    return start + offset
+
+
+def stagger(user_id: str, spread: float) -> float:
+    """
+    Return the user's stable offset in ``[0, spread)`` seconds.
+    """
+    return zlib.crc32(user_id.encode("utf-8")) / 2 ** 32 * spread
+
+
+class CronPrefetcher:
+    """
+    Schedule cache warm-ups for many users around their day start.
+
+    :param registry: ``habitica_accounts.ClientRegistry`` whose user contexts are warmed
+        (a context evicted since is recreated); defaults to the process-wide registry.
+    :param lead: Seconds before the day start at which tags and stable profile fields are warmed.
+    :param spread: Seconds over which users' warm-ups are staggered.
+    :param warm_after_reset: Also refresh the task listings and stats right after the day starts.
+        That request makes Habitica run the user's cron at once: the user can no longer check
+        off yesterday's dailies, and missed dailies deal their damage. Off by default.
+    """
+
+    def __init__(self, registry: habitica_accounts.ClientRegistry = None, lead: float = DEFAULT_LEAD,
+                 spread: float = DEFAULT_SPREAD, warm_after_reset: bool = DEFAULT_WARM_AFTER_RESET):
+        if lead <= 0:
+            raise ValueError("lead must be positive, or the warm-up would run the user's cron.")
+        self.registry = registry if registry is not None else habitica_accounts.get_registry()
+        self.lead = lead
+        self.spread = spread
+        self.warm_after_reset = warm_after_reset
+        self._users = {}
+        self._preferences = {}
+        self._queue = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self.warmed = 0
+        self.failed = 0
+
+    def add_user(self, user_id: str, api_key: str) -> dict:
+        """
+        Read a user's day start and schedule their warm-ups.
+
+        Like any request, reading the preferences runs the user's cron if their day has
+        started and it has not run yet.
+
+        :return: Dictionary with success status and the schedule or error message.
+            Example success response (``after_at`` only with ``warm_after_reset``):
+            {
+                "success": True,
+                "data": {"day_start": "2025-03-27T04:00:00+00:00", "before_at": "2025-03-27T03:58:56.5+00:00",
+                         "after_at": "2025-03-27T04:00:03.5+00:00"}
+            }
+        """
+        context = self.registry.get(user_id, api_key)
+        result = context.manage.get_profile_fields(PREFERENCE_FIELDS)
+        if not result["success"]:
+            return result
+        with self._cond:
+            self._users[user_id] = api_key
+            self._preferences[user_id] = result["data"]
+        return {"success": True, "data": self._schedule(user_id, result["data"])}
+
+    def remove_user(self, user_id: str) -> bool:
+        """
+        Stop warming a user's caches.
+
+        :return: Whether the user was scheduled.
+        """
+        with self._cond:
+            found = self._users.pop(user_id, None) is not None
+            self._preferences.pop(user_id, None)
+            self._queue = [job for job in self._queue if job[2] != user_id]
+            heapq.heapify(self._queue)
+        return found
+
+    def _phases(self) -> tuple:
+        return PHASES if self.warm_after_reset else PHASES[:1]
+
+    def _schedule(self, user_id: str, preferences: dict, after: datetime = None) -> dict:
+        """
+        Queue the next warm-ups of a user from their ``{path: value}`` preferences.
+
+        :param after: Schedule for the first day start after this moment; defaults to now.
+        """
+        day_start = next_day_start(preferences.get("preferences.dayStart"),
+                                   preferences.get("preferences.timezoneOffset"), after)
+        offset = stagger(user_id, self.spread)
+        times = {
+            # Staggered backwards, so the warm-up cannot slip past the day start.
+            "before": day_start.timestamp() - self.lead - offset,
+            "after": day_start.timestamp() + offset,
+        }
+        phases = self._phases()
+        with self._cond:
+            self._queue = [job for job in self._queue if job[2] != user_id]
+            for phase in phases:
+                self._seq += 1
+                self._queue.append((times[phase], self._seq, user_id, phase, day_start.timestamp()))
+            heapq.heapify(self._queue)
+            self._cond.notify()
+        return {
+            "day_start": day_start.isoformat(),
+            **{f"{phase}_at": datetime.fromtimestamp(times[phase], timezone.utc).isoformat() for phase in phases},
+        }
+
+    def schedule(self) -> list:
+        """
+        Return the queued warm-ups as ``(unix_time, user_id, phase)`` tuples, earliest first.
+        """
+        with self._cond:
+            return [(due, user_id, phase) for due, _, user_id, phase, _ in sorted(self._queue)]
+
+    def run_pending(self, now: float = None) -> int:
+        """
+        Run every warm-up that is due, concurrently on the shared worker pool.
+
+        :param now: Unix time to compare against; defaults to now.
+        :return: Number of warm-ups run.
+        """
+        now = time.time() if now is None else now
+        jobs = []
+        with self._cond:
+            while self._queue and self._queue[0][0] <= now:
+                _, _, user_id, phase, day_start = heapq.heappop(self._queue)
+                if user_id in self._users:
+                    jobs.append((user_id, self._users[user_id], phase, day_start))
+        habitica_client.map_concurrent(self._warm, jobs)
+        return len(jobs)
+
+    def _warm(self, job: tuple) -> None:
+        user_id, api_key, phase, day_start = job
+        try:
+            context = self.registry.get(user_id, api_key)
+            if phase == "before":
+                # Reload even if fresh, so the warmed copies last through the morning rush.
+                context.tags_skills.tag_index.invalidate()
+                context.manage.profile_view.invalidate("preferences")
+                context.manage.profile_view.invalidate("party")
+                results = habitica_client.map_concurrent(
+                    lambda warm: warm(),
+                    [context.tags_skills.list_tags, lambda: context.manage.get_profile_fields(STABLE_FIELDS)],
+                )
+            else:
+                # The cached tasks and stats are from the previous day; this request runs the user's cron.
+                # The unfiltered listing also fills the per-type ones, "dailys" included.
+                context.tasks.task_cache.invalidate()
+                context.manage.profile_view.invalidate("stats")
+                results = habitica_client.map_concurrent(
+                    lambda warm: warm(),
+                    [context.tasks.list_tasks, context.manage.get_stats],
+                )
+        except Exception as e:
+            results = [{"success": False, "error": str(e)}]
+        errors = [result["error"] for result in results if not result["success"]]
+        if errors:
+            self.failed += 1
+            logging.error(f"Warming {phase} caches of user {user_id} failed: {'; '.join(errors)}")
+        else:
+            self.warmed += 1
+        with self._cond:
+            if user_id not in self._users:
+                return
+            if phase == "before" and results[-1]["success"]:
+                self._preferences[user_id] = results[-1]["data"]
+            preferences = self._preferences[user_id]
+        if phase == self._phases()[-1]:
+            # Reschedule for the next day from the preferences just read; on failure, from the last known ones.
+            self._schedule(user_id, preferences, datetime.fromtimestamp(day_start, timezone.utc))
+
+    def start(self) -> "CronPrefetcher":
+        """
+        Run due warm-ups on a background thread until ``stop`` is called.
+        """
+        with self._cond:
+            if self._thread is None:
+                self._stopped = False
+                self._thread = threading.Thread(target=self._loop, name="habitica-prefetch", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            thread, self._thread = self._thread, None
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                wait = self._queue[0][0] - time.time() if self._queue else None
+                if wait is None or wait > 0:
+                    self._cond.wait(wait)
+                    continue
+            try:
+                self.run_pending()
+            except Exception as e:
+                logging.error(f"Prefetch run failed: {e}")
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"users": len(self._users), "queued": len(self._queue), "warmed": self.warmed, "failed": self.failed}
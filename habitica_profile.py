@@ -0,0 +1,217 @@
+# habitica_profile.py
+"""
+Field-projected reads of the user document.
+
+``ProfileView`` answers reads of parts of the user profile (e.g. "stats" or
+"party._id") by requesting only those paths through the ``userFields`` query
+parameter. Each fetched subtree is cached with its own TTL, and field requests
+made while a fetch is in flight are merged into the next single call.
+"""
+import os
+import threading
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+# Seconds a cached subtree of the user document stays fresh, keyed by top-level field.
+FIELD_TTLS = {
+    "stats": float(os.environ.get("HABITICA_PROFILE_STATS_TTL", "15")),
+    "party": 300.0,
+    "profile": 600.0,
+    "preferences": 600.0,
+    "auth": 600.0,
+    "achievements": 600.0,
+    "items": 120.0,
+}
+DEFAULT_FIELD_TTL = float(os.environ.get("HABITICA_PROFILE_TTL", "60"))
+
+
+def minimal_fields(paths) -> list:
+    """
+    Reduce dotted field paths to the smallest set covering all of them.
+
+    Example:
+        minimal_fields(["stats.gp", "stats", "party._id"]) -> ["party._id", "stats"]
+    """
+    result = []
+    for path in sorted(set(paths), key=lambda p: (p.count("."), p)):
+        if not covers(result, path):
+            result.append(path)
+    return sorted(result)
+
+
+def covers(fields, path: str) -> bool:
+    """
+    Return whether a fetch of ``fields`` includes the dotted ``path``.
+    """
+    return any(path == field or path.startswith(field + ".") for field in fields)
+
+
+def extract(document: dict, path: str):
+    """
+    Return the value at a dotted path of a user document, or None if it is missing.
+    """
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+class _Batch:
+    def __init__(self, fields: set):
+        self.fields = set(fields)
+        self.done = threading.Event()
+        self.document = {}
+        self.error = None
+
+
+class ProfileView:
+    """
+    Cache of user document subtrees, filled by merged ``userFields`` requests.
+
+    :param fetch: Callable taking a comma-separated ``userFields`` string and returning a
+        ``{"success", "data"/"error"}`` dictionary whose ``data`` is the API response body.
+    """
+
+    def __init__(self, fetch):
+        self._fetch = fetch
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._inflight = None
+        self._queued = None
+        self.hits = 0
+        self.fetches = 0
+
+    @staticmethod
+    def ttl(path: str) -> float:
+        return FIELD_TTLS.get(path.split(".", 1)[0], DEFAULT_FIELD_TTL)
+
+    def _cached(self, path: str, now: float):
+        """
+        Return ``(True, value)`` if the path or one of its ancestors is cached and fresh.
+        """
+        parts = path.split(".")
+        for depth in range(1, len(parts) + 1):
+            entry = self._entries.get(".".join(parts[:depth]))
+            if entry is not None and now - entry[1] < self.ttl(path):
+                return True, extract(entry[0], ".".join(parts[depth:])) if depth < len(parts) else entry[0]
+        return False, None
+
+    def store(self, document: dict, fields: list = None) -> None:
+        """
+        Cache the given paths of a user document; with no paths, every top-level field.
+        """
+        if not isinstance(document, dict):
+            return
+        now = time.monotonic()
+        with self._lock:
+            for path in fields if fields else list(document):
+                self._entries[path] = (extract(document, path), now)
+
+    def invalidate(self, path: str = None) -> None:
+        """
+        Drop a cached path and everything below it, or the whole cache if no path is given.
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k == path or k.startswith(path + ".")]:
+                del self._entries[key]
+
+    def get(self, fields: list) -> dict:
+        """
+        Return the values of the given dotted paths, fetching only the missing or stale ones.
+
+        :param fields: Dotted user document paths.
+            Example: ["stats.gp", "party._id"]
+
+        :return: Dictionary with success status, a ``{path: value}`` mapping and cache metadata.
+            Example success response:
+            {
+                "success": true,
+                "data": {"stats.gp": 125.5, "party._id": "group-id"},
+                "meta": {"cache": "miss", "fields": "party._id,stats"}
+            }
+        """
+        now = time.monotonic()
+        values = {}
+        with self._lock:
+            missing = []
+            for path in fields:
+                found, value = self._cached(path, now)
+                if found:
+                    values[path] = value
+                else:
+                    missing.append(path)
+            if not missing:
+                self.hits += 1
+                return {"success": True, "data": values, "meta": {"cache": "hit"}}
+            batch, leader, previous = self._join(set(minimal_fields(missing)))
+
+        if leader:
+            self._run(batch, previous)
+        else:
+            batch.done.wait()
+        if batch.error is not None:
+            return {"success": False, "error": batch.error}
+
+        for path in missing:
+            values[path] = extract(batch.document, path)
+        return {"success": True, "data": values, "meta": {"cache": "miss", "fields": ",".join(sorted(batch.fields))}}
+
+    def _join(self, fields: set):
+        """
+        Attach the request to a batch: the in-flight one if it covers the fields, else the queued one.
+
+        Must be called with the lock held. Returns ``(batch, leader, previous)``; a leader sends the
+        batch after ``previous`` (the batch in flight when it was queued) has finished.
+        """
+        inflight = self._inflight
+        if inflight is not None and all(covers(inflight.fields, path) for path in fields):
+            return inflight, False, None
+        if self._queued is not None:
+            self._queued.fields |= fields
+            return self._queued, False, None
+        batch = _Batch(fields)
+        if inflight is not None:
+            self._queued = batch
+            return batch, True, inflight
+        self._inflight = batch
+        return batch, True, None
+
+    def _run(self, batch: _Batch, previous: _Batch = None) -> None:
+        if previous is not None:
+            previous.done.wait()
+        with self._lock:
+            if previous is not None:
+                self._queued = None
+                self._inflight = batch
+            fields = minimal_fields(batch.fields)
+            batch.fields = set(fields)
+            self.fetches += 1
+        try:
+            result = self._fetch(",".join(fields))
+            if result.get("success"):
+                batch.document = (result.get("data") or {}).get("data") or {}
+                self.store(batch.document, fields)
+            else:
+                batch.error = result.get("error") or "Request failed."
+        except Exception as e:
+            logging.error(f"Profile fetch failed: {e}")
+            batch.error = f"Request failed: {e}"
+        finally:
+            with self._lock:
+                if self._inflight is batch:
+                    self._inflight = None
+            batch.done.set()
+
+    def stats(self) -> dict:
+        """
+        Return the number of cached paths, cache hits and HTTP fetches.
+        """
+        with self._lock:
+            return {"paths": len(self._entries), "hits": self.hits, "fetches": self.fetches}
@@ -0,0 +1,155 @@
+# habitica_query.py
+"""
+Indexed queries over the user's Habitica tasks.
+
+``TaskIndex`` keeps prebuilt indexes by tag ID, type, priority, completion
+state, due date (a sorted list searched with ``bisect``) and a trigram index of
+the task text, so filters are answered by intersecting small ID sets instead of
+scanning every task.
+"""
+import bisect
+from collections import defaultdict
+from datetime import datetime, timezone
+
+
+def parse_date(value):
+    """
+    Convert a Habitica date (ISO 8601 string, epoch milliseconds or datetime) to a UTC timestamp.
+
+    Returns None for empty or unparseable values.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        moment = value
+    elif isinstance(value, (int, float)):
+        return value / 1000.0
+    else:
+        try:
+            moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def due_date(task: dict):
+    """
+    Return the due timestamp of a task: "date" for todos, the first "nextDue" for dailies.
+    """
+    if task.get("date"):
+        return parse_date(task["date"])
+    next_due = task.get("nextDue")
+    if next_due:
+        return parse_date(next_due[0])
+    return None
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TaskIndex:
+    """
+    Immutable set of indexes over a list of tasks.
+
+    :param tasks: Task dictionaries as returned by list_tasks.
+    """
+
+    def __init__(self, tasks: list = ()):
+        self._tasks = {}
+        self._order = {}
+        self._texts = {}
+        self._by_tag = defaultdict(set)
+        self._by_type = defaultdict(set)
+        self._by_priority = defaultdict(set)
+        self._completed = set()
+        self._trigrams = defaultdict(set)
+        due = []
+        for task in tasks:
+            task_id = task.get("_id") or task.get("id")
+            if not task_id or task_id in self._tasks:
+                continue
+            self._tasks[task_id] = task
+            self._order[task_id] = len(self._order)
+            for tag in task.get("tags") or ():
+                self._by_tag[tag].add(task_id)
+            self._by_type[task.get("type")].add(task_id)
+            if task.get("priority") is not None:
+                self._by_priority[float(task["priority"])].add(task_id)
+            if task.get("completed"):
+                self._completed.add(task_id)
+            text = (task.get("text") or "").lower()
+            self._texts[task_id] = text
+            for gram in _trigrams(text):
+                self._trigrams[gram].add(task_id)
+            when = due_date(task)
+            if when is not None:
+                due.append((when, task_id))
+        due.sort()
+        self._due_keys = [when for when, _ in due]
+        self._due_ids = [task_id for _, task_id in due]
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def _due_between(self, after, before) -> set:
+        lo = 0 if after is None else bisect.bisect_right(self._due_keys, after)
+        hi = len(self._due_keys) if before is None else bisect.bisect_left(self._due_keys, before)
+        return set(self._due_ids[lo:hi])
+
+    def _text_candidates(self, needle: str):
+        grams = _trigrams(needle)
+        if not grams:
+            return None
+        postings = sorted((self._trigrams.get(gram, set()) for gram in grams), key=len)
+        return set.intersection(*postings) if postings[0] else set()
+
+    def query(self, tags: list = None, task_type: str = None, due_before=None, due_after=None,
+              text_contains: str = None, completed: bool = None, priority: float = None,
+              limit: int = None) -> list:
+        """
+        Return the tasks matching every given filter, in their original list order.
+
+        :param tags: Tag IDs the task must all carry.
+        :param task_type: "habit", "daily", "todo" or "reward".
+        :param due_before: Only tasks due strictly before this date (ISO string or datetime).
+        :param due_after: Only tasks due strictly after this date (ISO string or datetime).
+        :param text_contains: Case-insensitive substring of the task text.
+        :param completed: True for completed tasks only, False for not completed (including habits and rewards).
+        :param priority: Exact difficulty: 0.1, 1, 1.5 or 2.
+        :param limit: Maximum number of tasks to return.
+        :return: List of task dictionaries.
+        """
+        sets = []
+        for tag in tags or ():
+            sets.append(self._by_tag.get(tag, set()))
+        if task_type is not None:
+            sets.append(self._by_type.get(task_type, set()))
+        if priority is not None:
+            sets.append(self._by_priority.get(float(priority), set()))
+        if completed:
+            sets.append(self._completed)
+        if due_before is not None or due_after is not None:
+            sets.append(self._due_between(parse_date(due_after), parse_date(due_before)))
+        needle = text_contains.lower() if text_contains else None
+        if needle:
+            candidates = self._text_candidates(needle)
+            if candidates is not None:
+                sets.append(candidates)
+
+        if sets:
+            sets.sort(key=len)
+            matches = set(sets[0]).intersection(*sets[1:])
+        else:
+            matches = set(self._tasks)
+        if completed is False:
+            matches -= self._completed
+        if needle:
+            matches = {task_id for task_id in matches if needle in self._texts[task_id]}
+
+        ordered = sorted(matches, key=self._order.__getitem__)
+        if limit is not None:
+            ordered = ordered[:limit]
+        return [self._tasks[task_id] for task_id in ordered]
@@ -0,0 +1,293 @@
+# habitica_ratelimit.py
+"""
+Client-side rate limiting shared by every Habitica tool module.
+
+Habitica allows roughly 30 requests per minute per user and reports the remaining
+budget in ``X-RateLimit-Remaining``/``X-RateLimit-Reset``. Each user gets one token
+bucket; callers reserve a token before sending and sleep until it is available
+instead of bursting into 429 responses. Once the server has reported its window,
+the bucket follows that window: it does not refill before the reported reset, and
+a call that finds the budget used up waits for the reset.
+"""
+import os
+import re
+import threading
+import time
+import logging
+import habitica_lazy
+from datetime import datetime, timezone
+
+requests = habitica_lazy.lazy_import("requests")
+email_utils = habitica_lazy.lazy_import("email.utils")
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_REQUESTS_PER_PERIOD = int(os.environ.get("HABITICA_RATE_LIMIT_REQUESTS", "30"))
+DEFAULT_PERIOD = float(os.environ.get("HABITICA_RATE_LIMIT_PERIOD", "60"))
+# Longest a single call will queue before giving up with RateLimitExceeded.
+DEFAULT_MAX_WAIT = float(os.environ.get("HABITICA_RATE_LIMIT_MAX_WAIT", "120"))
+DEFAULT_ENABLED = os.environ.get("HABITICA_RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+_settings = {
+    "requests_per_period": DEFAULT_REQUESTS_PER_PERIOD,
+    "period": DEFAULT_PERIOD,
+    "max_wait": DEFAULT_MAX_WAIT,
+    "enabled": DEFAULT_ENABLED,
+}
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+# JavaScript Date.toString() format, e.g. "Thu Mar 27 2025 10:31:02 GMT+0000 (Coordinated Universal Time)"
+_JS_DATE = re.compile(r"\w{3} (\w{3} \d{1,2} \d{4} \d{2}:\d{2}:\d{2}) GMT([+-]\d{4})")
+
+
+def _rate_limit_exceeded() -> type:
+    """
+    Return the RateLimitExceeded exception class, creating it on first use.
+
+    It subclasses ``requests.exceptions.RequestException`` so the existing error handling
+    in the tool modules turns it into a regular ``{"success": False, "error": ...}``
+    response; it is created lazily so that importing this module does not load requests.
+    """
+    cls = globals().get("RateLimitExceeded")
+    if cls is None:
+        with _limiters_lock:
+            cls = globals().get("RateLimitExceeded")
+            if cls is None:
+                cls = type("RateLimitExceeded", (requests.exceptions.RequestException,), {
+                    "__module__": __name__,
+                    "__doc__": "Raised when a call would have to wait longer than the configured maximum.",
+                })
+                globals()["RateLimitExceeded"] = cls
+    return cls
+
+
+def __getattr__(name: str):
+    # Reading habitica_ratelimit.RateLimitExceeded before it exists creates it (PEP 562).
+    if name == "RateLimitExceeded":
+        return _rate_limit_exceeded()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def parse_reset(value: str, now: float = None):
+    """
+    Convert an ``X-RateLimit-Reset`` or ``Retry-After`` header value to seconds from now.
+
+    Accepts delta seconds, epoch seconds or milliseconds, HTTP dates and the
+    JavaScript date strings Habitica sends. Returns None if the value cannot be parsed.
+    """
+    if not value:
+        return None
+    now = time.time() if now is None else now
+    value = value.strip()
+    try:
+        number = float(value)
+    except ValueError:
+        number = None
+    if number is not None:
+        if number > 1e12:
+            return max(number / 1000.0 - now, 0.0)
+        if number > 1e9:
+            return max(number - now, 0.0)
+        return max(number, 0.0)
+
+    match = _JS_DATE.match(value)
+    try:
+        if match:
+            moment = datetime.strptime(f"{match.group(1)} {match.group(2)}", "%b %d %Y %H:%M:%S %z")
+        else:
+            moment = email_utils.parsedate_to_datetime(value)
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+    return max(moment.timestamp() - now, 0.0)
+
+
+class RateLimiter:
+    """
+    Token bucket for one Habitica user, corrected by the server's rate-limit headers.
+
+    ``reserve`` never blocks: it takes a token (possibly going into debt, which
+    queues later callers behind earlier ones) and returns how long the caller must
+    wait before sending. ``acquire`` is the blocking wrapper used by the sync client.
+    Every reservation must be settled with ``update`` once a response arrives, or
+    with ``release`` if the request failed without one.
+    """
+
+    def __init__(self, requests_per_period: int = None, period: float = None, max_wait: float = None):
+        self.capacity = float(requests_per_period or _settings["requests_per_period"])
+        self.period = float(period or _settings["period"])
+        self.max_wait = _settings["max_wait"] if max_wait is None else max_wait
+        self.rate = self.capacity / self.period
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._reset_at = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.waited_calls = 0
+        self.total_wait = 0.0
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        if self._reset_at is not None:
+            if now < self._reset_at:
+                # Habitica's window is fixed: the budget it reported does not grow before the reset.
+                self._updated = now
+                return
+            # The server's window has rolled over: the full quota is back, minus
+            # the calls that are already reserved but not yet answered.
+            self._tokens = max(self._tokens, self.capacity - self._pending)
+            self._reset_at = None
+            self._updated = max(self._updated, now)
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """
+        Take one token and return the number of seconds to wait before sending.
+
+        :raises RateLimitExceeded: If the wait would exceed ``max_wait``; no token is taken.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            start = max(now, self._blocked_until)
+            if self._reset_at is None:
+                projected = min(self.capacity, self._tokens + (start - now) * self.rate)
+            elif start < self._reset_at:
+                projected = self._tokens
+            else:
+                projected = max(self._tokens, self.capacity - self._pending)
+            if projected < 1 and self._reset_at is not None and start < self._reset_at:
+                # The server reported the budget as used up: sleep until its window resets.
+                start = self._reset_at
+                projected = max(self._tokens, self.capacity - self._pending)
+            if projected < 1:
+                start += (1 - projected) / self.rate
+            delay = start - now
+            if delay > self.max_wait:
+                raise _rate_limit_exceeded()(
+                    f"Rate limit budget exhausted; next slot in {delay:.1f}s exceeds max wait of {self.max_wait:.1f}s."
+                )
+            self._tokens -= 1
+            self._pending += 1
+            self.calls += 1
+            if delay > 0:
+                self.waited_calls += 1
+                self.total_wait += delay
+            return delay
+
+    def acquire(self) -> float:
+        """
+        Block until a token is available and return the time spent waiting.
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def release(self, refund: bool = False) -> None:
+        """
+        Settle a reservation whose request failed before any response arrived.
+
+        :param refund: Also return the token to the bucket, for reservations that were never sent.
+        """
+        with self._lock:
+            self._pending = max(self._pending - 1, 0)
+            if refund:
+                self._tokens = min(self.capacity, self._tokens + 1)
+
+    def update(self, headers, status_code: int = None) -> None:
+        """
+        Settle a reservation and resynchronise the bucket from a response's headers.
+
+        ``X-RateLimit-Remaining`` is taken as authoritative, less the calls this
+        process still has in flight, so the client can use the whole quota the
+        server reports without overshooting it.
+        """
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_in = parse_reset(headers.get("X-RateLimit-Reset"))
+        retry_after = parse_reset(headers.get("Retry-After"))
+        with self._lock:
+            now = time.monotonic()
+            self._pending = max(self._pending - 1, 0)
+            self._refill(now)
+            if remaining is not None:
+                try:
+                    self._tokens = min(self.capacity, float(remaining)) - self._pending
+                except ValueError:
+                    pass
+                if reset_in is not None:
+                    self._reset_at = now + reset_in
+            if status_code == 429:
+                self.throttled += 1
+                self._tokens = min(self._tokens, 0.0)
+                wait = retry_after if retry_after is not None else reset_in
+                if wait is None:
+                    wait = 1.0 / self.rate
+                self._blocked_until = max(self._blocked_until, now + wait)
+                self._reset_at = self._blocked_until
+
+    def stats(self) -> dict:
+        """
+        Return counters describing how much this limiter has delayed calls.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "calls": self.calls,
+                "waited_calls": self.waited_calls,
+                "total_wait": round(self.total_wait, 3),
+                "throttled": self.throttled,
+                "tokens": round(self._tokens, 2),
+            }
+
+
+def configure(requests_per_period: int = None, period: float = None, max_wait: float = None,
+              enabled: bool = None) -> dict:
+    """
+    Change the rate-limit settings. Existing per-user limiters are discarded.
+
+    :param requests_per_period: Number of requests allowed per period.
+    :param period: Length of the period in seconds.
+    :param max_wait: Longest a call may queue before failing with RateLimitExceeded.
+    :param enabled: Set to False to bypass client-side limiting entirely.
+    :return: Dictionary with the settings now in effect.
+    """
+    with _limiters_lock:
+        if requests_per_period is not None:
+            _settings["requests_per_period"] = requests_per_period
+        if period is not None:
+            _settings["period"] = period
+        if max_wait is not None:
+            _settings["max_wait"] = max_wait
+        if enabled is not None:
+            _settings["enabled"] = bool(enabled)
+        _limiters.clear()
+        return dict(_settings)
+
+
+def is_enabled() -> bool:
+    return _settings["enabled"]
+
+
+def get_rate_limiter(user_id: str = None) -> RateLimiter:
+    """
+    Return the shared limiter for a Habitica user, creating it on first use.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(user_id)
+        if limiter is None:
+            limiter = _limiters[user_id] = RateLimiter()
+        return limiter
+
+
+def remove_rate_limiter(user_id: str) -> None:
+    """
+    Forget a user's limiter, e.g. when the user is no longer served by this process.
+    """
+    with _limiters_lock:
+        _limiters.pop(user_id, None)
@@ -0,0 +1,169 @@
+# habitica_snapshot.py
+"""
+Persistent on-disk snapshot of the last known tasks, tags and profile.
+
+Short-lived worker processes can answer their first reads from the snapshot
+instead of waiting on cold ``list_tasks``, ``list_tags`` and ``get_user_profile``
+calls, then refresh from Habitica in the background. The snapshot is a SQLite
+database (WAL mode, safe to share between processes) with this layout:
+
+    PRAGMA user_version = SCHEMA_VERSION
+
+    CREATE TABLE documents (
+        user_id  TEXT NOT NULL,   -- Habitica user the document belongs to
+        kind     TEXT NOT NULL,   -- "listing", "tags" or "profile"
+        key      TEXT NOT NULL,   -- listing task type ("" for all), or "" for tags/profile
+        data     TEXT NOT NULL,   -- JSON task list, tag list or user profile response body
+        etag     TEXT,            -- ETag of a listing, if Habitica sent one
+        saved_at REAL NOT NULL,   -- Unix time the document was written
+        PRIMARY KEY (user_id, kind, key)
+    )
+
+A database written with a different ``SCHEMA_VERSION`` is discarded and rebuilt.
+Set ``HABITICA_SNAPSHOT_PATH`` to enable the snapshot for all tool modules.
+"""
+import os
+import sqlite3
+import threading
+import time
+import logging
+import habitica_json
+
+logging.basicConfig(level=logging.INFO)
+
+SCHEMA_VERSION = 1
+HABITICA_SNAPSHOT_PATH = os.environ.get("HABITICA_SNAPSHOT_PATH")
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class SnapshotStore:
+    """
+    SQLite-backed snapshot for one Habitica user.
+
+    :param path: Database file path.
+    :param user_id: Habitica user ID the stored documents belong to.
+    """
+
+    def __init__(self, path: str, user_id: str):
+        self.path = path
+        self.user_id = user_id
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._migrate()
+
+    def _migrate(self) -> None:
+        with self._lock, self._conn:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                if version:
+                    logging.info(f"Discarding snapshot {self.path} with schema version {version}.")
+                self._conn.execute("DROP TABLE IF EXISTS documents")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "user_id TEXT NOT NULL, kind TEXT NOT NULL, key TEXT NOT NULL, "
+                "data TEXT NOT NULL, etag TEXT, saved_at REAL NOT NULL, "
+                "PRIMARY KEY (user_id, kind, key))"
+            )
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _save(self, kind: str, key: str, data, etag: str = None) -> None:
+        payload = habitica_json.dumps(data)
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents (user_id, kind, key, data, etag, saved_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.user_id, kind, key, payload, etag, time.time()),
+                )
+        except sqlite3.Error as e:
+            logging.error(f"Saving {kind} snapshot failed: {e}")
+
+    def _load(self, kind: str):
+        try:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT key, data, etag, saved_at FROM documents WHERE user_id = ? AND kind = ?",
+                    (self.user_id, kind),
+                ).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"Loading {kind} snapshot failed: {e}")
+            return []
+        return [(key, habitica_json.loads(data), etag, saved_at) for key, data, etag, saved_at in rows]
+
+    def save_listing(self, task_type: str, tasks: list, etag: str = None) -> None:
+        """
+        Store the tasks returned by list_tasks for ``task_type`` (None for all types).
+        """
+        self._save("listing", task_type or "", tasks, etag)
+
+    def load_listings(self) -> dict:
+        """
+        Return ``{task_type: (tasks, etag, saved_at)}`` for every stored listing.
+        """
+        return {key or None: (data, etag, saved_at) for key, data, etag, saved_at in self._load("listing")}
+
+    def save_tags(self, tags: list) -> None:
+        self._save("tags", "", tags)
+
+    def load_tags(self):
+        """
+        Return the stored tag list, or None if there is none.
+        """
+        rows = self._load("tags")
+        return rows[0][1] if rows else None
+
+    def save_profile(self, profile: dict) -> None:
+        self._save("profile", "", profile)
+
+    def load_profile(self):
+        """
+        Return the stored full user profile, or None if there is none.
+        """
+        rows = self._load("profile")
+        return rows[0][1] if rows else None
+
+    def invalidate(self, kind: str = None) -> None:
+        """
+        Delete this user's stored documents, optionally only those of one kind.
+
+        :param kind: "listing", "tags" or "profile"; None deletes everything for the user.
+        """
+        with self._lock, self._conn:
+            if kind is None:
+                self._conn.execute("DELETE FROM documents WHERE user_id = ?", (self.user_id,))
+            else:
+                self._conn.execute("DELETE FROM documents WHERE user_id = ? AND kind = ?", (self.user_id, kind))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def get_store(user_id: str):
+    """
+    Return the shared snapshot store for a user, or None if HABITICA_SNAPSHOT_PATH is not set.
+    """
+    if not HABITICA_SNAPSHOT_PATH:
+        return None
+    with _stores_lock:
+        store = _stores.get(user_id)
+        if store is None:
+            try:
+                store = _stores[user_id] = SnapshotStore(HABITICA_SNAPSHOT_PATH, user_id)
+            except sqlite3.Error as e:
+                logging.error(f"Opening snapshot {HABITICA_SNAPSHOT_PATH} failed: {e}")
+                return None
+        return store
+
+
+def close_store(user_id: str) -> None:
+    """
+    Close and forget a user's snapshot store; the snapshot stays on disk.
+    """
+    with _stores_lock:
+        store = _stores.pop(user_id, None)
+    if store is not None:
+        store.close()
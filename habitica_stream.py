@@ -0,0 +1,180 @@
+# habitica_stream.py
+"""
+Streaming helpers for large Habitica payloads such as the user data export.
+
+``iter_json_items`` is an incremental JSON parser: it consumes the document in
+chunks and yields only the values found at the requested paths (e.g. every task
+or every inbox message), so memory use is bounded by the largest single item
+rather than by the whole document.
+"""
+import re
+import json
+import zlib
+import codecs
+
+# Paths inside userdata.json whose values are yielded by iter_export_items, keyed by kind.
+EXPORT_PATTERNS = {
+    ("tasks", "*", "*"): "tasks",
+    ("history", "*", "*"): "history",
+    ("inbox", "messages", "*"): "inbox",
+}
+
+_WHITESPACE = re.compile(r"\s*")
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_SCALAR = re.compile(r'[^\s{}\[\],:"]+')
+
+# Parser states of a container frame.
+_KEY, _COLON, _VALUE, _COMMA = range(4)
+
+
+def iter_decompressed(chunks, decompress: bool = False):
+    """
+    Pass byte chunks through, inflating them on the fly if ``decompress`` is true.
+
+    Accepts gzip and zlib streams.
+    """
+    if not decompress:
+        yield from chunks
+        return
+    inflater = zlib.decompressobj(32 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = inflater.decompress(chunk)
+        if data:
+            yield data
+    tail = inflater.flush()
+    if tail:
+        yield tail
+
+
+def _decode(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in chunks:
+        yield chunk if isinstance(chunk, str) else decoder.decode(chunk)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _matches(pattern: tuple, path: list) -> bool:
+    if len(pattern) != len(path):
+        return False
+    return all(p == "*" or p == k for p, k in zip(pattern, path))
+
+
+def _leads_to_match(patterns: dict, path: list) -> bool:
+    depth = len(path)
+    return any(len(pattern) > depth and _matches(pattern[:depth], path) for pattern in patterns)
+
+
+def iter_json_items(chunks, patterns: dict):
+    """
+    Incrementally parse a JSON document and yield the values found at the given paths.
+
+    Only the containers leading to a requested path are walked token by token;
+    matching values, and subtrees that cannot contain a match, are decoded or
+    skipped in one step with the C JSON decoder.
+
+    :param chunks: Iterable of ``bytes`` (UTF-8) or ``str`` chunks of one JSON document.
+    :param patterns: Mapping of path tuples to labels. A path lists object keys and
+        array indexes from the root; "*" matches any key or index.
+        Example: {("tasks", "*", "*"): "tasks"} matches every element of every list under "tasks".
+
+    :return: Generator of ``(label, path, value)`` tuples in document order.
+        Memory use is bounded by the largest matching or skipped subtree.
+    :raises ValueError: If the document is not valid JSON.
+    """
+    patterns = {tuple(pattern): label for pattern, label in patterns.items()}
+    decoder = json.JSONDecoder()
+    stack = []
+    path = []
+    buf = ""
+    pos = 0
+    source = _decode(chunks)
+    exhausted = False
+    need_more = False
+
+    while True:
+        pos = _WHITESPACE.match(buf, pos).end()
+        if need_more or pos >= len(buf):
+            # Drop consumed text and read the next chunk.
+            buf, pos = buf[pos:], 0
+            need_more = False
+            if exhausted:
+                if buf or stack:
+                    raise ValueError("Unexpected end of JSON document.")
+                return
+            chunk = next(source, None)
+            if chunk is None:
+                exhausted = True
+            else:
+                buf += chunk
+            continue
+
+        char = buf[pos]
+        frame = stack[-1] if stack else None
+        if frame is not None and (frame[1] != _VALUE or frame[0] == "array" and char == "]" and path[-1] == 0):
+            if char == "," and frame[1] == _COMMA:
+                frame[1] = _KEY if frame[0] == "object" else _VALUE
+                if frame[0] == "array":
+                    path[-1] += 1
+                pos += 1
+            elif char == ("}" if frame[0] == "object" else "]") and frame[1] in (_KEY, _COMMA, _VALUE):
+                stack.pop()
+                path.pop()
+                if stack:
+                    stack[-1][1] = _COMMA
+                pos += 1
+            elif frame[1] == _KEY and char == '"':
+                match = _STRING.match(buf, pos)
+                if match is None:
+                    need_more = True
+                    continue
+                path[-1] = json.loads(match.group())
+                frame[1] = _COLON
+                pos = match.end()
+            elif frame[1] == _COLON and char == ":":
+                frame[1] = _VALUE
+                pos += 1
+            else:
+                raise ValueError(f"Unexpected {char!r} in JSON document.")
+            continue
+
+        # A value starts here.
+        label = next((label for pattern, label in patterns.items() if _matches(pattern, path)), None)
+        if label is None and _leads_to_match(patterns, path) and char in "{[":
+            stack.append(["object", _KEY] if char == "{" else ["array", _VALUE])
+            path.append(None if char == "{" else 0)
+            pos += 1
+            continue
+        scalar = _SCALAR.match(buf, pos) if char not in '{["' else None
+        if scalar is not None and scalar.end() == len(buf) and not exhausted:
+            # A number or literal at the end of the buffer may continue in the next chunk.
+            need_more = True
+            continue
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            if exhausted:
+                raise ValueError(f"Invalid JSON document: {e}") from None
+            need_more = True
+            continue
+        pos = end
+        if stack:
+            stack[-1][1] = _COMMA
+        if label is not None:
+            yield label, tuple(path), value
+
+
+def iter_export_items(chunks, kinds: list = None, decompress: bool = False):
+    """
+    Yield tasks, history entries and inbox messages from a userdata.json export stream.
+
+    :param chunks: Iterable of byte chunks of the export.
+    :param kinds: Optional subset of "tasks", "history" and "inbox" to yield.
+    :param decompress: Inflate gzip-compressed input on the fly.
+    :return: Generator of ``(kind, path, value)`` tuples, e.g.
+        ("tasks", ("tasks", "todos", 3), {"_id": "task-id", ...}) or
+        ("inbox", ("inbox", "messages", "message-id"), {"text": "Hi", ...}).
+    """
+    patterns = {path: kind for path, kind in EXPORT_PATTERNS.items() if not kinds or kind in kinds}
+    yield from iter_json_items(iter_decompressed(chunks, decompress), patterns)
@@ -0,0 +1,132 @@
+# habitica_sync.py
+"""
+Incremental task sync state.
+
+``TaskSync`` remembers every task it has seen with its ``updatedAt`` value and a
+high-water mark (the newest ``updatedAt``) per task type. Given a fresh listing it
+produces a change set of added, modified and removed tasks; only tasks updated
+after the type's high-water mark, or not seen before, are compared in detail.
+"""
+import os
+import threading
+import time
+import habitica_query
+
+# Seconds between fetches of completedTodos, which can hold thousands of tasks.
+DEFAULT_COMPLETED_INTERVAL = float(os.environ.get("HABITICA_SYNC_COMPLETED_INTERVAL", "900"))
+
+# Listing the active task types come from; completed to-dos are fetched separately.
+ACTIVE_TYPES = ("habits", "dailys", "todos", "rewards")
+COMPLETED_TODOS = "completedTodos"
+
+
+def listing_type(task: dict) -> str:
+    """
+    Return the list_tasks type a task belongs to ("habits", ..., or "completedTodos").
+    """
+    if task.get("type") == "todo" and task.get("completed"):
+        return COMPLETED_TODOS
+    return f"{task.get('type')}s"
+
+
+class TaskSync:
+    """
+    Per-user sync state: known tasks, their ``updatedAt`` and a high-water mark per task type.
+
+    :param completed_interval: Seconds between fetches of completed to-dos.
+    """
+
+    def __init__(self, completed_interval: float = None):
+        self.completed_interval = DEFAULT_COMPLETED_INTERVAL if completed_interval is None else completed_interval
+        # {task type: {task id: updatedAt timestamp}}
+        self._known = {}
+        self._high_water = {}
+        self._completed_fetched_at = None
+        self._lock = threading.Lock()
+
+    def completed_due(self) -> bool:
+        """
+        Return whether completed to-dos should be fetched in this sync.
+        """
+        fetched_at = self._completed_fetched_at
+        return fetched_at is None or time.monotonic() - fetched_at >= self.completed_interval
+
+    def apply(self, listings: dict) -> dict:
+        """
+        Compare fresh listings with the known state and record them.
+
+        :param listings: ``{task type: [task, ...]}`` for the types fetched in this sync;
+            types not present keep their previous state.
+        :return: Change set ``{"added": [task], "modified": [task], "removed": [task id]}``.
+            A task that moved between fetched types (e.g. a to-do that was completed, when
+            completed to-dos are fetched too) is reported as modified; a to-do that leaves
+            the active list while completed to-dos are not fetched is reported as removed
+            and shows up as added with the next completed to-do fetch.
+        """
+        added = {}
+        modified = {}
+        removed = set()
+        with self._lock:
+            if COMPLETED_TODOS in listings:
+                self._completed_fetched_at = time.monotonic()
+            # Tasks previously held by any listing fetched now, to tell moves from additions.
+            previously_listed = set()
+            for task_type in listings:
+                previously_listed.update(self._known.get(task_type, ()))
+
+            for task_type, tasks in listings.items():
+                known = self._known.get(task_type, {})
+                high_water = self._high_water.get(task_type)
+                current = {}
+                newest = high_water
+                for task in tasks:
+                    task_id = task.get("_id") or task.get("id")
+                    if not task_id:
+                        continue
+                    updated = habitica_query.parse_date(task.get("updatedAt")) or 0
+                    current[task_id] = updated
+                    if newest is None or updated > newest:
+                        newest = updated
+                    if task_id in known:
+                        # Unchanged tasks cannot be newer than the previous high-water mark.
+                        if high_water is not None and updated <= high_water:
+                            continue
+                        if updated != known[task_id]:
+                            modified[task_id] = task
+                    elif task_id in previously_listed or self._known_elsewhere(task_id, task_type):
+                        modified[task_id] = task
+                    else:
+                        added[task_id] = task
+                for task_id in known:
+                    if task_id not in current:
+                        removed.add(task_id)
+                self._known[task_type] = current
+                if newest is not None:
+                    self._high_water[task_type] = newest
+
+            # A task that left one listing but appeared in another was moved, not removed.
+            removed = {task_id for task_id in removed
+                       if task_id not in added and task_id not in modified and not self._known_anywhere(task_id)}
+        return {"added": list(added.values()), "modified": list(modified.values()), "removed": sorted(removed)}
+
+    def _known_elsewhere(self, task_id: str, task_type: str) -> bool:
+        return any(task_id in known for other, known in self._known.items() if other != task_type)
+
+    def _known_anywhere(self, task_id: str) -> bool:
+        return any(task_id in known for known in self._known.values())
+
+    def high_water_marks(self) -> dict:
+        """
+        Return the newest ``updatedAt`` seen per task type, as epoch seconds.
+        """
+        with self._lock:
+            return dict(self._high_water)
+
+    def reset(self) -> None:
+        """
+        Forget all sync state; the next sync reports every task as added.
+        """
+        with self._lock:
+            self._known.clear()
+            self._high_water.clear()
+            self._completed_fetched_at = None
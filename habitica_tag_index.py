@@ -0,0 +1,137 @@
+# habitica_tag_index.py
+"""
+Case-insensitive index of the user's tags.
+
+Resolves tag names to IDs with a dictionary lookup instead of a ``list_tags``
+round trip and a scan. One index is shared per Habitica user, so every ``Tools``
+instance sees the same tags and a missing tag is created only once even when
+several threads ask for it at the same time.
+"""
+import os
+import re
+import threading
+import time
+
+# Seconds after which the index is reloaded from Habitica before resolving a name it does not know.
+DEFAULT_TTL = float(os.environ.get("HABITICA_TAG_INDEX_TTL", "300"))
+
+_UUID = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$")
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def is_tag_id(value: str) -> bool:
+    """
+    Return whether a value looks like a tag ID (UUID) rather than a tag name.
+    """
+    return isinstance(value, str) and bool(_UUID.match(value))
+
+
+def normalize(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+class TagIndex:
+    """
+    Thread-safe name → tag mapping for one user.
+
+    :param ttl: Seconds the loaded tag list is trusted for names it does not contain.
+    """
+
+    def __init__(self, ttl: float = None):
+        self.ttl = DEFAULT_TTL if ttl is None else ttl
+        self._by_name = {}
+        self._by_id = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        # One lock per normalized name, so concurrent resolvers of a missing tag create it once.
+        self._create_locks = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def is_fresh(self) -> bool:
+        loaded_at = self._loaded_at
+        return loaded_at is not None and time.monotonic() - loaded_at < self.ttl
+
+    def load(self, tags: list) -> None:
+        """
+        Replace the index with a tag list as returned by list_tags.
+        """
+        with self._lock:
+            self._by_name = {}
+            self._by_id = {}
+            for tag in tags:
+                self._add(tag)
+            self._loaded_at = time.monotonic()
+
+    def _add(self, tag: dict) -> None:
+        if not isinstance(tag, dict) or not tag.get("id") or not isinstance(tag.get("name"), str):
+            return
+        self._by_id[tag["id"]] = tag
+        # The first tag wins when names differ only by case, matching list order.
+        self._by_name.setdefault(normalize(tag["name"]), tag)
+
+    def add(self, tag: dict) -> None:
+        """
+        Add a newly created tag.
+        """
+        with self._lock:
+            self._add(tag)
+
+    def remove(self, tag_id: str) -> None:
+        with self._lock:
+            tag = self._by_id.pop(tag_id, None)
+            if tag is not None and self._by_name.get(normalize(tag["name"])) is tag:
+                del self._by_name[normalize(tag["name"])]
+
+    def get(self, name: str):
+        """
+        Return the tag with this name (case-insensitive), or None.
+        """
+        return self._by_name.get(normalize(name))
+
+    def get_by_id(self, tag_id: str):
+        return self._by_id.get(tag_id)
+
+    def tags(self) -> list:
+        """
+        Return the indexed tags in list_tags order (newly created tags last).
+        """
+        with self._lock:
+            return list(self._by_id.values())
+
+    def creation_lock(self, name: str) -> threading.Lock:
+        """
+        Return the lock to hold while creating a tag with this name.
+        """
+        with self._lock:
+            return self._create_locks.setdefault(normalize(name), threading.Lock())
+
+    def invalidate(self) -> None:
+        """
+        Mark the index stale so the next unknown name reloads it.
+        """
+        with self._lock:
+            self._loaded_at = None
+
+
+def get_tag_index(user_id: str) -> TagIndex:
+    """
+    Return the shared tag index for a user, creating it on first use.
+    """
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+        if index is None:
+            index = _indexes[user_id] = TagIndex()
+        return index
+
+
+def remove_tag_index(user_id: str) -> None:
+    """
+    Forget a user's tag index; the next get_tag_index call starts an empty one.
+    """
+    with _indexes_lock:
+        _indexes.pop(user_id, None)
@@ -3,10 +3,16 @@
 A collection of methods to manage tags and skills within Habitica.
 """
 import os
-import requests
+import habitica_lazy
+import habitica_client
+import habitica_metrics
+import habitica_snapshot
+import habitica_tag_index
 import logging
 from typing import Union
 
+requests = habitica_lazy.lazy_import("requests")
+
 logging.basicConfig(level=logging.INFO)
 
 HABITICA_USER_ID = os.environ.get("HABITICA_USER_ID")
@@ -15,18 +21,58 @@ VALID_SKILLS = ["fireball", "mpheal", "earth", "frost", "smash", "defensiveStanc
                 "valorousPresence", "intimidate", "pickPocket", "backStab",
                 "toolsOfTrade", "stealth", "heal", "protectAura", "brightness",
                 "healAll", "snowball", "spookySparkles", "seafoam", "shinySeed"]
+# Class, mana cost, level required and target of each skill, from Habitica's content.
+# Targets: "task" and "user" (a party member) need a target ID; "self" and "party" do not.
+# Transformation items cost no mana and are used up from the user's special items instead.
+SKILLS = {
+    "fireball": {"class": "wizard", "mana": 10, "level": 11, "target": "task"},
+    "mpheal": {"class": "wizard", "mana": 30, "level": 12, "target": "party"},
+    "earth": {"class": "wizard", "mana": 35, "level": 13, "target": "party"},
+    "frost": {"class": "wizard", "mana": 40, "level": 14, "target": "self"},
+    "smash": {"class": "warrior", "mana": 10, "level": 11, "target": "task"},
+    "defensiveStance": {"class": "warrior", "mana": 25, "level": 12, "target": "self"},
+    "valorousPresence": {"class": "warrior", "mana": 20, "level": 13, "target": "party"},
+    "intimidate": {"class": "warrior", "mana": 15, "level": 14, "target": "party"},
+    "pickPocket": {"class": "rogue", "mana": 10, "level": 11, "target": "task"},
+    "backStab": {"class": "rogue", "mana": 15, "level": 12, "target": "task"},
+    "toolsOfTrade": {"class": "rogue", "mana": 25, "level": 13, "target": "party"},
+    "stealth": {"class": "rogue", "mana": 45, "level": 14, "target": "self"},
+    "heal": {"class": "healer", "mana": 15, "level": 11, "target": "self"},
+    "brightness": {"class": "healer", "mana": 15, "level": 12, "target": "self"},
+    "protectAura": {"class": "healer", "mana": 30, "level": 13, "target": "party"},
+    "healAll": {"class": "healer", "mana": 25, "level": 14, "target": "party"},
+    "snowball": {"class": None, "mana": 0, "level": 0, "target": "user"},
+    "spookySparkles": {"class": None, "mana": 0, "level": 0, "target": "user"},
+    "seafoam": {"class": None, "mana": 0, "level": 0, "target": "user"},
+    "shinySeed": {"class": None, "mana": 0, "level": 0, "target": "user"},
+}
+# Most casts a single cast_skills call performs, including repetitions from "count": "max".
+MAX_BATCH_CASTS = 100
 
+@habitica_metrics.instrument("tags_skills")
 class Tools:
-    def __init__(self):
-        if not HABITICA_USER_ID or not HABITICA_API_KEY:
+    def __init__(self, user_id: str = None, api_key: str = None):
+        # Credentials of the user to act for; default to the HABITICA_USER_ID/HABITICA_API_KEY environment variables.
+        user_id = user_id or HABITICA_USER_ID
+        api_key = api_key or HABITICA_API_KEY
+        if not user_id or not api_key:
             raise ValueError("Habitica credentials are not set in environment variables.")
         self.headers = {
-            "x-api-user": HABITICA_USER_ID,
-            "x-api-key": HABITICA_API_KEY,
+            "x-api-user": user_id,
+            "x-api-key": api_key,
             "Content-Type": "application/json",
-            "x-client": f"{HABITICA_USER_ID}-SessionMemory"
+            "x-client": f"{user_id}-SessionMemory"
         }
         self.base_url = "https://habitica.com/api/v3"
+        # Last known tags from the on-disk snapshot, served until the background refresh completes.
+        self.snapshot = habitica_snapshot.get_store(user_id)
+        self._snapshot_tags = self.snapshot.load_tags() if self.snapshot else None
+        self._snapshot_refresh = None
+        # Shared name -> tag index; snapshot tags seed it but are reloaded before trusting a miss.
+        self.tag_index = habitica_tag_index.get_tag_index(user_id)
+        if self._snapshot_tags is not None and not self.tag_index.loaded:
+            self.tag_index.load(self._snapshot_tags)
+            self.tag_index.invalidate()
 
     def create_tag(self, name: str) -> dict:
         """
@@ -57,9 +103,12 @@ class Tools:
         url = f"{self.base_url}/tags"
         payload = {"name": name}
         try:
-            response = requests.post(url, headers=self.headers, json=payload, timeout=10)
+            response = habitica_client.request("POST", url, headers=self.headers, json=payload, timeout=10)
             response.raise_for_status()
-            return {"success": True, "data": response.json()}
+            response_data = response.json()
+            self._snapshot_tags = None
+            self.tag_index.add(response_data.get("data"))
+            return {"success": True, "data": response_data, "meta": habitica_client.call_meta(response)}
         except requests.exceptions.RequestException as e:
             logging.error(f"Create tag failed: {e}")
             return {"success": False, "error": f"Request failed: {e}"}
@@ -68,6 +117,9 @@ class Tools:
         """
         List all tags for the authenticated user.
 
+        Tags loaded within the last ``HABITICA_TAG_INDEX_TTL`` seconds (default 300) are served
+        from the shared tag index without a request.
+
         :return: Dictionary with success status and data or error message.
             Example success response:
             {
@@ -90,15 +142,104 @@ class Tools:
                 "error": "Request failed: <error details>"
             }
         """
+        snapshot_tags = self._snapshot_tags
+        if snapshot_tags is not None:
+            refresh = self._snapshot_refresh
+            # Start a refresh, or a new one if the last failed, so an outage at startup is not permanent.
+            if refresh is None or refresh.done() and (refresh.exception() or not refresh.result()["success"]):
+                self._snapshot_refresh = habitica_client.get_executor().submit(self._fetch_tags)
+            return {"success": True, "data": {"success": True, "data": snapshot_tags}, "meta": {"cache": "snapshot"}}
+        if self.tag_index.is_fresh():
+            # Loaded by a list_tags call within HABITICA_TAG_INDEX_TTL and kept current by create_tag.
+            return {"success": True, "data": {"success": True, "data": self.tag_index.tags()}, "meta": {"cache": "hit"}}
+        return self._fetch_tags()
+
+    def _fetch_tags(self) -> dict:
         url = f"{self.base_url}/tags"
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = habitica_client.request("GET", url, headers=self.headers, timeout=10)
             response.raise_for_status()
-            return {"success": True, "data": response.json()}
+            response_data = response.json()
+            if self.snapshot:
+                self.snapshot.save_tags(response_data["data"])
+            self.tag_index.load(response_data["data"])
+            self._snapshot_tags = None
+            return {"success": True, "data": response_data, "meta": habitica_client.call_meta(response)}
         except requests.exceptions.RequestException as e:
             logging.error(f"List tags failed: {e}")
             return {"success": False, "error": f"Request failed: {e}"}
 
+    def resolve_tags(self, names: list, create: bool = False, ignore_missing: bool = False) -> dict:
+        """
+        Resolve tag names to tag IDs (case-insensitive), optionally creating missing tags.
+
+        Names are looked up in a cached index that is loaded with one list_tags call and
+        shared by all Tools instances of the user. A missing tag is created only once,
+        even when several threads resolve it at the same time. Values that already are
+        tag IDs are passed through unchanged.
+
+        :param names: List of tag names or IDs.
+            Example: ["Work", "errands", "3d5d324d-a042-4d5f-872e-0553e228553e"]
+        :param create: Create tags that do not exist yet.
+        :param ignore_missing: Leave unknown names out of the result instead of failing.
+
+        :return: Dictionary with success status and a ``{name: tag_id}`` mapping or error message.
+            Example success response:
+            {
+                "success": true,
+                "data": {"Work": "3d5d324d-a042-4d5f-872e-0553e228553e", "errands": "f23c12f2-5830-4f15-9c36-e17fd729a812"}
+            }
+
+            Example error response:
+            {
+                "success": false,
+                "error": "Unknown tags: Gardening"
+            }
+        """
+        if not isinstance(names, list) or not all(isinstance(name, str) and name.strip() for name in names):
+            return {"success": False, "error": "names must be a list of non-empty strings."}
+
+        resolved = {}
+        missing = []
+        for name in names:
+            if habitica_tag_index.is_tag_id(name):
+                resolved[name] = name
+            else:
+                tag = self.tag_index.get(name)
+                if tag is None:
+                    missing.append(name)
+                else:
+                    resolved[name] = tag["id"]
+
+        if missing and not self.tag_index.is_fresh():
+            result = self._fetch_tags()
+            if not result["success"]:
+                return result
+            still_missing = []
+            for name in missing:
+                tag = self.tag_index.get(name)
+                if tag is None:
+                    still_missing.append(name)
+                else:
+                    resolved[name] = tag["id"]
+            missing = still_missing
+
+        if missing and create:
+            for name in missing:
+                with self.tag_index.creation_lock(name):
+                    tag = self.tag_index.get(name)
+                    if tag is None:
+                        result = self.create_tag(" ".join(name.split()))
+                        if not result["success"]:
+                            return result
+                        tag = result["data"]["data"]
+                resolved[name] = tag["id"]
+            missing = []
+
+        if missing and not ignore_missing:
+            return {"success": False, "error": f"Unknown tags: {', '.join(missing)}"}
+        return {"success": True, "data": resolved}
+
     def cast_skill(self, spell_id: str, target_id: str = None) -> dict:
         """
         Cast a skill in Habitica.
@@ -133,12 +274,160 @@ class Tools:
             logging.error(error_msg)
             return {"success": False, "error": error_msg}
 
+        try:
+            result, response = self._post_cast(spell_id, target_id)
+            result["meta"] = habitica_client.call_meta(response)
+            return result
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Cast skill failed: {e}")
+            return {"success": False, "error": f"Request failed: {e}"}
+
+    def _post_cast(self, spell_id: str, target_id: str = None) -> tuple:
         url = f"{self.base_url}/user/class/cast/{spell_id}"
         params = {"targetId": target_id} if target_id else {}
+        response = habitica_client.request("POST", url, headers=self.headers, params=params, timeout=10)
+        response.raise_for_status()
+        return response.json(), response
+
+    def cast_skills(self, casts: list, dry_run: bool = False) -> dict:
+        """
+        Cast several skills in order, checked against the user's class, level and mana first.
+
+        The user's stats are fetched once. Each cast is checked against its class and level
+        requirements, its target and the mana left after the casts before it (transformation
+        items against the number the user owns); casts that cannot succeed are skipped
+        instead of being sent. The remaining casts run one after another through the shared
+        rate budget, and the mana reported by Habitica after each cast is used for the next.
+
+        :param casts: List of dictionaries with "spell_id", an optional "target_id" (required for
+            skills cast on a task or party member) and an optional "count": how many times to
+            cast it, or "max" to cast it as often as mana allows. (Default count is 1)
+            Example:
+            [
+                {"spell_id": "fireball", "target_id": "task-id-123", "count": "max"},
+                {"spell_id": "earth"}
+            ]
+        :param dry_run: (optional, default False) Only check the plan; no skill is cast.
+
+        :return: Dictionary with a result for each planned cast, in order, and a summary.
+            "success" is true only if every cast succeeded (or, for a dry run, would be sent).
+            Example response:
+            {
+                "success": False,
+                "data": [
+                    {"index": 0, "spell_id": "fireball", "target_id": "task-id-123", "status": "cast", "success": True, "mana": 110.0},
+                    {"index": 0, "spell_id": "fireball", "target_id": "task-id-123", "status": "cast", "success": True, "mana": 100.0},
+                    {"index": 1, "spell_id": "earth", "target_id": None, "status": "skipped", "success": False, "error": "Not enough mana: earth costs 35, 5.0 left."}
+                ],
+                "summary": {"cast": 2, "skipped": 1, "failed": 0, "mana_before": 120.0, "mana_after": 100.0}
+            }
+        """
+        if not isinstance(casts, list) or not casts:
+            return {"success": False, "error": "casts must be a non-empty list."}
+        for index, cast in enumerate(casts):
+            if not isinstance(cast, dict) or cast.get("spell_id") not in SKILLS:
+                return {"success": False, "error": f"casts[{index}] must have a spell_id, one of: {', '.join(VALID_SKILLS)}"}
+            count = cast.get("count", 1)
+            if count != "max" and (not isinstance(count, int) or isinstance(count, bool) or count < 1):
+                return {"success": False, "error": f"casts[{index}].count must be a positive integer or \"max\"."}
+
+        url = f"{self.base_url}/user"
+        params = {"userFields": "stats,items.special,flags.classSelected,preferences.disableClasses"}
         try:
-            response = requests.post(url, headers=self.headers, params=params, timeout=10)
+            response = habitica_client.request("GET", url, headers=self.headers, params=params, timeout=10)
             response.raise_for_status()
-            return response.json()
+            user = response.json()["data"]
         except requests.exceptions.RequestException as e:
-            logging.error(f"Cast skill failed: {e}")
+            logging.error(f"Cast skills failed to fetch user stats: {e}")
             return {"success": False, "error": f"Request failed: {e}"}
+
+        stats = user.get("stats") or {}
+        mana = float(stats.get("mp") or 0)
+        mana_before = mana
+        items = dict((user.get("items") or {}).get("special") or {})
+        classes_enabled = (user.get("flags") or {}).get("classSelected", True) and \
+            not (user.get("preferences") or {}).get("disableClasses", False)
+
+        results = []
+        planned = 0
+        for index, cast in enumerate(casts):
+            spell_id = cast["spell_id"]
+            target_id = cast.get("target_id")
+            skill = SKILLS[spell_id]
+            count = cast.get("count", 1)
+            repeat = MAX_BATCH_CASTS if count == "max" else count
+            for _ in range(repeat):
+                entry = {"index": index, "spell_id": spell_id, "target_id": target_id}
+                error = self._cast_problem(skill, spell_id, target_id, stats, classes_enabled, mana, items)
+                if error is None and planned >= MAX_BATCH_CASTS:
+                    error = f"A batch can cast at most {MAX_BATCH_CASTS} skills."
+                if error is not None:
+                    # "max" ends quietly once the budget runs out, unless not even one cast was possible.
+                    if count != "max" or not any(r["index"] == index and r["status"] != "skipped" for r in results):
+                        results.append({**entry, "status": "skipped", "success": False, "error": error})
+                    break
+                planned += 1
+                if dry_run:
+                    mana -= skill["mana"]
+                    results.append({**entry, "status": "planned", "success": True, "mana": mana})
+                else:
+                    mana = self._run_cast(entry, skill, mana, results)
+                    if results[-1]["status"] == "failed":
+                        # Repeating a cast Habitica just refused would fail the same way.
+                        break
+                if skill["class"] is None:
+                    items[spell_id] = items.get(spell_id, 0) - 1
+
+        done = {status: sum(1 for r in results if r["status"] == status) for status in ("cast", "planned", "skipped", "failed")}
+        summary = {"cast": done["cast"], "skipped": done["skipped"], "failed": done["failed"],
+                   "mana_before": mana_before, "mana_after": mana}
+        if dry_run:
+            summary = {"planned": done["planned"], "skipped": done["skipped"],
+                       "mana_before": mana_before, "mana_after": mana}
+        return {"success": done["skipped"] == 0 and done["failed"] == 0, "data": results, "summary": summary}
+
+    @staticmethod
+    def _cast_problem(skill: dict, spell_id: str, target_id: str, stats: dict, classes_enabled: bool,
+                      mana: float, items: dict):
+        """
+        Return why a cast cannot succeed with the given state, or None.
+        """
+        if skill["class"] is not None:
+            if not classes_enabled or stats.get("class") != skill["class"]:
+                return f"{spell_id} is a {skill['class']} skill; the user's class is {stats.get('class')}."
+            if (stats.get("lvl") or 0) < skill["level"]:
+                return f"{spell_id} requires level {skill['level']}; the user is level {stats.get('lvl')}."
+        elif items.get(spell_id, 0) < 1:
+            return f"The user has no {spell_id} left."
+        if skill["target"] in ("task", "user") and not target_id:
+            return f"{spell_id} must be cast on a {'task' if skill['target'] == 'task' else 'party member'}; target_id is required."
+        if skill["mana"] > mana:
+            return f"Not enough mana: {spell_id} costs {skill['mana']}, {mana:g} left."
+        return None
+
+    def _run_cast(self, entry: dict, skill: dict, mana: float, results: list) -> float:
+        """
+        Cast one planned skill, append its result and return the mana left afterwards.
+        """
+        try:
+            result, _ = self._post_cast(entry["spell_id"], entry["target_id"])
+        except requests.exceptions.HTTPError as e:
+            try:
+                message = e.response.json().get("message") or str(e)
+            except ValueError:
+                message = str(e)
+            logging.error(f"Cast {entry['spell_id']} failed: {message}")
+            results.append({**entry, "status": "failed", "success": False, "error": message})
+            if e.response.status_code == 401 and "mana" in message.lower():
+                # Habitica knows less mana than we did; no cast of this cost or more can succeed now.
+                return min(mana, skill["mana"] - 0.01)
+            return mana
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Cast {entry['spell_id']} failed: {e}")
+            results.append({**entry, "status": "failed", "success": False, "error": f"Request failed: {e}"})
+            return mana
+        data = result.get("data") or {}
+        reported = ((data.get("user") or {}).get("stats") or {}).get("mp")
+        mana = float(reported) if reported is not None else mana - skill["mana"]
+        results.append({**entry, "status": "cast", "success": True, "mana": mana})
+        return mana
@@ -3,32 +3,191 @@
 A collection of methods to interact with Habitica's API for task management.
 """
 import os
-import requests
+import functools
+import threading
+import habitica_lazy
+import habitica_client
+import habitica_metrics
+import habitica_cache
+import habitica_snapshot
+import habitica_query
+import habitica_tags_skills
+import habitica_tag_index
+import habitica_writebehind
+import habitica_sync
 import logging
+from datetime import datetime, timezone
 from typing import Union
 
+requests = habitica_lazy.lazy_import("requests")
+
 logging.basicConfig(level=logging.INFO)
 
 HABITICA_USER_ID = os.environ.get("HABITICA_USER_ID")
 HABITICA_API_KEY = os.environ.get("HABITICA_API_KEY")
 HABITICA_GPT_TAG_ID = "30cfedfe-4510-43a2-a8db-d87042c0c33a"
+HABITICA_WRITE_BEHIND = os.environ.get("HABITICA_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+# Timeout for array requests, which take longer for Habitica to process than single tasks.
+BULK_TIMEOUT = 30
+# Task difficulties accepted by query_tasks: Trivial, Easy, Medium, Hard.
+PRIORITIES = (0.1, 1.0, 1.5, 2.0)
+# How list_all_tasks handles completed to-dos.
+COMPLETED_TODOS_MODES = ("include", "skip", "lazy")
+
+
+def merge_tasks(collection: dict, tasks: list) -> None:
+    """
+    Add tasks to a ``{_id: task}`` mapping; of two copies of a task the later ``updatedAt`` wins.
+    """
+    for task in tasks:
+        task_id = task.get("_id")
+        current = collection.get(task_id)
+        if current is None or (task.get("updatedAt") or "") >= (current.get("updatedAt") or ""):
+            dict.__setitem__(collection, task_id, task)
+
+
+class TaskCollection(dict):
+    """
+    Tasks keyed by ``_id``, as returned by ``Tools.list_all_tasks``.
 
+    When completed to-dos were requested lazily, looking up a task ID that is not present
+    (``tasks[task_id]``) or calling ``load_completed()`` fetches them once and merges them in.
+    """
+
+    def __init__(self, tasks: list = (), load_completed=None):
+        super().__init__()
+        merge_tasks(self, tasks)
+        self._loader = load_completed
+        self._lock = threading.Lock()
+
+    @property
+    def completed_loaded(self) -> bool:
+        return self._loader is None
+
+    def load_completed(self) -> dict:
+        """
+        Fetch completed to-dos now if they were deferred.
+
+        :return: Dictionary with success status and the number of completed to-dos merged in, or error message.
+        """
+        with self._lock:
+            if self._loader is None:
+                return {"success": True, "data": 0}
+            result = self._loader()
+            if not result["success"]:
+                return result
+            merge_tasks(self, result["data"])
+            self._loader = None
+            return {"success": True, "data": len(result["data"])}
+
+    def __missing__(self, task_id):
+        if self._loader is not None and self.load_completed()["success"] and dict.__contains__(self, task_id):
+            return dict.__getitem__(self, task_id)
+        raise KeyError(task_id)
+
+
+@habitica_metrics.instrument("tasks")
 class Tools:
-    def __init__(self):
-        if not HABITICA_USER_ID or not HABITICA_API_KEY:
+    def __init__(self, user_id: str = None, api_key: str = None):
+        # Credentials of the user to act for; default to the HABITICA_USER_ID/HABITICA_API_KEY environment variables.
+        user_id = user_id or HABITICA_USER_ID
+        api_key = api_key or HABITICA_API_KEY
+        if not user_id or not api_key:
             raise ValueError("Habitica credentials are not set in environment variables.")
         self.headers = {
-            "x-api-user": HABITICA_USER_ID,
-            "x-api-key": HABITICA_API_KEY,
+            "x-api-user": user_id,
+            "x-api-key": api_key,
             "Content-Type": "application/json",
-            "x-client": f"{HABITICA_USER_ID}-SessionMemory"
+            "x-client": f"{user_id}-SessionMemory"
         }
         self.base_url = "https://habitica.com/api/v3"
+        self.task_cache = habitica_cache.TaskCache()
+        self._task_index = None
+        self._task_index_key = None
+        self.snapshot = habitica_snapshot.get_store(user_id)
+        self._snapshot_listings = []
+        self._tag_tools = None
+        self.write_queue = None
+        # SQLite file the write-behind queue is kept in (None: in memory); set by the host, not by tool calls.
+        self.write_queue_path = habitica_writebehind.HABITICA_WRITE_QUEUE_PATH
+        self.sync_state = habitica_sync.TaskSync()
+        if self.snapshot:
+            self._restore_snapshot()
+        if HABITICA_WRITE_BEHIND:
+            self.set_write_behind(True)
+
+    def _restore_snapshot(self) -> None:
+        """
+        Seed the task cache from the on-disk snapshot; the restored listings are
+        refreshed in the background on the first read.
+        """
+        listings = self.snapshot.load_listings()
+        for task_type, (tasks, etag, saved_at) in listings.items():
+            self.task_cache.store_listing(task_type, tasks, etag)
+        self._snapshot_listings = list(listings)
+
+    def _refresh_snapshot(self) -> None:
+        listings, self._snapshot_listings = self._snapshot_listings, []
+        if listings:
+            habitica_client.get_executor().submit(
+                lambda: [self._fetch_listing(task_type) for task_type in listings]
+            )
+
+    def _resolve_tags(self, names: list, create: bool = True, ignore_missing: bool = False) -> dict:
+        """
+        Resolve tag names to IDs through the shared tag index. See ``habitica_tags_skills.Tools.resolve_tags``.
+        """
+        if self._tag_tools is None:
+            self._tag_tools = habitica_tags_skills.Tools(self.headers["x-api-user"], self.headers["x-api-key"])
+        self._tag_tools.base_url = self.base_url
+        self._tag_tools.headers = self.headers
+        return self._tag_tools.resolve_tags(names, create, ignore_missing)
+
+    def _prepare_task(self, task_data: dict) -> str:
+        """
+        Validate a new task, resolve tag names to IDs and tag it with HABITICA_GPT_TAG_ID.
+
+        :return: An error message, or None if the task is valid.
+        """
+        # Input validation
+        if not isinstance(task_data, dict):
+            return "task_data must be a dictionary."
+        required_fields = ["text", "type"]
+        for field in required_fields:
+            if field not in task_data or not task_data[field]:
+                return f"'{field}' is required and cannot be empty."
+
+        valid_types = ["habit", "daily", "todo", "reward"]
+        if task_data["type"] not in valid_types:
+            return f"Invalid task type. Must be one of {valid_types}."
+
+        if "tags" in task_data:
+            if not isinstance(task_data["tags"], list):
+                return "tags must be a list of tag IDs or names."
+            names = [tag for tag in task_data["tags"] if not habitica_tag_index.is_tag_id(tag)]
+            if names:
+                result = self._resolve_tags(names)
+                if not result["success"]:
+                    return result["error"]
+                task_data["tags"] = [result["data"].get(tag, tag) for tag in task_data["tags"]]
+
+        # Ensure the task is tagged with the specified tag ID
+        if "tags" in task_data:
+            if HABITICA_GPT_TAG_ID not in task_data["tags"]:
+                task_data["tags"].append(HABITICA_GPT_TAG_ID)
+        else:
+            task_data["tags"] = [HABITICA_GPT_TAG_ID]
+        return None
 
     def create_task(self, task_data: dict) -> dict:
         """
         Create a new task in Habitica.
 
+        A task with an "alias" is retried after transient failures and, if an earlier attempt
+        already created it, that task is returned with "reconciled" in meta. Without an alias
+        a failure that may have reached Habitica is not retried and is reported with
+        ``"meta": {"outcome": "unknown"}``.
+
         valid_types = ["habit", "daily", "todo", "reward"]
 
         :param task_data: Dictionary containing task details.
@@ -62,31 +221,156 @@ class Tools:
                 "error": "Request failed: <error details>"
             }
         """
-        # Input validation
-        required_fields = ["text", "type"]
-        for field in required_fields:
-            if field not in task_data or not task_data[field]:
-                return {"success": False, "error": f"'{field}' is required and cannot be empty."}
+        error = self._prepare_task(task_data)
+        if error:
+            return {"success": False, "error": error}
 
-        valid_types = ["habit", "daily", "todo", "reward"]
-        if task_data["type"] not in valid_types:
-            return {"success": False, "error": f"Invalid task type. Must be one of {valid_types}."}
+        url = f"{self.base_url}/tasks/user"
+        alias = task_data.get("alias")
+        try:
+            # Habitica rejects a second task with the same alias, so a create carrying an alias
+            # can be retried like an idempotent request; without one it is sent at most once.
+            response = habitica_client.request("POST", url, headers=self.headers, json=task_data, timeout=10,
+                                               idempotent=bool(alias))
+            meta = habitica_client.call_meta(response)
+            if alias and response.status_code == 400 and meta["retries"]:
+                # An earlier attempt may have created the task before its answer was lost.
+                existing = self._find_created_task(alias, task_data)
+                if existing is not None:
+                    logging.info(f"Create task: found task {existing.get('_id')} created by an unanswered request.")
+                    self.task_cache.put(existing, new=True)
+                    return {"success": True, "data": {"success": True, "data": existing},
+                            "meta": {**meta, "reconciled": True}}
+            response.raise_for_status()
+            response_data = response.json()
+            self.task_cache.put(response_data.get("data"), new=True)
+            return {"success": True, "data": response_data, "meta": meta}
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Create task failed: {e}")
+            if alias or not self._outcome_unknown(e):
+                return {"success": False, "error": f"Request failed: {e}"}
+            return {
+                "success": False,
+                "error": f"Request failed: {e}. The task may have been created; list the tasks before "
+                         f"creating it again, or give it an alias so the create can be retried safely.",
+                "meta": {"outcome": "unknown"},
+            }
 
-        # Ensure the task is tagged with the specified tag ID
-        if "tags" in task_data:
-            if HABITICA_GPT_TAG_ID not in task_data["tags"]:
-                task_data["tags"].append(HABITICA_GPT_TAG_ID)
-        else:
-            task_data["tags"] = [HABITICA_GPT_TAG_ID]
+    @staticmethod
+    def _outcome_unknown(error: Exception) -> bool:
+        """
+        Return whether a failed create may still have reached Habitica and created the task.
+        """
+        if isinstance(error, requests.exceptions.HTTPError):
+            return error.response is not None and error.response.status_code in habitica_client.RETRY_STATUSES
+        return habitica_client.is_transient(error)
 
+    def _find_created_task(self, alias: str, task_data: dict):
+        """
+        Return the task with ``alias`` if it matches ``task_data``'s type and text, else None.
+        """
+        result = self.get_task(alias)
+        if not result["success"]:
+            return None
+        task = result["data"].get("data") if isinstance(result["data"], dict) else None
+        if not task or task.get("type") != task_data["type"] or task.get("text") != task_data["text"]:
+            return None
+        return task
+
+    def create_tasks(self, tasks: list, chunk_size: int = 25) -> dict:
+        """
+        Create many tasks in Habitica using array requests.
+
+        Tasks are validated individually, packed into arrays of up to ``chunk_size``
+        and sent concurrently within the rate budget. If Habitica rejects a chunk,
+        it is split in halves until the bad task is isolated, so it only fails itself.
+
+        :param tasks: List of task dictionaries, each in the format accepted by create_task.
+            Example:
+            [
+                {"text": "Read a book", "type": "todo"},
+                {"text": "Drink water", "type": "habit"}
+            ]
+        :param chunk_size: Maximum number of tasks per request. (Default is 25)
+
+        :return: Dictionary with a result for each task, in input order.
+            "success" is true only if every task was created.
+            Example response:
+            {
+                "success": False,
+                "data": [
+                    {"index": 0, "success": True, "data": {"_id": "task-id", "text": "Read a book", ...}},
+                    {"index": 1, "success": False, "error": "'type' is required and cannot be empty."}
+                ],
+                "summary": {"created": 1, "failed": 1}
+            }
+        """
+        if not isinstance(tasks, list) or not tasks:
+            return {"success": False, "error": "tasks must be a non-empty list."}
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            return {"success": False, "error": "chunk_size must be a positive integer."}
+
+        results = [None] * len(tasks)
+        valid = []
+        for index, task_data in enumerate(tasks):
+            error = self._prepare_task(task_data)
+            if error:
+                results[index] = {"index": index, "success": False, "error": error}
+            else:
+                valid.append(index)
+
+        chunks = [valid[i:i + chunk_size] for i in range(0, len(valid), chunk_size)]
+        for chunk_results in habitica_client.map_concurrent(lambda chunk: self._create_chunk(tasks, chunk), chunks):
+            for result in chunk_results:
+                results[result["index"]] = result
+
+        created = sum(1 for result in results if result["success"])
+        return {
+            "success": created == len(tasks),
+            "data": results,
+            "summary": {"created": created, "failed": len(tasks) - created}
+        }
+
+    def _create_chunk(self, tasks: list, indexes: list) -> list:
+        """
+        Create the tasks at ``indexes`` with one array request and return a result for each.
+        """
         url = f"{self.base_url}/tasks/user"
+        payload = [tasks[index] for index in indexes]
         try:
-            response = requests.post(url, headers=self.headers, json=task_data, timeout=10)
+            response = habitica_client.request("POST", url, headers=self.headers, json=payload, timeout=BULK_TIMEOUT)
             response.raise_for_status()
-            return {"success": True, "data": response.json()}
+            created = response.json()["data"]
+        except requests.exceptions.HTTPError as e:
+            if response.status_code == 400 and len(indexes) > 1:
+                # Habitica validates the whole array at once; bisect the chunk to isolate the bad task(s).
+                logging.info(f"Create tasks chunk of {len(indexes)} rejected ({e}); splitting it.")
+                middle = len(indexes) // 2
+                halves = habitica_client.map_concurrent(
+                    lambda part: self._create_chunk(tasks, part), [indexes[:middle], indexes[middle:]]
+                )
+                return halves[0] + halves[1]
+            if response.status_code == 400:
+                try:
+                    error = response.json().get("message") or f"Request failed: {e}"
+                except ValueError:
+                    error = f"Request failed: {e}"
+                logging.error(f"Create task rejected (400): {error}")
+                return [{"index": indexes[0], "success": False, "error": error}]
+            logging.error(f"Create tasks failed: {e} | Response: {response.text}")
+            return [{"index": index, "success": False, "error": f"Request failed: {e}"} for index in indexes]
         except requests.exceptions.RequestException as e:
-            logging.error(f"Create task failed: {e}")
-            return {"success": False, "error": f"Request failed: {e}"}
+            logging.error(f"Create tasks request exception: {e}")
+            return [{"index": index, "success": False, "error": f"Request failed: {e}"} for index in indexes]
+
+        if isinstance(created, dict):
+            created = [created]
+        for task in created:
+            self.task_cache.put(task, new=True)
+        results = [{"index": index, "success": True, "data": task} for index, task in zip(indexes, created)]
+        for index in indexes[len(created):]:
+            results.append({"index": index, "success": False, "error": "Task missing from Habitica's response."})
+        return results
 
     def get_task(self, task_id: str) -> dict:
         """
@@ -116,11 +400,18 @@ class Tools:
         if not isinstance(task_id, str) or not task_id:
             return {"success": False, "error": "task_id must be a non-empty string."}
 
+        self._refresh_snapshot()
+        cached = self.task_cache.get(task_id)
+        if cached is not None:
+            return {"success": True, "data": {"success": True, "data": cached}, "meta": {"cache": "hit"}}
+
         url = f"{self.base_url}/tasks/{task_id}"
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = habitica_client.request("GET", url, headers=self.headers, timeout=10)
             response.raise_for_status()
-            return {"success": True, "data": response.json()}
+            response_data = response.json()
+            self.task_cache.put(response_data.get("data"))
+            return {"success": True, "data": response_data, "meta": habitica_client.call_meta(response)}
         except requests.exceptions.RequestException as e:
             logging.error(f"Get task failed: {e}")
             return {"success": False, "error": f"Request failed: {e}"}
@@ -157,17 +448,242 @@ class Tools:
                 "error": f"Invalid task_type. Must be one of {valid_task_types}."
             }
 
+        task_type = task_type or None
+        self._refresh_snapshot()
+        cached = self.task_cache.get_listing(task_type)
+        if cached is not None:
+            return {"success": True, "data": cached, "meta": {"cache": "hit"}}
+        return self._fetch_listing(task_type)
+
+    def list_all_tasks(self, task_types: list = None, completed_todos: str = "include") -> dict:
+        """
+        List tasks of several types at once, merged into one collection keyed by task ID.
+
+        The listings are fetched concurrently under the shared rate budget (and served from
+        the task cache when fresh). All active types together take a single unfiltered request.
+        A task that shows up in two listings, e.g. a to-do completed between the requests,
+        is kept once, in its most recently updated form.
+
+        :param task_types: (optional) Task types to list; defaults to all of "habits", "dailys",
+            "todos" and "rewards".
+            Example: ["dailys", "todos"]
+        :param completed_todos: (optional, default "include") How to handle completed to-dos:
+            - "include": fetch them together with the other types.
+            - "skip": leave them out.
+            - "lazy": return without them; they are fetched on first lookup of an unknown
+              task ID (``data[task_id]``) or on ``data.load_completed()``.
+
+        :return: Dictionary with success status and the tasks keyed by ID, or error message.
+            Example success response:
+            {
+                "success": True,
+                "data": {
+                    "task-id-123": {"_id": "task-id-123", "text": "Read a book", "type": "todo", ...},
+                    ...
+                },
+                "meta": {
+                    "counts": {"habits": 12, "dailys": 8, "todos": 20, "rewards": 3, "completedTodos": 154},
+                    "completed_todos": "include"
+                }
+            }
+        """
+        task_types = list(habitica_sync.ACTIVE_TYPES) if task_types is None else task_types
+        if not isinstance(task_types, list) or not set(task_types) <= set(habitica_sync.ACTIVE_TYPES):
+            return {"success": False, "error": f"task_types must be a list of {list(habitica_sync.ACTIVE_TYPES)}."}
+        if completed_todos not in COMPLETED_TODOS_MODES:
+            return {"success": False, "error": f"completed_todos must be one of {list(COMPLETED_TODOS_MODES)}."}
+
+        active = set(task_types)
+        if active == set(habitica_sync.ACTIVE_TYPES):
+            listings = [None]
+        else:
+            listings = [task_type for task_type in habitica_sync.ACTIVE_TYPES if task_type in active]
+        if completed_todos == "include":
+            listings.append(habitica_sync.COMPLETED_TODOS)
+
+        results = habitica_client.map_concurrent(self.list_tasks, listings)
+        for result in results:
+            if not result["success"]:
+                return result
+
+        loader = None
+        if completed_todos == "lazy":
+            loader = functools.partial(self.list_tasks, habitica_sync.COMPLETED_TODOS)
+        collection = TaskCollection(load_completed=loader)
+        for result in results:
+            merge_tasks(collection, result["data"])
+        counts = dict.fromkeys(task_types, 0)
+        for task in collection.values():
+            task_type = habitica_sync.listing_type(task)
+            counts[task_type] = counts.get(task_type, 0) + 1
+        return {"success": True, "data": collection, "meta": {"counts": counts, "completed_todos": completed_todos}}
+
+    def _fetch_listing(self, task_type: str = None) -> dict:
+        """
+        Fetch a task listing from Habitica, revalidating the cached copy with its ETag.
+        """
         url = f"{self.base_url}/tasks/user"
         params = {"type": task_type} if task_type else {}
+        headers = self.headers
+        etag = self.task_cache.listing_etag(task_type)
+        if etag:
+            headers = {**self.headers, "If-None-Match": etag}
         try:
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
+            response = habitica_client.request("GET", url, headers=headers, params=params, timeout=10)
             response.raise_for_status()
+            if response.status_code == 304:
+                cached = self.task_cache.revalidate_listing(task_type)
+                if cached is not None:
+                    meta = {**habitica_client.call_meta(response), "cache": "revalidated"}
+                    return {"success": True, "data": cached, "meta": meta}
+                response = habitica_client.request("GET", url, headers=self.headers, params=params, timeout=10)
+                response.raise_for_status()
             response_data = response.json()
-            return {"success": True, "data": response_data["data"]}
+            etag = response.headers.get("ETag")
+            self.task_cache.store_listing(task_type, response_data["data"], etag)
+            if self.snapshot:
+                self.snapshot.save_listing(task_type, response_data["data"], etag)
+            return {"success": True, "data": response_data["data"], "meta": habitica_client.call_meta(response)}
         except requests.exceptions.RequestException as e:
             logging.error(f"List tasks failed: {e}")
             return {"success": False, "error": f"Request failed: {e}"}
 
+    def query_tasks(self, tags: list = None, task_type: str = None, due_before: str = None,
+                    due_after: str = None, text_contains: str = None, completed: bool = None,
+                    priority: float = None, include_completed_todos: bool = False, limit: int = None) -> dict:
+        """
+        Find tasks matching all of the given filters using prebuilt indexes.
+
+        Task data comes from list_tasks (and its cache); the indexes are rebuilt only
+        when the cached tasks change, so repeated queries do not rescan the task list.
+
+        :param tags: Optional list of tag IDs the task must all carry.
+            Example: ["30cfedfe-4510-43a2-a8db-d87042c0c33a"]
+        :param task_type: Optional task type: "habit", "daily", "todo" or "reward".
+        :param due_before: Optional ISO date; only tasks due strictly before it.
+            Example: "2025-04-01T00:00:00Z"
+        :param due_after: Optional ISO date; only tasks due strictly after it.
+        :param text_contains: Optional case-insensitive substring of the task text.
+            Example: "book"
+        :param completed: Optional completion state; False also includes habits and rewards.
+        :param priority: Optional difficulty: 0.1 (Trivial), 1 (Easy), 1.5 (Medium), 2 (Hard).
+        :param include_completed_todos: Also search the 30 most recently completed todos. (Default is False)
+        :param limit: Optional maximum number of tasks to return.
+
+        :return: Dictionary with success status and the matching tasks or error message.
+            Example success response:
+            {
+                "success": True,
+                "data": [
+                    {
+                        "_id": "task-id",
+                        "text": "Read a book",
+                        "type": "todo",
+                        ...
+                    }
+                ]
+            }
+            Example error response:
+            {
+                "success": False,
+                "error": "Request failed: <error details>"
+            }
+        """
+        if task_type is not None and task_type not in ("habit", "daily", "todo", "reward"):
+            return {"success": False, "error": "task_type must be one of ['habit', 'daily', 'todo', 'reward']."}
+        if tags is not None and not isinstance(tags, list):
+            return {"success": False, "error": "tags must be a list of tag IDs."}
+        if limit is not None and (not isinstance(limit, int) or limit <= 0):
+            return {"success": False, "error": "limit must be a positive integer."}
+        for name, value in (("due_before", due_before), ("due_after", due_after)):
+            if value is not None and habitica_query.parse_date(value) is None:
+                return {"success": False, "error": f"{name} must be an ISO 8601 date."}
+        if priority is not None:
+            try:
+                priority = None if isinstance(priority, bool) else float(priority)
+            except (TypeError, ValueError):
+                priority = None
+            if priority not in PRIORITIES:
+                return {"success": False, "error": "priority must be one of 0.1, 1, 1.5 or 2."}
+
+        index = self._get_task_index(include_completed_todos)
+        if isinstance(index, dict):
+            return index
+        tasks = index.query(tags=tags, task_type=task_type, due_before=due_before, due_after=due_after,
+                            text_contains=text_contains, completed=completed, priority=priority, limit=limit)
+        return {"success": True, "data": tasks}
+
+    def _get_task_index(self, include_completed_todos: bool = False):
+        """
+        Return a TaskIndex over the current tasks, or an error response if they cannot be listed.
+        """
+        listings = (None, "completedTodos") if include_completed_todos else (None,)
+        key = (listings, self.task_cache.version)
+        if self._task_index_key == key and all(self.task_cache.listing_is_fresh(t) for t in listings):
+            return self._task_index
+
+        tasks = []
+        for task_type in listings:
+            result = self.list_tasks(task_type)
+            if not result["success"]:
+                return result
+            tasks.extend(result["data"])
+        if self._task_index_key != key or self.task_cache.version != key[1]:
+            self._task_index = habitica_query.TaskIndex(tasks)
+            # Keyed by the version seen before listing, so a concurrent change forces another rebuild.
+            self._task_index_key = key
+        return self._task_index
+
+    def sync_tasks(self, include_completed: bool = None) -> dict:
+        """
+        Return what changed in the user's tasks since the previous sync.
+
+        The active task list is revalidated with its ETag, so an unchanged list costs no
+        download, and only tasks updated after the per-type ``updatedAt`` high-water mark
+        are compared. Completed to-dos are fetched at a lower rate
+        (every ``HABITICA_SYNC_COMPLETED_INTERVAL`` seconds, default 900).
+        The first sync reports every task as added.
+
+        :param include_completed: True to fetch completed to-dos now, False to skip them,
+            None (default) to fetch them when their interval has passed.
+
+        :return: Dictionary with success status and the change set or error message.
+            Example success response:
+            {
+                "success": true,
+                "data": {
+                    "added": [{"_id": "task-id-1", "text": "New to-do", ...}],
+                    "modified": [{"_id": "task-id-2", "text": "Renamed habit", ...}],
+                    "removed": ["task-id-3"]
+                },
+                "meta": {
+                    "fetched": ["active", "completedTodos"],
+                    "high_water": {"habits": "2025-01-05T10:00:00+00:00", ...}
+                }
+            }
+        """
+        if include_completed is None:
+            include_completed = self.sync_state.completed_due()
+        requests_to_send = [None, habitica_sync.COMPLETED_TODOS] if include_completed else [None]
+        results = habitica_client.map_concurrent(self._fetch_listing, requests_to_send)
+        for result in results:
+            if not result["success"]:
+                return result
+
+        listings = {task_type: [] for task_type in habitica_sync.ACTIVE_TYPES}
+        for task in results[0]["data"]:
+            listings.setdefault(habitica_sync.listing_type(task), []).append(task)
+        if include_completed:
+            listings[habitica_sync.COMPLETED_TODOS] = results[1]["data"]
+
+        changes = self.sync_state.apply(listings)
+        high_water = {
+            task_type: datetime.fromtimestamp(mark, timezone.utc).isoformat()
+            for task_type, mark in self.sync_state.high_water_marks().items()
+        }
+        fetched = ["active", habitica_sync.COMPLETED_TODOS] if include_completed else ["active"]
+        return {"success": True, "data": changes, "meta": {"fetched": fetched, "high_water": high_water}}
+
     def update_task(self, task_id: str, task_data: dict) -> dict:
         """
         Update details of an existing task in Habitica.
@@ -224,12 +740,15 @@ class Tools:
 
         url = f"{self.base_url}/tasks/{task_id}"
         try:
-            response = requests.put(url, headers=self.headers, json=task_data, timeout=10)
+            response = habitica_client.request("PUT", url, headers=self.headers, json=task_data, timeout=10)
             response.raise_for_status()
-            return {"success": True, "data": response.json()["data"]}
+            task = response.json()["data"]
+            self.task_cache.put(task)
+            return {"success": True, "data": task, "meta": habitica_client.call_meta(response)}
         except requests.exceptions.HTTPError as e:
             if response.status_code == 404:
                 logging.error(f"Task not found (404): {task_id}")
+                self.task_cache.invalidate(task_id)
                 return {"success": False, "error": "Task not found."}
             logging.error(f"Update task failed: {e} | Response: {response.text}")
             return {"success": False, "error": f"Request failed: {e}"}
@@ -237,6 +756,146 @@ class Tools:
             logging.error(f"Update task request exception: {e}")
             return {"success": False, "error": f"Request failed: {e}"}
 
+    def update_tasks(self, updates: list) -> dict:
+        """
+        Update many existing tasks concurrently.
+
+        Habitica has no bulk update endpoint, so each update is its own request;
+        they run in parallel within the rate budget and each reports its own result.
+
+        :param updates: List of dictionaries with "task_id" (ID or alias) and "task_data"
+            (fields to update, as accepted by update_task).
+            Example:
+            [
+                {"task_id": "task-id-123", "task_data": {"priority": 2}},
+                {"task_id": "task-id-456", "task_data": {"notes": "Moved to Friday"}}
+            ]
+
+        :return: Dictionary with a result for each update, in input order.
+            "success" is true only if every update succeeded.
+            Example response:
+            {
+                "success": False,
+                "data": [
+                    {"index": 0, "task_id": "task-id-123", "success": True, "data": {...}},
+                    {"index": 1, "task_id": "task-id-456", "success": False, "error": "Task not found."}
+                ],
+                "summary": {"updated": 1, "failed": 1}
+            }
+        """
+        if not isinstance(updates, list) or not updates:
+            return {"success": False, "error": "updates must be a non-empty list."}
+
+        results = habitica_client.map_concurrent(self._update_one, list(enumerate(updates)))
+        updated = sum(1 for result in results if result["success"])
+        return {
+            "success": updated == len(updates),
+            "data": results,
+            "summary": {"updated": updated, "failed": len(updates) - updated}
+        }
+
+    def _update_one(self, item: tuple) -> dict:
+        index, update = item
+        if not isinstance(update, dict):
+            return {"index": index, "success": False, "error": "Each update must be a dictionary."}
+        task_id = update.get("task_id")
+        result = self.update_task(task_id, update.get("task_data"))
+        result.pop("meta", None)
+        return {"index": index, "task_id": task_id, **result}
+
+    def tag_tasks(self, task_ids: list, add_tags: list = None, remove_tags: list = None) -> dict:
+        """
+        Add and remove tags on many tasks in one operation.
+
+        Tag names are resolved case-insensitively through the shared tag index; tags to add
+        that do not exist yet are created once. Tasks are processed concurrently, with the
+        changes to a single task applied one after another.
+
+        :param task_ids: List of task IDs or aliases.
+            Example: ["task-id-123", "task-id-456"]
+        :param add_tags: Tag names or IDs to add.
+            Example: ["Work", "urgent"]
+        :param remove_tags: Tag names or IDs to remove. Unknown names are ignored.
+            Example: ["someday"]
+
+        :return: Dictionary with a result for each task, in input order.
+            "success" is true only if every change succeeded.
+            Example response:
+            {
+                "success": True,
+                "data": [
+                    {"index": 0, "task_id": "task-id-123", "success": True, "data": ["tag-id-1", "tag-id-2"],
+                     "added": ["tag-id-2"], "removed": [], "unchanged": ["tag-id-1"]},
+                    ...
+                ],
+                "summary": {"added": 3, "removed": 1, "unchanged": 1, "failed": 0}
+            }
+        """
+        if not isinstance(task_ids, list) or not task_ids or not all(isinstance(t, str) and t for t in task_ids):
+            return {"success": False, "error": "task_ids must be a non-empty list of strings."}
+        if not add_tags and not remove_tags:
+            return {"success": False, "error": "add_tags or remove_tags is required."}
+        for name, tags in (("add_tags", add_tags), ("remove_tags", remove_tags)):
+            if tags is not None and not isinstance(tags, list):
+                return {"success": False, "error": f"{name} must be a list of tag IDs or names."}
+
+        add_ids = []
+        remove_ids = []
+        if add_tags:
+            result = self._resolve_tags(add_tags, create=True)
+            if not result["success"]:
+                return result
+            add_ids = list(dict.fromkeys(result["data"][tag] for tag in add_tags))
+        if remove_tags:
+            result = self._resolve_tags(remove_tags, create=False, ignore_missing=True)
+            if not result["success"]:
+                return result
+            remove_ids = list(dict.fromkeys(result["data"][tag] for tag in remove_tags if tag in result["data"]))
+
+        results = habitica_client.map_concurrent(
+            lambda item: self._tag_one(item[0], item[1], add_ids, remove_ids), list(enumerate(task_ids))
+        )
+        summary = {"added": 0, "removed": 0, "unchanged": 0, "failed": 0}
+        for result in results:
+            if not result["success"]:
+                summary["failed"] += 1
+            for key in ("added", "removed", "unchanged"):
+                summary[key] += len(result.get(key, ()))
+        return {"success": summary["failed"] == 0, "data": results, "summary": summary}
+
+    def _tag_one(self, index: int, task_id: str, add_ids: list, remove_ids: list) -> dict:
+        """
+        Apply tag additions and removals to one task and update its cached copy.
+        """
+        outcome = {"index": index, "task_id": task_id, "added": [], "removed": [], "unchanged": []}
+        cached = self.task_cache.get(task_id)
+        current = list(cached.get("tags") or []) if cached else None
+        changes = [("POST", tag_id, "added") for tag_id in add_ids] + \
+                  [("DELETE", tag_id, "removed") for tag_id in remove_ids]
+        for method, tag_id, done in changes:
+            if current is not None and (tag_id in current) == (method == "POST"):
+                outcome["unchanged"].append(tag_id)
+                continue
+            url = f"{self.base_url}/tasks/{task_id}/tags/{tag_id}"
+            try:
+                response = habitica_client.request(method, url, headers=self.headers, timeout=10)
+                if method == "POST" and response.status_code == 400:
+                    # Habitica rejects adding a tag the task already has.
+                    outcome["unchanged"].append(tag_id)
+                    continue
+                response.raise_for_status()
+                data = response.json().get("data")
+                if isinstance(data, list):
+                    current = data
+                outcome[done].append(tag_id)
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Tagging task {task_id} failed: {e}")
+                self.task_cache.invalidate(task_id)
+                return {**outcome, "success": False, "error": f"Request failed: {e}"}
+        if cached is not None and current is not None:
+            self.task_cache.put({**cached, "tags": current})
+        return {**outcome, "success": True, "data": current}
+
     def add_checklist_item(self, task_id: str, item_data: dict) -> dict:
         """
         Add a checklist item to an existing task.
@@ -267,6 +926,16 @@ class Tools:
                 }
             }
 
+            With write-behind enabled the call returns at once, before Habitica has assigned
+            the item's ID. ``local_item_id`` is accepted by ``update_checklist`` while write-behind
+            stays on; the item's real ID is in the ``item_ids`` of the next ``flush_writes`` report
+            and in the task once the add is sent:
+            {
+                "success": true,
+                "data": {"success": true, "data": {...}},
+                "meta": {"queued": true, "operation_id": 7, "local_item_id": "local-3f1c..."}
+            }
+
             Example error response:
             {
                 "success": false,
@@ -278,15 +947,32 @@ class Tools:
         if not isinstance(item_data, dict) or not item_data:
             return {"success": False, "error": "item_data must be a non-empty dictionary."}
 
-        url = f"{self.base_url}/tasks/{task_id}/checklist"
+        if self.write_queue is not None:
+            # Habitica assigns the item's ID when the add is sent; until then it goes by a local one.
+            local_id = habitica_writebehind.local_item_id()
+            item = {k: v for k, v in item_data.items() if k != "id"}
+            seq = self.write_queue.enqueue("add_checklist_item", task_id, local_id, item)
+            task = self._optimistic_checklist(task_id, local_id, {"id": local_id, "completed": False, **item},
+                                              add=True)
+            return {"success": True, "data": {"success": True, "data": task},
+                    "meta": {"queued": True, "operation_id": seq, "local_item_id": local_id}}
+
         try:
-            response = requests.post(url, headers=self.headers, json=item_data, timeout=10)
-            response.raise_for_status()
-            return {"success": True, "data": response.json()}
+            response_data, response = self._post_checklist_item(task_id, item_data)
+            return {"success": True, "data": response_data, "meta": habitica_client.call_meta(response)}
         except requests.exceptions.RequestException as e:
             logging.error(f"Add checklist item failed: {e}")
             return {"success": False, "error": f"Request failed: {e}"}
-        
+
+    def _post_checklist_item(self, task_id: str, item_data: dict) -> tuple:
+        url = f"{self.base_url}/tasks/{task_id}/checklist"
+        response = habitica_client.request("POST", url, headers=self.headers, json=item_data, timeout=10)
+        response.raise_for_status()
+        response_data = response.json()
+        self.task_cache.put(response_data.get("data"))
+        return response_data, response
+
+
     def update_checklist(self, task_id: str, item_id: str, checklist_data: dict) -> dict:
         """
         Update a checklist item within a Habitica task.
@@ -339,12 +1025,17 @@ class Tools:
         if not isinstance(checklist_data, dict) or "text" not in checklist_data or not checklist_data["text"]:
             return {"success": False, "error": "'text' is required in checklist_data and cannot be empty."}
 
-        url = f"{self.base_url}/tasks/{task_id}/checklist/{item_id}"
+        if self.write_queue is not None:
+            item_id = self.write_queue.resolve_item_id(item_id)
+            seq = self.write_queue.enqueue("update_checklist", task_id, item_id, checklist_data)
+            task = self._optimistic_checklist(task_id, item_id, checklist_data)
+            return {"success": True, "data": task, "meta": {"queued": True, "operation_id": seq}}
+
         try:
-            response = requests.put(url, headers=self.headers, json=checklist_data, timeout=10)
-            response.raise_for_status()
-            return {"success": True, "data": response.json()["data"]}
+            task, response = self._put_checklist_item(task_id, item_id, checklist_data)
+            return {"success": True, "data": task, "meta": habitica_client.call_meta(response)}
         except requests.exceptions.HTTPError as e:
+            response = e.response
             if response.status_code == 404:
                 error_data = response.json()
                 error_message = error_data.get("message", "")
@@ -361,4 +1052,172 @@ class Tools:
             return {"success": False, "error": f"Request failed: {e}"}
         except requests.exceptions.RequestException as e:
             logging.error(f"Update checklist item request exception: {e}")
-            return {"success": False, "error": f"Request failed: {e}"}
\ No newline at end of file
+            return {"success": False, "error": f"Request failed: {e}"}
+
+    def _put_checklist_item(self, task_id: str, item_id: str, checklist_data: dict) -> tuple:
+        url = f"{self.base_url}/tasks/{task_id}/checklist/{item_id}"
+        response = habitica_client.request("PUT", url, headers=self.headers, json=checklist_data, timeout=10)
+        response.raise_for_status()
+        task = response.json()["data"]
+        self.task_cache.put(task)
+        return task, response
+
+    def score_task(self, task_id: str, direction: str = "up") -> dict:
+        """
+        Score a task: check off a daily or to-do, or click + / - on a habit.
+
+        :param task_id: The ID or alias of the task.
+            Example: "task-id-123"
+        :param direction: "up" to score positively, "down" to score negatively (or uncheck).
+
+        :return: Dictionary with success status and data or error message.
+            Example success response:
+            {
+                "success": true,
+                "data": {
+                    "delta": 1.0,
+                    "hp": 50, "mp": 32, "exp": 27, "gp": 12.4, "lvl": 12,
+                    "_tmp": {...}
+                }
+            }
+
+            With write-behind enabled the call returns at once:
+            {
+                "success": true,
+                "data": null,
+                "meta": {"queued": true, "operation_id": 7}
+            }
+
+            Example error response:
+            {
+                "success": false,
+                "error": "Request failed: <error details>"
+            }
+        """
+        if not isinstance(task_id, str) or not task_id:
+            return {"success": False, "error": "task_id must be a non-empty string."}
+        if direction not in ("up", "down"):
+            return {"success": False, "error": "direction must be 'up' or 'down'."}
+
+        if self.write_queue is not None:
+            seq = self.write_queue.enqueue("score_task", task_id, None, {"direction": direction})
+            cached = self.task_cache.get(task_id)
+            if cached is not None and cached.get("type") in ("daily", "todo"):
+                self.task_cache.put({**cached, "completed": direction == "up"})
+            return {"success": True, "data": None, "meta": {"queued": True, "operation_id": seq}}
+
+        try:
+            response_data, response = self._post_score(task_id, direction)
+            return {"success": True, "data": response_data.get("data"), "meta": habitica_client.call_meta(response)}
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Score task failed: {e}")
+            return {"success": False, "error": f"Request failed: {e}"}
+
+    def _post_score(self, task_id: str, direction: str) -> tuple:
+        url = f"{self.base_url}/tasks/{task_id}/score/{direction}"
+        response = habitica_client.request("POST", url, headers=self.headers, timeout=10)
+        response.raise_for_status()
+        # The response carries stat changes, not the task, so the cached copy is now stale.
+        self.task_cache.invalidate(task_id)
+        return response.json(), response
+
+    def _optimistic_checklist(self, task_id: str, item_id: str, item_data: dict, add: bool = False):
+        """
+        Apply a queued checklist change to the cached task and return the updated copy, or None if not cached.
+        """
+        cached = self.task_cache.get(task_id)
+        if cached is None:
+            return None
+        checklist = [dict(item) for item in cached.get("checklist") or []]
+        for item in checklist:
+            if item.get("id") == item_id:
+                item.update(item_data)
+                break
+        else:
+            if not add:
+                return None
+            checklist.append(dict(item_data))
+        task = {**cached, "checklist": checklist}
+        self.task_cache.put(task)
+        return task
+
+    def _send_write(self, kind: str, task_id: str, item_id: str, payload: dict):
+        """
+        Send one queued change; raises ``requests.exceptions.RequestException`` on failure.
+
+        :return: For an added checklist item, the ID Habitica assigned to it; otherwise None.
+        """
+        try:
+            if kind == "score_task":
+                self._post_score(task_id, payload["direction"])
+            elif kind == "add_checklist_item":
+                response_data, _ = self._post_checklist_item(task_id, payload)
+                # Habitica appends the item; the last one with its text is the new one.
+                checklist = (response_data.get("data") or {}).get("checklist") or []
+                for item in reversed(checklist):
+                    if item.get("text") == payload.get("text"):
+                        return item.get("id")
+                return None
+            else:
+                self._put_checklist_item(task_id, item_id, payload)
+        except requests.exceptions.HTTPError:
+            # The optimistic copy no longer matches Habitica.
+            self.task_cache.invalidate(task_id)
+            raise
+
+    def set_write_behind(self, enabled: bool) -> dict:
+        """
+        Turn write-behind mode for score_task, add_checklist_item and update_checklist on or off.
+
+        While enabled, these calls queue the change, update the cached task optimistically and
+        return at once with ``"meta": {"queued": true, ...}``; the queue is sent in the background.
+        Turning it off flushes the queue first. The queue is kept in the SQLite file
+        ``write_queue_path`` (HABITICA_WRITE_QUEUE_PATH by default), so pending changes survive
+        a restart, or in memory when it is not set.
+
+        :param enabled: True to queue changes, False to send them immediately again.
+
+        :return: Dictionary with success status and the flush report when disabling.
+        """
+        if enabled:
+            if self.write_queue is None:
+                self.write_queue = habitica_writebehind.WriteBehindQueue(
+                    self._send_write, self.headers["x-api-user"], self.write_queue_path
+                )
+            return {"success": True, "data": {"enabled": True, "pending": self.write_queue.pending()}}
+        if self.write_queue is None:
+            return {"success": True, "data": {"enabled": False}}
+        report = self.write_queue.flush()
+        if report["data"]["pending"]:
+            return {"success": False, "error": "Queued changes could not be sent; write-behind stays enabled.",
+                    "data": report["data"]}
+        self.write_queue.close()
+        self.write_queue = None
+        return {"success": True, "data": {"enabled": False, **report["data"]}}
+
+    def flush_writes(self, timeout: float = None) -> dict:
+        """
+        Send all queued changes now and report any conflicts.
+
+        :param timeout: Seconds to keep retrying changes that fail with transient errors.
+
+        :return: Dictionary with counters and the changes Habitica rejected since the last report.
+            "success" is false if any change conflicted or is still pending.
+            Example response:
+            {
+                "success": false,
+                "data": {
+                    "applied": 18,
+                    "merged": 5,
+                    "pending": 0,
+                    "conflicts": [
+                        {"operation_id": 12, "kind": "update_checklist", "task_id": "task-id-123",
+                         "item_id": "item-id", "payload": {"text": "Step 3", "completed": true},
+                         "status": 404, "error": "Checklist item not found."}
+                    ]
+                }
+            }
+        """
+        if self.write_queue is None:
+            return {"success": True, "data": {"applied": 0, "merged": 0, "pending": 0, "conflicts": []}}
+        return self.write_queue.flush(timeout)
\ No newline at end of file
@@ -0,0 +1,241 @@
+# habitica_toolspec.py
+"""
+Tool specifications for the Habitica tool modules, built without importing them.
+
+LLM tool hosts describe each public ``Tools`` method to the model from its type
+hints and Sphinx docstring. Importing the modules for that loads the whole HTTP
+stack, so this module reads the method signatures and docstrings from the source
+files with ``ast`` instead and returns OpenAI-style function specifications:
+
+    {
+        "name": "get_task",
+        "description": "Retrieve a specific task from Habitica by its ID or alias.",
+        "parameters": {
+            "type": "object",
+            "properties": {"task_id": {"type": "string", "description": "..."}},
+            "required": ["task_id"]
+        }
+    }
+
+Specifications can be precomputed into a JSON file (``python habitica_toolspec.py
+--output tool_specs.json``) and are read from it while the module sources are
+unchanged. Set ``HABITICA_TOOL_SPEC_CACHE`` to use such a file by default.
+"""
+import os
+import ast
+import json
+import inspect
+import logging
+import importlib.util
+
+logging.basicConfig(level=logging.INFO)
+
+HABITICA_TOOL_SPEC_CACHE = os.environ.get("HABITICA_TOOL_SPEC_CACHE")
+DEFAULT_MODULES = ("habitica_tasks", "habitica_manage", "habitica_tags_skills")
+CACHE_VERSION = 2
+
+JSON_TYPES = {"str": "string", "int": "integer", "float": "number", "bool": "boolean",
+              "list": "array", "tuple": "array", "dict": "object"}
+_FIELDS = (":param ", ":return", ":raises ", ":rtype")
+
+
+def _json_type(node) -> dict:
+    """
+    Translate an annotation node into a JSON schema fragment ({} when it has no JSON equivalent).
+    """
+    if node is None:
+        return {}
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        try:
+            node = ast.parse(node.value, mode="eval").body
+        except SyntaxError:
+            return {}
+    if isinstance(node, ast.Name):
+        return {"type": JSON_TYPES[node.id]} if node.id in JSON_TYPES else {}
+    if isinstance(node, ast.Attribute):
+        return {}
+    if isinstance(node, ast.Subscript):
+        base = node.value.id if isinstance(node.value, ast.Name) else getattr(node.value, "attr", "")
+        args = node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+        if base in ("Union", "Optional"):
+            options = [_json_type(arg) for arg in args
+                       if not (isinstance(arg, ast.Constant) and arg.value is None)]
+            options = [option for option in options if option]
+            if len(options) == 1:
+                return options[0]
+            return {"anyOf": options} if options else {}
+        if base in ("list", "List", "tuple", "Tuple"):
+            items = _json_type(args[0])
+            return {"type": "array", **({"items": items} if items else {})}
+        if base in ("dict", "Dict"):
+            return {"type": "object"}
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+        return _json_type(ast.Subscript(value=ast.Name(id="Union"), slice=ast.Tuple(elts=[node.left, node.right])))
+    return {}
+
+
+def _is_generator(node) -> bool:
+    """
+    Return whether a function definition is a generator (yields outside any nested function).
+    """
+    todo = list(node.body)
+    while todo:
+        child = todo.pop()
+        if isinstance(child, (ast.Yield, ast.YieldFrom)):
+            return True
+        if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            todo.extend(ast.iter_child_nodes(child))
+    return False
+
+
+def parse_docstring(docstring: str) -> tuple:
+    """
+    Split a Sphinx docstring into its description and ``{parameter: description}``.
+    """
+    description = []
+    params = {}
+    current = None
+    for line in inspect.cleandoc(docstring or "").splitlines():
+        stripped = line.strip()
+        if stripped.startswith(_FIELDS):
+            current = None
+            if stripped.startswith(":param "):
+                name, _, text = stripped[len(":param "):].partition(":")
+                current = params.setdefault(name.split()[-1], [])
+                current.append(text.strip())
+            continue
+        if current is not None:
+            current.append(line)
+        elif not params:
+            description.append(line)
+    return (
+        "\n".join(description).strip(),
+        {name: inspect.cleandoc("\n".join(lines)).strip() for name, lines in params.items()},
+    )
+
+
+def extract_specs(path: str, class_name: str = "Tools") -> list:
+    """
+    Read the public methods of a tool class from a source file.
+
+    Only methods a model can call with JSON arguments are tools: generators and methods
+    with a parameter whose annotation has no JSON type (or that has none) are left out.
+
+    :param path: Path of the module source.
+    :param class_name: Name of the class whose methods are tools.
+    :return: List of function specifications, in source order.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    cls = next((node for node in tree.body if isinstance(node, ast.ClassDef) and node.name == class_name), None)
+    if cls is None:
+        return []
+    specs = []
+    for node in cls.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) or node.name.startswith("_"):
+            continue
+        if _is_generator(node):
+            continue
+        args = node.args.posonlyargs + node.args.args
+        defaults = [None] * (len(args) - len(node.args.defaults)) + node.args.defaults
+        params = list(zip(args, defaults))[1:] + list(zip(node.args.kwonlyargs, node.args.kw_defaults))
+        if node.args.vararg or node.args.kwarg or not all(_json_type(arg.annotation) for arg, _ in params):
+            continue
+        description, param_docs = parse_docstring(ast.get_docstring(node, clean=False))
+        properties = {}
+        required = []
+        for arg, default in params:
+            schema = _json_type(arg.annotation)
+            if param_docs.get(arg.arg):
+                schema["description"] = param_docs[arg.arg]
+            if default is None:
+                required.append(arg.arg)
+            else:
+                try:
+                    value = ast.literal_eval(default)
+                    if value is not None:
+                        schema["default"] = value
+                except ValueError:
+                    pass
+            properties[arg.arg] = schema
+        specs.append({
+            "name": node.name,
+            "description": description,
+            "parameters": {"type": "object", "properties": properties, "required": required},
+        })
+    return specs
+
+
+def _source(module: str) -> str:
+    spec = importlib.util.find_spec(module)
+    if spec is None or not spec.origin:
+        raise ImportError(f"No source found for module {module}.")
+    return spec.origin
+
+
+def _fingerprint(path: str) -> list:
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _read_cache(cache_path: str) -> dict:
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache.get("modules", {}) if cache.get("version") == CACHE_VERSION else {}
+
+
+def write_cache(cache_path: str, modules=DEFAULT_MODULES) -> dict:
+    """
+    Extract the specifications of ``modules`` and store them in ``cache_path``.
+
+    :return: ``{module: [spec, ...]}``
+    """
+    entries = {}
+    for module in modules:
+        path = _source(module)
+        entries[module] = {"fingerprint": _fingerprint(path), "specs": extract_specs(path)}
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "modules": entries}, f, indent=1)
+    os.replace(tmp_path, cache_path)
+    return {module: entry["specs"] for module, entry in entries.items()}
+
+
+def get_tool_specs(modules=DEFAULT_MODULES, cache_path: str = None) -> dict:
+    """
+    Return the tool specifications of the given modules without importing them.
+
+    Specifications are taken from the precomputed file when its entry for a module matches
+    the module source (modification time and size); other modules are extracted from source.
+
+    :param modules: Module names whose ``Tools`` methods are returned.
+    :param cache_path: Precomputed specification file; defaults to ``HABITICA_TOOL_SPEC_CACHE``.
+    :return: ``{module: [spec, ...]}``
+    """
+    cache_path = cache_path or HABITICA_TOOL_SPEC_CACHE
+    cached = _read_cache(cache_path) if cache_path else {}
+    specs = {}
+    for module in modules:
+        path = _source(module)
+        entry = cached.get(module)
+        if entry and entry.get("fingerprint") == _fingerprint(path):
+            specs[module] = entry["specs"]
+        else:
+            if cache_path:
+                logging.info(f"Tool specifications for {module} are stale in {cache_path}; reading the source.")
+            specs[module] = extract_specs(path)
+    return specs
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompute the tool specifications of the Habitica modules.")
+    parser.add_argument("--output", default="tool_specs.json")
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES))
+    args = parser.parse_args()
+    result = write_cache(args.output, args.modules)
+    print(f"Wrote {sum(len(specs) for specs in result.values())} tool specifications to {args.output}")
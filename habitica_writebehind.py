@@ -0,0 +1,383 @@
+# habitica_writebehind.py
+"""
+Write-behind queue for task scoring and checklist changes.
+
+When write-behind is enabled on ``habitica_tasks.Tools``, ``score_task``,
+``add_checklist_item`` and ``update_checklist`` store the change in an ordered
+local queue and return an optimistic result at once. The queue is flushed in
+the background: operations on the same task are sent in the order they were
+made, different tasks are sent concurrently, and repeated edits of the same
+checklist item that are still waiting are merged into one request.
+
+The queue is kept in SQLite, so with ``HABITICA_WRITE_QUEUE_PATH`` set pending
+changes survive a restart and are sent by the next process:
+
+    CREATE TABLE operations (
+        seq           INTEGER PRIMARY KEY AUTOINCREMENT,  -- queue order
+        user_id       TEXT NOT NULL,
+        kind          TEXT NOT NULL,  -- "score_task", "add_checklist_item" or "update_checklist"
+        task_id       TEXT NOT NULL,
+        item_id       TEXT,           -- checklist item ID ("local-..." until the add is sent)
+        payload       TEXT NOT NULL,  -- JSON request body, or {"direction": ...} for scoring
+        created_at    REAL NOT NULL,  -- Unix time the change was queued
+        claimed_by    TEXT,           -- queue instance sending the change, if any
+        claimed_until REAL            -- Unix time the claim lapses if that instance dies
+    )
+    CREATE TABLE item_ids (
+        user_id   TEXT NOT NULL,
+        local_id  TEXT PRIMARY KEY,   -- ID handed out when the add was queued
+        server_id TEXT NOT NULL       -- ID Habitica assigned when the add was sent
+    )
+
+Several queues (threads, ``Tools`` instances or processes) may share one database:
+a flush claims the changes it sends inside a write transaction, so each change is
+sent by one of them, and a task whose earlier changes another queue is still
+sending is left to that queue so the order is kept.
+
+Habitica assigns checklist item IDs itself, so a queued add gets a ``local-`` ID
+that later updates of the item can use; when the add is sent, the queued updates
+are rewritten to the ID Habitica returned and the mapping is kept in ``item_ids``.
+
+Without a path the queue lives in memory and is lost when the process exits.
+"""
+import os
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+import habitica_lazy
+import habitica_client
+
+requests = habitica_lazy.lazy_import("requests")
+
+logging.basicConfig(level=logging.INFO)
+
+HABITICA_WRITE_QUEUE_PATH = os.environ.get("HABITICA_WRITE_QUEUE_PATH")
+# Seconds to wait after a change before flushing, so rapid edits are merged first.
+DEFAULT_FLUSH_DELAY = float(os.environ.get("HABITICA_WRITE_QUEUE_DELAY", "0.2"))
+
+KINDS = ("score_task", "add_checklist_item", "update_checklist")
+# Prefix of checklist item IDs handed out for adds Habitica has not seen yet.
+LOCAL_ITEM_PREFIX = "local-"
+# Seconds a flush may hold its claim on changes before another queue may take them over.
+CLAIM_LEASE = float(os.environ.get("HABITICA_WRITE_QUEUE_LEASE", "300"))
+
+
+def local_item_id() -> str:
+    """
+    Return a new placeholder ID for a checklist item whose add is queued.
+    """
+    return f"{LOCAL_ITEM_PREFIX}{uuid.uuid4()}"
+
+
+class WriteBehindQueue:
+    """
+    Durable, ordered queue of task changes for one user.
+
+    :param send: Callable ``send(kind, task_id, item_id, payload)`` that performs one change
+        and raises ``requests.exceptions.RequestException`` on failure; for
+        ``add_checklist_item`` it returns the ID Habitica assigned to the item.
+    :param user_id: Habitica user the queued changes belong to.
+    :param path: SQLite database path; None keeps the queue in memory.
+    :param flush_delay: Seconds to wait after a change before the background flush starts.
+    """
+
+    def __init__(self, send, user_id: str, path: str = None, flush_delay: float = DEFAULT_FLUSH_DELAY):
+        self._send = send
+        self.user_id = user_id
+        self.path = path or ":memory:"
+        self.flush_delay = flush_delay
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Transactions are opened explicitly with BEGIN IMMEDIATE, see _transaction.
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10, isolation_level=None)
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._transaction():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS operations ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, kind TEXT NOT NULL, "
+                "task_id TEXT NOT NULL, item_id TEXT, payload TEXT NOT NULL, created_at REAL NOT NULL, "
+                "claimed_by TEXT, claimed_until REAL)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(operations)")}
+            for column, kind in (("claimed_by", "TEXT"), ("claimed_until", "REAL")):
+                if column not in columns:
+                    # Queue files written before changes were claimed.
+                    self._conn.execute(f"ALTER TABLE operations ADD COLUMN {column} {kind}")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS item_ids ("
+                "user_id TEXT NOT NULL, local_id TEXT PRIMARY KEY, server_id TEXT NOT NULL)"
+            )
+        self.owner = str(uuid.uuid4())
+        self._scheduled = False
+        self._closed = False
+        self._conflicts = []
+        self._item_ids = {}
+        self.applied = 0
+        self.merged = 0
+        if self.pending():
+            self._schedule()
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Run a block in a write transaction; the caller holds ``_lock`` where the connection is shared.
+
+        BEGIN IMMEDIATE takes the database write lock up front, so a read followed by a write
+        in the block is atomic with respect to other connections to the same file.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def pending(self) -> int:
+        """
+        Return the number of queued changes not yet sent.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM operations WHERE user_id = ?", (self.user_id,)
+            ).fetchone()[0]
+
+    def enqueue(self, kind: str, task_id: str, item_id: str = None, payload: dict = None) -> int:
+        """
+        Queue a change and schedule a background flush.
+
+        An update of a checklist item is merged into a waiting add or update of the same
+        item, unless a scoring of the task was queued after it. An update addressed by the
+        local ID of an item whose add was already sent is queued under Habitica's ID.
+
+        :return: Sequence number of the queued (or merged-into) operation.
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown operation kind: {kind}")
+        payload = payload or {}
+        with self._lock, self._transaction():
+            seq = None
+            if kind == "update_checklist":
+                item_id = self._resolve(item_id)
+                seq = self._merge_target(task_id, item_id)
+            if seq is not None:
+                row = self._conn.execute("SELECT payload FROM operations WHERE seq = ?", (seq,)).fetchone()
+                merged = {**json.loads(row[0]), **payload}
+                self._conn.execute("UPDATE operations SET payload = ? WHERE seq = ?", (json.dumps(merged), seq))
+                self.merged += 1
+            else:
+                cursor = self._conn.execute(
+                    "INSERT INTO operations (user_id, kind, task_id, item_id, payload, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.user_id, kind, task_id, item_id, json.dumps(payload), time.time()),
+                )
+                seq = cursor.lastrowid
+        self._schedule()
+        return seq
+
+    def resolve_item_id(self, item_id: str) -> str:
+        """
+        Return Habitica's ID for a checklist item added through the queue, or ``item_id`` as given
+        if it is not a local ID whose add has been sent.
+        """
+        if not isinstance(item_id, str) or not item_id.startswith(LOCAL_ITEM_PREFIX):
+            return item_id
+        with self._lock:
+            return self._resolve(item_id)
+
+    def _resolve(self, item_id: str) -> str:
+        if not isinstance(item_id, str) or not item_id.startswith(LOCAL_ITEM_PREFIX):
+            return item_id
+        row = self._conn.execute(
+            "SELECT server_id FROM item_ids WHERE user_id = ? AND local_id = ?", (self.user_id, item_id)
+        ).fetchone()
+        return row[0] if row else item_id
+
+    def _merge_target(self, task_id: str, item_id: str):
+        rows = self._conn.execute(
+            "SELECT seq, kind, item_id, claimed_by FROM operations WHERE user_id = ? AND task_id = ? "
+            "ORDER BY seq DESC",
+            (self.user_id, task_id),
+        ).fetchall()
+        for seq, kind, queued_item, claimed_by in rows:
+            # A claimed change may be on the wire already.
+            if claimed_by is not None or kind == "score_task":
+                return None
+            if queued_item == item_id:
+                return seq
+        return None
+
+    def _schedule(self) -> None:
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        habitica_client.get_executor().submit(self._background_flush)
+
+    def _background_flush(self) -> None:
+        time.sleep(self.flush_delay)
+        with self._lock:
+            self._scheduled = False
+            if self._closed:
+                return
+        try:
+            self._drain()
+        except Exception as e:
+            logging.error(f"Write-behind flush failed: {e}")
+
+    def _flush_once(self) -> int:
+        """
+        Send every queued change once. Returns the number of changes left for a later flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if self._closed:
+                    return 0
+                rows, waiting = self._claim()
+            by_task = {}
+            for row in rows:
+                by_task.setdefault(row[2], []).append(row)
+            left = habitica_client.map_concurrent(self._flush_task, list(by_task.values()))
+            return sum(left) + waiting
+
+    def _claim(self) -> tuple:
+        """
+        Claim this user's unclaimed changes for this queue, in one write transaction.
+
+        A task with a change claimed by another queue whose claim has not lapsed is skipped
+        entirely, so its later changes are not sent before its earlier ones.
+
+        :return: ``(rows, waiting)``: the claimed ``(seq, kind, task_id, item_id, payload)``
+            rows in queue order and the number of changes left to other queues.
+        """
+        now = time.time()
+        with self._transaction():
+            rows = self._conn.execute(
+                "SELECT seq, kind, task_id, item_id, payload, claimed_by, claimed_until FROM operations "
+                "WHERE user_id = ? ORDER BY seq",
+                (self.user_id,),
+            ).fetchall()
+            busy = {row[2] for row in rows if row[5] not in (None, self.owner) and row[6] > now}
+            claimed = [row[:5] for row in rows if row[2] not in busy]
+            self._conn.executemany(
+                "UPDATE operations SET claimed_by = ?, claimed_until = ? WHERE seq = ?",
+                [(self.owner, now + CLAIM_LEASE, row[0]) for row in claimed],
+            )
+        return claimed, len(rows) - len(claimed)
+
+    def _release(self, seqs: list) -> None:
+        with self._lock, self._transaction():
+            self._conn.executemany(
+                "UPDATE operations SET claimed_by = NULL, claimed_until = NULL WHERE seq = ? AND claimed_by = ?",
+                [(seq, self.owner) for seq in seqs],
+            )
+
+    def _flush_task(self, rows: list) -> int:
+        """
+        Send the queued changes of one task in order; stop at the first transient failure.
+        """
+        item_ids = {}
+        for index, (seq, kind, task_id, item_id, payload) in enumerate(rows):
+            payload = json.loads(payload)
+            item_id = item_ids.get(item_id, item_id)
+            server_id = None
+            try:
+                server_id = self._send(kind, task_id, item_id, payload)
+            except requests.exceptions.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status is None or status == 429 or status >= 500:
+                    logging.info(f"Write-behind {kind} on task {task_id} deferred: {e}")
+                    self._release([row[0] for row in rows[index:]])
+                    return len(rows) - index
+                message = self._error_message(e.response)
+                logging.error(f"Write-behind {kind} on task {task_id} rejected: {message}")
+                with self._lock:
+                    self._conflicts.append({
+                        "operation_id": seq, "kind": kind, "task_id": task_id, "item_id": item_id,
+                        "payload": payload, "status": status, "error": message,
+                    })
+            except requests.exceptions.RequestException as e:
+                logging.info(f"Write-behind {kind} on task {task_id} deferred: {e}")
+                self._release([row[0] for row in rows[index:]])
+                return len(rows) - index
+            else:
+                with self._lock:
+                    self.applied += 1
+            with self._lock, self._transaction():
+                self._conn.execute("DELETE FROM operations WHERE seq = ?", (seq,))
+                if kind == "add_checklist_item" and server_id and item_id != server_id:
+                    # Point the item's queued updates, here and in other queues, at Habitica's ID.
+                    self._conn.execute(
+                        "UPDATE operations SET item_id = ? WHERE user_id = ? AND task_id = ? AND item_id = ?",
+                        (server_id, self.user_id, task_id, item_id),
+                    )
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO item_ids (user_id, local_id, server_id) VALUES (?, ?, ?)",
+                        (self.user_id, item_id, server_id),
+                    )
+                    self._item_ids[item_id] = server_id
+                    item_ids[item_id] = server_id
+        return 0
+
+    @staticmethod
+    def _error_message(response) -> str:
+        try:
+            return response.json().get("message") or response.reason
+        except ValueError:
+            return response.reason or f"HTTP {response.status_code}"
+
+    def flush(self, timeout: float = None) -> dict:
+        """
+        Send all queued changes now and report the outcome.
+
+        Transient failures are retried with the client retry policy until ``timeout``
+        seconds have passed; changes Habitica rejects are reported as conflicts and dropped.
+
+        :return: Dictionary with the number of applied, merged and still pending changes, the
+            conflicts found since the last report and the IDs Habitica assigned to checklist items
+            added since the last report (``{local_id: item_id}``).
+        """
+        self._drain(timeout)
+        return self.report()
+
+    def _drain(self, timeout: float = None) -> None:
+        """
+        Flush until the queue is empty, backing off between passes that hit transient failures.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        policy = habitica_client.retry_policy
+        started = time.monotonic()
+        attempt = 0
+        while self._flush_once():
+            delay = policy.next_delay(attempt, started)
+            if delay is None or deadline is not None and time.monotonic() + delay > deadline:
+                break
+            attempt += 1
+            time.sleep(delay)
+
+    def report(self) -> dict:
+        """
+        Return the current counters and hand over the conflicts and item IDs collected so far.
+        """
+        pending = self.pending()
+        with self._lock:
+            conflicts, self._conflicts = self._conflicts, []
+            item_ids, self._item_ids = self._item_ids, {}
+        return {
+            "success": not conflicts and not pending,
+            "data": {"applied": self.applied, "merged": self.merged, "pending": pending, "conflicts": conflicts,
+                     "item_ids": item_ids},
+        }
+
+    def close(self) -> None:
+        """
+        Close the queue database; changes still queued stay in it for the next process.
+        """
+        with self._flush_lock, self._lock:
+            self._closed = True
+            self._conn.close()
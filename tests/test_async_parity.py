@@ -0,0 +1,20 @@
+# tests/test_async_parity.py
+"""
+AsyncTools must offer every public Tools method with the same parameters.
+"""
+import inspect
+import pytest
+import habitica_async
+import habitica_manage
+import habitica_tags_skills
+import habitica_tasks
+
+
+@pytest.mark.parametrize("module", [habitica_tasks, habitica_manage, habitica_tags_skills])
+def test_async_tools_mirror_sync_tools(module):
+    for name, method in inspect.getmembers(module.Tools, inspect.isfunction):
+        if name.startswith("_"):
+            continue
+        mirror = getattr(habitica_async.AsyncTools, name, None)
+        assert mirror is not None and inspect.iscoroutinefunction(mirror), name
+        assert inspect.signature(mirror).parameters == inspect.signature(method).parameters, name
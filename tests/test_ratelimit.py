@@ -0,0 +1,38 @@
+# tests/test_ratelimit.py
+"""
+The limiter must wait for the server's window to reset once the budget is used up.
+"""
+import time
+import pytest
+import habitica_ratelimit
+
+
+def test_exhausted_budget_waits_for_reset():
+    limiter = habitica_ratelimit.RateLimiter(requests_per_period=30, period=60, max_wait=120)
+    limiter.reserve()
+    limiter.update({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(time.time() + 50)}, 200)
+    assert limiter.reserve() == pytest.approx(50, abs=1)
+
+
+def test_reported_budget_does_not_refill_before_reset():
+    limiter = habitica_ratelimit.RateLimiter(requests_per_period=30, period=60, max_wait=120)
+    limiter.reserve()
+    limiter.update({"X-RateLimit-Remaining": "1", "X-RateLimit-Reset": str(time.time() + 50)}, 200)
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == pytest.approx(50, abs=1)
+
+
+def test_full_budget_returns_after_reset():
+    limiter = habitica_ratelimit.RateLimiter(requests_per_period=30, period=60, max_wait=120)
+    limiter.reserve()
+    limiter.update({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(time.time() + 0.2)}, 200)
+    time.sleep(0.3)
+    assert [limiter.reserve() for _ in range(30)] == [0] * 30
+
+
+def test_wait_past_max_wait_is_refused():
+    limiter = habitica_ratelimit.RateLimiter(requests_per_period=30, period=60, max_wait=10)
+    limiter.reserve()
+    limiter.update({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(time.time() + 50)}, 200)
+    with pytest.raises(habitica_ratelimit.RateLimitExceeded):
+        limiter.reserve()
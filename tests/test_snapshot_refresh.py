@@ -0,0 +1,47 @@
+# tests/test_snapshot_refresh.py
+"""
+A failed background refresh of a snapshot must not pin the snapshot for the rest of the process.
+"""
+import socket
+import pytest
+import habitica_client
+import habitica_manage
+import habitica_snapshot
+import habitica_tags_skills
+import stub_server
+
+
+def _closed_url() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/api/v3"
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(habitica_snapshot, "HABITICA_SNAPSHOT_PATH", str(tmp_path / "snapshot.db"))
+    monkeypatch.setattr(habitica_client, "retry_policy", habitica_client.RetryPolicy(max_retries=0))
+    user_id = "snapshot-user"
+    store = habitica_snapshot.get_store(user_id)
+    store.save_profile({"success": True, "data": {"profile": {"name": "stale"}}})
+    store.save_tags([{"id": "stale-tag", "name": "Stale"}])
+    yield user_id
+    habitica_snapshot.close_store(user_id)
+
+
+@pytest.mark.parametrize("cls, call", [
+    (habitica_manage.Tools, lambda tools: tools.get_user_profile()),
+    (habitica_tags_skills.Tools, lambda tools: tools.list_tags()),
+])
+def test_failed_refresh_is_retried(snapshot, cls, call):
+    tools = cls(snapshot, "key")
+    tools.base_url = _closed_url()
+    assert call(tools)["meta"] == {"cache": "snapshot"}
+    assert not tools._snapshot_refresh.result()["success"]
+
+    with stub_server.StubServer(port=0, handler=stub_server.HabiticaHandler) as server:
+        tools.base_url = server.base_url
+        assert call(tools)["meta"] == {"cache": "snapshot"}
+        assert tools._snapshot_refresh.result()["success"]
+        assert call(tools)["meta"].get("cache") != "snapshot"
@@ -0,0 +1,21 @@
+# tests/test_task_cache.py
+"""
+An unfiltered listing also answers the per-type list_tasks calls.
+"""
+import habitica_cache
+
+
+def test_unfiltered_listing_fills_per_type_listings():
+    cache = habitica_cache.TaskCache(ttl=30)
+    tasks = [
+        {"_id": "h1", "type": "habit"},
+        {"_id": "d1", "type": "daily"},
+        {"_id": "d2", "type": "daily"},
+        {"_id": "t1", "type": "todo"},
+    ]
+    cache.store_listing(None, tasks, "etag-1")
+    assert [task["_id"] for task in cache.get_listing("dailys")] == ["d1", "d2"]
+    assert [task["_id"] for task in cache.get_listing("habits")] == ["h1"]
+    assert cache.get_listing("rewards") == []
+    assert cache.listing_etag(None) == "etag-1"
+    assert cache.listing_etag("dailys") is None